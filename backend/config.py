@@ -0,0 +1,24 @@
+"""Environment settings helpers shared by the services."""
+import os
+
+
+def int_env(name: str, default: int) -> int:
+    """Integer from the environment; unset, blank or malformed values give `default`"""
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def float_env(name: str, default: float) -> float:
+    """Float from the environment; unset, blank or malformed values give `default`"""
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
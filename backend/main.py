@@ -3,12 +3,17 @@ load_dotenv()  # Load .env file before anything else
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from .database import engine, Base, SessionLocal
 from . import models
-from .routers import references, recipes, transforms, logs, alerts, ai, dashboard, experiments, dna, strategies, analysis, benchmarks, trends, fun, explore, vibe, recommendations
+from .routers import references, recipes, transforms, deployments, logs, alerts, ai, dashboard, experiments, dna, strategies, analysis, benchmarks, trends, fun, explore, vibe, recommendations, market, pairing, tasting
 from .services.local_llm import warmup
+from .services.log_buffer import log_buffer
+from .services.deviation_aggregator import deviation_aggregator
+from .services.spec_index import spec_index
+from .services.scheduler import scheduler, scheduler_enabled
+from .migrations import upgrade_schema
 
-Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 app = FastAPI(title="FlavorOS API", version="1.0.0")
 
@@ -18,12 +23,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(references.router)
 app.include_router(recipes.router)
 app.include_router(transforms.router)
 app.include_router(experiments.router)
+app.include_router(deployments.router)
 app.include_router(dashboard.router)
 app.include_router(logs.router)
 app.include_router(alerts.router)
@@ -45,6 +52,41 @@ app.include_router(recommendations.router)
 def warmup_local_llm():
     warmup()
 
+@app.on_event("startup")
+def warm_spec_index():
+    db = SessionLocal()
+    try:
+        spec_index.warm(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def rehydrate_deviation_aggregator():
+    # Before the log buffer starts feeding it
+    db = SessionLocal()
+    try:
+        deviation_aggregator.rehydrate(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_log_buffer():
+    await log_buffer.start()
+
+@app.on_event("shutdown")
+async def drain_log_buffer():
+    await log_buffer.stop()
+
+@app.on_event("startup")
+async def start_scheduler():
+    # Otherwise run `python -m backend.worker` next to the API
+    if scheduler_enabled():
+        await scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await scheduler.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "FlavorOS API is running"}
@@ -0,0 +1,113 @@
+"""
+Additive schema upgrades for existing databases.
+
+`create_all` only creates missing tables; columns and indexes added to
+existing tables are applied here. Every step checks the live schema first,
+so it is safe to run on each start:
+
+    python -m backend.migrations
+"""
+import logging
+from typing import Dict, List
+
+from sqlalchemy import exists, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from . import models
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def _add_missing_columns(engine: Engine) -> Dict[str, List[str]]:
+    added: Dict[str, List[str]] = {}
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        # Inspect on this connection, inside the transaction doing the ALTERs
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.tables.values():
+            if table.name not in existing_tables:
+                continue
+            present = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                # Added columns are nullable; scalar defaults are filled in below
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+                ))
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    conn.execute(table.update().where(column.is_(None)).values({column.name: default}))
+                added.setdefault(table.name, []).append(column.name)
+    return added
+
+
+def _create_missing_indexes(engine: Engine) -> List[str]:
+    created = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.tables.values():
+            if table.name not in existing_tables:
+                continue
+            present = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in present:
+                    conn.execute(CreateIndex(index))
+                    created.append(index.name)
+    return created
+
+
+def _backfill(engine: Engine) -> Dict[str, int]:
+    """Runs on every start, so it only writes (and commits) when there is something to fill"""
+    from sqlalchemy.orm import Session
+    from .services.log_partitions import backfill_partition_days
+    from .services.reference_repository import reference_repository
+
+    ref, fp = models.Reference, models.ReferenceFingerprint
+    with Session(bind=engine) as db:
+        # Fingerprinted references from before the pointer existed; once pointed
+        # they never match again, even when the newest vector is NULL
+        pending_refs = [
+            ref_id for (ref_id,) in db.query(ref.id).filter(
+                ref.current_fingerprint_id.is_(None),
+                exists().where(fp.reference_id == ref.id)
+            )
+        ]
+        for start in range(0, len(pending_refs), BACKFILL_BATCH_SIZE):
+            # By id: the pointer criterion would stop matching between the pointer and vector statements
+            reference_repository.refresh_current_fingerprints(
+                db, ref.id.in_(pending_refs[start:start + BACKFILL_BATCH_SIZE])
+            )
+        unpartitioned = db.query(models.ExecutionLog.id).filter(
+            models.ExecutionLog.partition_day.is_(None)
+        ).first() is not None
+        partition_days = backfill_partition_days(db) if unpartitioned else 0
+        if pending_refs or partition_days:
+            db.commit()
+    return {"references": len(pending_refs), "execution_log_partition_days": partition_days}
+
+
+def upgrade_schema(engine: Engine) -> Dict:
+    """Create missing tables, add missing columns and indexes, then backfill derived columns"""
+    Base.metadata.create_all(bind=engine)
+    added = _add_missing_columns(engine)
+    indexes = _create_missing_indexes(engine)
+    backfilled = _backfill(engine)
+    if added or indexes:
+        logger.info("Schema upgraded: columns %s, indexes %s", added, indexes)
+    return {"columns": added, "indexes": indexes, "backfilled": backfilled}
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    print(upgrade_schema(engine))
@@ -1,7 +1,11 @@
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Integer, JSON, DECIMAL, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Enum, Float, ForeignKey, Integer, JSON, DECIMAL, Text, Index, UniqueConstraint, event, select, update, or_
+from sqlalchemy.orm import relationship, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql import func
 import uuid
+from datetime import datetime, timezone
+from typing import Optional
 from .database import Base
 
 def generate_uuid():
@@ -27,6 +31,7 @@ class User(Base):
 
 class Reference(Base):
     __tablename__ = "references"
+    __table_args__ = (Index("ix_references_org_created", "org_id", "created_at"),)
     id = Column(String(36), primary_key=True, default=generate_uuid)
     org_id = Column(String(36), ForeignKey("organizations.id"))
     name = Column(String(255), nullable=False)
@@ -36,9 +41,22 @@ class Reference(Base):
     status = Column(Enum('ACTIVE', 'ARCHIVED'), default='ACTIVE')
     process_status = Column(Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED'), default='QUEUED')
     metadata_json = Column(JSON, nullable=True) # Raw fields from CSV (price, etc.)
+    current_fingerprint_id = Column(String(36), nullable=True) # Newest fingerprint version
+    current_vector = Column(JSON, nullable=True) # Denormalized copy of current fingerprint vector
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    fingerprints = relationship("ReferenceFingerprint", back_populates="reference")
+    # Version history, newest first. fingerprints[0] may be a bulk re-vectorization
+    # checkpoint that is not current yet; read current_fingerprint instead.
+    fingerprints = relationship(
+        "ReferenceFingerprint",
+        back_populates="reference",
+        order_by="desc(ReferenceFingerprint.version)"
+    )
+    current_fingerprint = relationship(
+        "ReferenceFingerprint",
+        primaryjoin="foreign(Reference.current_fingerprint_id) == ReferenceFingerprint.id",
+        viewonly=True
+    )
 
 class ReferenceFingerprint(Base):
     __tablename__ = "reference_fingerprints"
@@ -52,8 +70,56 @@ class ReferenceFingerprint(Base):
     
     reference = relationship("Reference", back_populates="fingerprints")
 
+@event.listens_for(ReferenceFingerprint, "after_insert")
+@event.listens_for(ReferenceFingerprint, "after_update")
+def _sync_current_fingerprint(mapper, connection, target):
+    """Point the owning reference at this fingerprint unless it already has a newer version."""
+    refs = Reference.__table__
+    fps = ReferenceFingerprint.__table__
+    current_version = select(fps.c.version).where(
+        fps.c.id == refs.c.current_fingerprint_id
+    ).scalar_subquery()
+
+    result = connection.execute(
+        update(refs).where(
+            refs.c.id == target.reference_id,
+            or_(
+                refs.c.current_fingerprint_id.is_(None),
+                refs.c.current_fingerprint_id == target.id,
+                current_version <= (target.version or 1)
+            )
+        ).values(current_fingerprint_id=target.id, current_vector=target.vector)
+    )
+
+    # Keep an already loaded Reference in the same session consistent
+    session = object_session(target)
+    if result.rowcount and session is not None:
+        ref = session.identity_map.get(identity_key(Reference, target.reference_id))
+        if ref is not None:
+            set_committed_value(ref, "current_fingerprint_id", target.id)
+            set_committed_value(ref, "current_vector", target.vector)
+
+class ReferenceUpload(Base):
+    """Resumable chunked catalog upload, spooled to disk"""
+    __tablename__ = "reference_uploads"
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    org_id = Column(String(36), ForeignKey("organizations.id"))
+    filename = Column(String(255), nullable=False)
+    spool_path = Column(String(500), nullable=False)
+    status = Column(Enum('RECEIVING', 'PROCESSING', 'COMPLETED', 'FAILED'), default='RECEIVING')
+    received_chunks = Column(Integer, default=0)    # Chunks 0..n-1 acknowledged
+    received_bytes = Column(Integer, default=0)
+    rows_parsed = Column(Integer, default=0)
+    rows_inserted = Column(Integer, default=0)
+    rows_deduped = Column(Integer, default=0)
+    rows_vectorized = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (Index("ix_recipes_org_created", "org_id", "created_at"),)
     id = Column(String(36), primary_key=True, default=generate_uuid)
     org_id = Column(String(36), ForeignKey("organizations.id"))
     name = Column(String(255), nullable=False)
@@ -99,10 +165,14 @@ class Transform(Base):
 
 class Store(Base):
     __tablename__ = "stores"
+    __table_args__ = (
+        Index("ix_stores_org_status_region", "org_id", "status", "region"),
+    )
     id = Column(String(36), primary_key=True, default=generate_uuid)
     org_id = Column(String(36), ForeignKey("organizations.id"))
     name = Column(String(100), nullable=False)
     region = Column(String(50), nullable=True)
+    sales_tier = Column(Enum('LOW', 'MID', 'HIGH'), nullable=True)
     status = Column(Enum('ACTIVE', 'INACTIVE', 'WARNING'), default='ACTIVE')
     active_recipe_version_id = Column(String(36), ForeignKey("recipe_versions.id"), nullable=True)
     deviation = Column(DECIMAL(5, 2), default=0.0)
@@ -116,15 +186,46 @@ class Deployment(Base):
     recipe_version_id = Column(String(36), ForeignKey("recipe_versions.id"))
     scope = Column(Enum('ALL_STORES', 'SELECTED_STORES'), nullable=False)
     target_group_json = Column(JSON, nullable=True) # Filter criteria (Region, Sales Tier)
-    status = Column(Enum('SCHEDULED', 'DEPLOYED', 'ROLLED_BACK'), default='SCHEDULED')
+    status = Column(Enum('SCHEDULED', 'ROLLING_OUT', 'PAUSED', 'DEPLOYED', 'ROLLED_BACK'), default='SCHEDULED')
     scheduled_at = Column(DateTime(timezone=True), nullable=True)
+    rollout_stage = Column(Integer, nullable=True) # Index into target_group_json["rollout"]["stages"]
+    stage_started_at = Column(DateTime(timezone=True), nullable=True)
     rollback_condition_json = Column(JSON, nullable=True) # e.g. {"deviation_threshold": 10.0}
     rollback_policy_json = Column(JSON, nullable=True) # detailed policy
     last_health_check_at = Column(DateTime(timezone=True), nullable=True)
+    rollback_breach_since = Column(DateTime(timezone=True), nullable=True) # First health check in breach (sustained policy)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class DeploymentMembership(Base):
+    """Store reached by a deployment and the version it ran before (restored on rollback)"""
+    __tablename__ = "deployment_memberships"
+    __table_args__ = (
+        Index("ix_deployment_memberships_store_applied", "store_id", "applied_at"),
+    )
+    deployment_id = Column(String(36), ForeignKey("deployments.id"), primary_key=True)
+    store_id = Column(String(36), ForeignKey("stores.id"), primary_key=True)
+    previous_version_id = Column(String(36), ForeignKey("recipe_versions.id"), nullable=True)
+    stage = Column(Integer, nullable=True) # Rollout stage that reached the store
+    applied_at = Column(DateTime(timezone=True), nullable=False)
+    reverted_at = Column(DateTime(timezone=True), nullable=True)
+
+def partition_day_for(ts: Optional[datetime] = None) -> str:
+    """Daily partition key (UTC date) for an execution log timestamp"""
+    ts = ts or datetime.now(timezone.utc)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.strftime("%Y-%m-%d")
+
+def _default_partition_day(context):
+    return partition_day_for(context.get_current_parameters().get("ts"))
+
 class ExecutionLog(Base):
     __tablename__ = "execution_logs"
+    __table_args__ = (
+        Index("ix_execution_logs_org_ts", "org_id", "ts"),
+        Index("ix_execution_logs_store_ts", "store_id", "ts"),
+        Index("ix_execution_logs_partition_day", "partition_day"),
+    )
     id = Column(String(36), primary_key=True, default=generate_uuid)
     org_id = Column(String(36), ForeignKey("organizations.id"))
     store_id = Column(String(36), ForeignKey("stores.id"))
@@ -132,9 +233,64 @@ class ExecutionLog(Base):
     ts = Column(DateTime(timezone=True), server_default=func.now())
     event_type = Column(Enum('START', 'STEP', 'END', 'ERROR'), nullable=False)
     payload_json = Column(JSON, nullable=True)
+    partition_day = Column(String(10), nullable=True, default=_default_partition_day) # "YYYY-MM-DD" (UTC)
+
+class LogPartition(Base):
+    """Catalog of daily execution-log partitions and their lifecycle"""
+    __tablename__ = "log_partitions"
+    day = Column(String(10), primary_key=True) # "YYYY-MM-DD" (UTC)
+    status = Column(Enum('ACTIVE', 'COMPACTED', 'DROPPED'), default='ACTIVE')
+    row_count = Column(Integer, default=0)
+    step_count = Column(Integer, default=0)
+    compacted_at = Column(DateTime(timezone=True), nullable=True)
+    archive_path = Column(String(500), nullable=True) # Parquet file of the flattened raw rows
+    archived_at = Column(DateTime(timezone=True), nullable=True)
+    dropped_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SchedulerLease(Base):
+    """Per-job leader lease: only the holder runs the job until expires_at"""
+    __tablename__ = "scheduler_leases"
+    job_name = Column(String(100), primary_key=True)
+    holder = Column(String(255), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    last_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_finished_at = Column(DateTime(timezone=True), nullable=True)
+    last_status = Column(Enum('RUNNING', 'SUCCESS', 'FAILED'), nullable=True)
+    last_error = Column(Text, nullable=True)
+    run_count = Column(Integer, default=0)
+
+class Incident(Base):
+    """Alerts of one (recipe version, alert type, time bucket), analyzed once as a group"""
+    __tablename__ = "incidents"
+    __table_args__ = (
+        UniqueConstraint("org_id", "recipe_version_id", "alert_type", "bucket_start", name="uq_incident_key"),
+        Index("ix_incidents_status_last_seen", "status", "last_seen_at"),
+    )
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    org_id = Column(String(36), ForeignKey("organizations.id"))
+    recipe_version_id = Column(String(36), ForeignKey("recipe_versions.id"), nullable=True)
+    alert_type = Column(Enum('DEVIATION_HIGH', 'RECIPE_EXPIRED', 'SYSTEM_ERROR'), nullable=False)
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    severity = Column(Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL'), default='MEDIUM') # Worst alert so far
+    status = Column(Enum('OPEN', 'RESOLVED'), default='OPEN')
+    alert_count = Column(Integer, default=0) # Alerts stored as rows
+    suppressed_count = Column(Integer, default=0) # Alerts folded in without a row (rate limit)
+    suppressed_store_ids = Column(JSON, nullable=True) # Stores behind suppressed_count, each counted once
+    root_cause_analysis = Column(Text, nullable=True)
+    first_seen_at = Column(DateTime(timezone=True), nullable=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_org_resolved_created", "org_id", "is_resolved", "created_at"),
+        Index("ix_alerts_resolved_created", "is_resolved", "created_at"),
+        Index("ix_alerts_store_created", "store_id", "created_at"),
+        Index("ix_alerts_incident", "incident_id"),
+    )
     id = Column(String(36), primary_key=True, default=generate_uuid)
     org_id = Column(String(36), ForeignKey("organizations.id"))
     store_id = Column(String(36), ForeignKey("stores.id"), nullable=True)
@@ -142,6 +298,7 @@ class Alert(Base):
     severity = Column(Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL'), default='MEDIUM')
     message = Column(String(500), nullable=False)
     root_cause_analysis = Column(Text, nullable=True) # AI analysis result
+    incident_id = Column(String(36), ForeignKey("incidents.id"), nullable=True)
     is_resolved = Column(Integer, default=0)  # 0=false, 1=true
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -153,8 +310,24 @@ class StoreDailyMetric(Base):
     avg_deviation = Column(DECIMAL(5, 2))
     total_sales = Column(DECIMAL(10, 2))
     complaint_count = Column(Integer, default=0)
+    step_count = Column(Integer, default=0) # Measured STEP events rolled up by log compaction
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class DeviationRollup(Base):
+    """Periodic snapshot of the in-process rolling deviation aggregator"""
+    __tablename__ = "deviation_rollups"
+    __table_args__ = (UniqueConstraint("scope", "scope_id", "window_label", name="uq_deviation_rollup"),)
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    scope = Column(Enum('STORE', 'RECIPE_VERSION'), nullable=False)
+    scope_id = Column(String(36), nullable=False)
+    window_label = Column(String(16), nullable=False) # e.g. "1h"
+    window_seconds = Column(Integer, nullable=False)
+    sample_count = Column(Integer, default=0)
+    mean_deviation = Column(DECIMAL(7, 2))
+    p95_deviation = Column(DECIMAL(7, 2))
+    ewma_deviation = Column(DECIMAL(7, 2))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class LLMCache(Base):
     __tablename__ = "llm_cache"
     cache_key = Column(String(255), primary_key=True) # Hash of prompt+params
@@ -178,6 +351,44 @@ class Experiment(Base):
     status = Column(Enum('DRAFT', 'RUNNING', 'COMPLETED', 'STOPPED'), default='DRAFT')
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ExperimentUnit(Base):
+    """A store assigned to an experiment, with its pre-experiment baseline (CUPED covariate)"""
+    __tablename__ = "experiment_units"
+    __table_args__ = (Index("ix_experiment_units_store", "store_id"),)
+    experiment_id = Column(String(36), ForeignKey("experiments.id"), primary_key=True)
+    store_id = Column(String(36), ForeignKey("stores.id"), primary_key=True)
+    group_name = Column(Enum('CONTROL', 'TEST'), nullable=False)
+    baseline_deviation = Column(Float, nullable=True)
+    baseline_sales = Column(Float, nullable=True)
+    assigned_at = Column(DateTime(timezone=True), nullable=False)
+    # Running count / sum of each metric's observations at this store (its mean is the unit outcome)
+    step_deviation_n = Column(Integer, default=0)
+    step_deviation_sum = Column(Float, default=0.0)
+    daily_deviation_n = Column(Integer, default=0)
+    daily_deviation_sum = Column(Float, default=0.0)
+    daily_sales_n = Column(Integer, default=0)
+    daily_sales_sum = Column(Float, default=0.0)
+
+class ExperimentGroupStats(Base):
+    """
+    Running sufficient statistics of one metric in one experiment group, over
+    stores (the unit of randomization): y is a store's mean of the metric, x its
+    baseline, n the stores observed so far. Results are computed from this row alone.
+    """
+    __tablename__ = "experiment_group_stats"
+    __table_args__ = (UniqueConstraint("experiment_id", "group_name", "metric", name="uq_experiment_group_metric"),)
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    experiment_id = Column(String(36), ForeignKey("experiments.id"), nullable=False)
+    group_name = Column(Enum('CONTROL', 'TEST'), nullable=False)
+    metric = Column(String(32), nullable=False) # step_deviation | daily_deviation | daily_sales
+    n = Column(Integer, default=0)
+    sum_y = Column(Float, default=0.0)
+    sum_y2 = Column(Float, default=0.0)
+    sum_x = Column(Float, default=0.0)
+    sum_x2 = Column(Float, default=0.0)
+    sum_xy = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ExperimentRun(Base):
     """Batch experiment run for multiple strategy combinations"""
     __tablename__ = "experiment_runs"
@@ -185,12 +396,34 @@ class ExperimentRun(Base):
     org_id = Column(String(36), ForeignKey("organizations.id"))
     config_json = Column(JSON)              # {"modes": ["COPY","DISTANCE"], "alphas": [0.3,0.5]}
     status = Column(Enum('QUEUED', 'RUNNING', 'COMPLETED', 'FAILED'), default='QUEUED')
-    results_json = Column(JSON)             # [{config: {...}, result_id: "..."}]
+    results_json = Column(JSON)             # Summary / error only; combinations live in experiment_run_results
     total_combinations = Column(Integer)
     completed_count = Column(Integer, default=0)
     duration_ms = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0)   # Claims so far; fences writes from a superseded worker
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Last claim / progress write while RUNNING
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class ExperimentRunResult(Base):
+    """One scored combination of a batch experiment run, one column per metric"""
+    __tablename__ = "experiment_run_results"
+    __table_args__ = (
+        Index("ix_run_results_run_index", "run_id", "idx"),
+        Index("ix_run_results_run_lift", "run_id", "predicted_sales_lift"),
+        Index("ix_run_results_run_distance", "run_id", "distance_from_target"),
+    )
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    run_id = Column(String(36), ForeignKey("experiment_runs.id"), nullable=False)
+    idx = Column(Integer, nullable=False)   # Position in the target x mode x alpha grid (adaptive: evaluation order)
+    target_id = Column(String(36), nullable=False)
+    mode = Column(String(16), nullable=False)
+    alpha = Column(Float, nullable=False)
+    distance_from_target = Column(Float, nullable=True)
+    predicted_sales_lift = Column(Float, nullable=True)
+    execution_risk = Column(Float, nullable=True)
+    result_vector = Column(JSON, nullable=True)
+    error = Column(String(255), nullable=True)
+
 class DNASignature(Base):
     __tablename__ = "dna_signatures"
     id = Column(String(36), primary_key=True, default=generate_uuid)
@@ -1,67 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models
-from .. import models
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session, Query
+from typing import List, Optional
+from datetime import datetime, timezone
+from .. import models, schemas
 from ..database import get_db
-from ..services.llm_reliability import llm_service
+from ..services.alert_engine import alert_engine
+from ..services.alert_grouping import incident_grouper
+from ..services.pagination import keyset_paginate, apply_time_range
 
 router = APIRouter(
     prefix="/v1/alerts",
     tags=["alerts"],
 )
 
+def filter_alerts(
+    query: Query,
+    store_id: Optional[str] = None,
+    severity: Optional[schemas.AlertSeverity] = None,
+    alert_type: Optional[schemas.AlertType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Query:
+    """Server-side alert filters shared by the alert list endpoints"""
+    if store_id:
+        query = query.filter(models.Alert.store_id == store_id)
+    if severity:
+        query = query.filter(models.Alert.severity == severity.value)
+    if alert_type:
+        query = query.filter(models.Alert.alert_type == alert_type.value)
+    return apply_time_range(query, models.Alert.created_at, since, until)
+
 @router.get("/")
-def list_alerts(db: Session = Depends(get_db)):
-    """전체 Alert 조회 (미해결 우선)"""
-    alerts = db.query(models.Alert).order_by(
-        models.Alert.is_resolved,
-        models.Alert.created_at.desc()
-    ).limit(50).all()
-    return alerts
+def list_alerts(
+    response: Response,
+    org_id: Optional[str] = None,
+    resolved: Optional[bool] = None,
+    store_id: Optional[str] = None,
+    severity: Optional[schemas.AlertSeverity] = None,
+    alert_type: Optional[schemas.AlertType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """전체 Alert 조회 (미해결 우선, 다음 페이지는 X-Next-Cursor)"""
+    query = db.query(models.Alert)
+    if org_id:
+        query = query.filter(models.Alert.org_id == org_id)
+    if resolved is not None:
+        query = query.filter(models.Alert.is_resolved == (1 if resolved else 0))
+    query = filter_alerts(query, store_id, severity, alert_type, since, until)
+    return keyset_paginate(
+        query,
+        [(models.Alert.is_resolved, False), (models.Alert.created_at, True)],
+        models.Alert.id,
+        cursor=cursor, limit=limit, response=response
+    )
+
+@router.get("/incidents")
+def list_incidents(
+    response: Response,
+    org_id: Optional[str] = None,
+    status: Optional[str] = None,
+    recipe_version_id: Optional[str] = None,
+    alert_type: Optional[schemas.AlertType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """Incident (버전/유형/시간대별로 묶인 Alert) 조회, 최근 발생 순"""
+    query = db.query(models.Incident)
+    if org_id:
+        query = query.filter(models.Incident.org_id == org_id)
+    if status:
+        query = query.filter(models.Incident.status == status)
+    if recipe_version_id:
+        query = query.filter(models.Incident.recipe_version_id == recipe_version_id)
+    if alert_type:
+        query = query.filter(models.Incident.alert_type == alert_type.value)
+    query = apply_time_range(query, models.Incident.last_seen_at, since, until)
+    return keyset_paginate(
+        query,
+        [(models.Incident.last_seen_at, True)],
+        models.Incident.id,
+        cursor=cursor, limit=limit, response=response
+    )
+
+@router.post("/incidents/{incident_id}/resolve")
+def resolve_incident(incident_id: str, db: Session = Depends(get_db)):
+    """Incident와 소속 Alert 일괄 해결 처리"""
+    incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    open_alerts = db.query(models.Alert.id, models.Alert.store_id, models.Alert.alert_type).filter(
+        models.Alert.incident_id == incident_id,
+        models.Alert.is_resolved == 0
+    ).all()
+    if open_alerts:
+        db.execute(update(models.Alert), [{"id": a.id, "is_resolved": 1} for a in open_alerts])
+        alert_engine.track(db, [(a.store_id, a.alert_type) for a in open_alerts], delta=-1)
+    incident.status = "RESOLVED"
+    incident.resolved_at = datetime.now(timezone.utc)
+    db.commit()
+    return {"message": "Incident resolved", "incident_id": incident_id, "alerts_resolved": len(open_alerts)}
 
 @router.post("/check-deviations")
 def check_deviation_alerts(db: Session = Depends(get_db)):
-    """모든 매장 편차 확인 및 15% 초과 시 Alert 자동 생성"""
-    stores = db.query(models.Store).all()
-    created_count = 0
-    
-    for store in stores:
-        deviation = float(store.deviation) if store.deviation else 0
-        
-        if deviation > 15:
-            # 이미 미해결 Alert이 있는지 확인
-            existing = db.query(models.Alert).filter(
-                models.Alert.store_id == store.id,
-                models.Alert.alert_type == 'DEVIATION_HIGH',
-                models.Alert.is_resolved == 0
-            ).first()
-            
-            if not existing:
-                severity = 'CRITICAL' if deviation > 25 else 'HIGH' if deviation > 20 else 'MEDIUM'
-                alert = models.Alert(
-                    org_id=store.org_id,
-                    store_id=store.id,
-                    alert_type='DEVIATION_HIGH',
-                    severity=severity,
-                    message=f"{store.name} 편차 {deviation:.1f}% - 즉시 점검 필요"
-                )
-                
-                # AI Root Cause Analysis for Critical Alerts
-                if severity == 'CRITICAL':
-                    prompt = f"Store {store.name} deviation is {deviation}%. Logs: None. Estimate root cause."
-                    # Use LLM Service (with Cache!)
-                    try:
-                        analysis = llm_service.safe_generate(prompt, db=db)
-                        alert.root_cause_analysis = analysis.get("content", "No analysis")
-                    except Exception as e:
-                        alert.root_cause_analysis = f"Analysis failed: {str(e)}"
-                        
-                db.add(alert)
-                created_count += 1
-    
+    """
+    매장 편차 전체 재평가 (수동 트리거).
+    평소에는 로그 수집 시 alert_engine이 즉시 평가하므로, 임계값을 넘는 매장만 읽는다.
+    """
+    created_count, total_checked = alert_engine.check_stores(db)
     db.commit()
-    return {"message": f"{created_count} new alerts created", "total_checked": len(stores)}
+    # Alerts are committed first; analysis commits on its own
+    incident_grouper.analyze_pending(db)
+    return {"message": f"{created_count} new alerts created", "total_checked": total_checked}
 
 @router.post("/{alert_id}/resolve")
 def resolve_alert(alert_id: str, db: Session = Depends(get_db)):
@@ -70,6 +128,8 @@ def resolve_alert(alert_id: str, db: Session = Depends(get_db)):
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    alert.is_resolved = 1
+    if not alert.is_resolved:
+        alert.is_resolved = 1
+        alert_engine.track(db, [(alert.store_id, alert.alert_type)], delta=-1)
     db.commit()
     return {"message": "Alert resolved", "alert_id": alert_id}
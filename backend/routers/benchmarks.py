@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
 from backend import models
-from backend.database import get_db
+from backend.database import SessionLocal, get_db
 from backend.services.llm_cache import llm_cache
-from backend.services.batch_experiments import run_batch_experiment, get_experiment_run_status
+from backend.services.batch_experiments import (
+    create_batch_run, experiment_run_events, get_experiment_run_status, list_run_results, run_batch_in_background
+)
 
 router = APIRouter(
     prefix="/v1",
@@ -20,6 +23,10 @@ class BatchExperimentRequest(BaseModel):
     target_reference_ids: List[str]
     modes: List[str] = ["COPY", "DISTANCE", "REDIRECT"]
     alphas: List[float] = [0.3, 0.5, 0.7]
+    search_mode: str = "grid"        # "adaptive": successive halving, alphas as a min..max range
+    budget: Optional[int] = None     # adaptive: max evaluations (default 10% of the grid)
+    objective: Optional[str] = None  # adaptive: score | predicted_sales_lift | distance_from_target
+    seed: int = 0
 
 class BatchExperimentResponse(BaseModel):
     experiment_id: str
@@ -37,40 +44,84 @@ class BenchmarkStats(BaseModel):
 @router.post("/experiments/run", response_model=BatchExperimentResponse)
 def run_experiment(
     request: BatchExperimentRequest,
+    background_tasks: BackgroundTasks,
     org_id: str = "demo_org",
     db: Session = Depends(get_db)
 ):
     """
-    Run batch experiment with multiple strategy combinations.
-    Processes all mode x alpha x target combinations.
+    Queue a batch experiment over every mode x alpha x target combination,
+    or with search_mode="adaptive" over the points a budgeted search picks
+    (best strategy in the run's summary).
+    Returns the run ID immediately; combinations are scored on a worker pool
+    (progress at /experiments/{run_id}/status).
     """
     try:
-        run = run_batch_experiment(
+        run = create_batch_run(
+            db,
             base_reference_id=request.base_reference_id,
             target_reference_ids=request.target_reference_ids,
             modes=request.modes,
             alphas=request.alphas,
             org_id=org_id,
-            db=db
-        )
-        
-        return BatchExperimentResponse(
-            experiment_id=run.id,
-            total_combinations=run.total_combinations,
-            status=run.status
+            search_mode=request.search_mode,
+            budget=request.budget,
+            objective=request.objective,
+            seed=request.seed
         )
     except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    background_tasks.add_task(run_batch_in_background, run.id, SessionLocal)
+    return BatchExperimentResponse(
+        experiment_id=run.id,
+        total_combinations=run.total_combinations,
+        status=run.status
+    )
 
 @router.get("/experiments/{run_id}/status")
-def get_experiment_status(run_id: str, db: Session = Depends(get_db)):
-    """Get experiment run status and results"""
+def get_experiment_status(run_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Get experiment run status and progress (results: /experiments/runs/{run_id}/results).
+    With `Accept: text/event-stream` progress is streamed instead:
+    - type: progress (completed / total)
+    - type: complete
+    - type: error
+    """
     try:
-        return get_experiment_run_status(run_id, db)
+        status = get_experiment_run_status(run_id, db)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        return status
+    return StreamingResponse(
+        experiment_run_events(run_id, SessionLocal),
+        media_type="text/event-stream"
+    )
+
+@router.get("/experiments/runs/{run_id}/results")
+def get_experiment_run_results(
+    run_id: str,
+    response: Response,
+    sort: str = "index",
+    order: str = "asc",
+    mode: Optional[str] = None,
+    target_id: Optional[str] = None,
+    include_errors: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Paged run results (다음 페이지는 X-Next-Cursor).
+    Top-k by predicted lift: ?sort=predicted_sales_lift&order=desc&limit=k
+    """
+    try:
+        get_experiment_run_status(run_id, db)
+        return list_run_results(
+            db, run_id, sort=sort, descending=order == "desc", mode=mode, target_id=target_id,
+            include_errors=include_errors, cursor=cursor, limit=limit, response=response
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404 if "not found" in str(e) else 400, detail=str(e))
 
 @router.get("/benchmarks", response_model=BenchmarkStats)
 def get_benchmarks(db: Session = Depends(get_db)):
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import models, schemas
+from ..database import get_db
+from ..services import deployment_service
+from ..services.rollback_engine import LIVE_STATUSES, rollback_engine
+from ..services.rollout_engine import rollout_engine
+from ..services.pagination import keyset_paginate
+
+router = APIRouter(
+    prefix="/v1/deployments",
+    tags=["deployments"],
+)
+
+@router.get("/", response_model=List[schemas.Deployment])
+def list_deployments(
+    response: Response,
+    org_id: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """배포 목록 (최신순, 다음 페이지는 X-Next-Cursor)"""
+    query = db.query(models.Deployment)
+    if org_id:
+        query = query.filter(models.Deployment.org_id == org_id)
+    if status:
+        query = query.filter(models.Deployment.status == status)
+    return keyset_paginate(
+        query,
+        [(models.Deployment.created_at, True)],
+        models.Deployment.id,
+        cursor=cursor, limit=limit, response=response
+    )
+
+@router.post("/", response_model=schemas.Deployment)
+def create_deployment(deployment: schemas.DeploymentCreate, org_id: str = "demo_org", db: Session = Depends(get_db)):
+    """승인된 버전 배포 (scheduled_at이 없거나 지났으면 즉시 적용)"""
+    return deployment_service.create_deployment(db, deployment, org_id)
+
+@router.post("/check-rollback")
+def check_rollback(db: Session = Depends(get_db)):
+    """전체 배포 헬스 체크 및 자동 롤백"""
+    rolled_back = rollback_engine.run(db)
+    return {"rolled_back": rolled_back, "count": len(rolled_back)}
+
+@router.post("/check-rollout")
+def check_rollout(db: Session = Depends(get_db)):
+    """단계별 배포 진행: 대조군 대비 편차 확인 후 승격 / 일시정지 / 롤백"""
+    return rollout_engine.run(db)
+
+@router.get("/{deployment_id}/rollout")
+def get_rollout(deployment_id: str, db: Session = Depends(get_db)):
+    """단계별 배포 현황 (현재 단계 매장 vs 대조군 편차)"""
+    return rollout_engine.status(db, deployment_id)
+
+@router.post("/{deployment_id}/rollout/promote")
+def promote_rollout(deployment_id: str, force: bool = False, db: Session = Depends(get_db)):
+    """다음 단계로 수동 승격 (편차 초과 시 force 필요)"""
+    return rollout_engine.promote(db, deployment_id, force=force)
+
+@router.post("/{deployment_id}/rollout/pause")
+def pause_rollout(deployment_id: str, db: Session = Depends(get_db)):
+    """단계별 배포 일시정지"""
+    return rollout_engine.set_paused(db, deployment_id, True)
+
+@router.post("/{deployment_id}/rollout/resume")
+def resume_rollout(deployment_id: str, db: Session = Depends(get_db)):
+    """일시정지된 배포 재개 (현재 단계 관찰 시간 재시작)"""
+    return rollout_engine.set_paused(db, deployment_id, False)
+
+@router.get("/{deployment_id}/stores")
+def list_deployment_stores(deployment_id: str, db: Session = Depends(get_db)):
+    """배포 대상 매장과 배포 전 버전"""
+    rows = db.query(models.DeploymentMembership).filter(
+        models.DeploymentMembership.deployment_id == deployment_id
+    ).all()
+    return [
+        {
+            "store_id": m.store_id,
+            "previous_version_id": m.previous_version_id,
+            "stage": m.stage,
+            "applied_at": m.applied_at,
+            "reverted_at": m.reverted_at
+        }
+        for m in rows
+    ]
+
+@router.post("/{deployment_id}/rollback")
+def rollback_deployment(deployment_id: str, db: Session = Depends(get_db)):
+    """수동 롤백: 모든 매장을 배포 전 버전으로 복구"""
+    deployment = db.query(models.Deployment).filter(models.Deployment.id == deployment_id).first()
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    if deployment.status not in LIVE_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Deployment is {deployment.status}")
+    deployment_service.backfill_memberships(db)
+    reverted = deployment_service.revert_stores(db, [deployment_id])
+    deployment.status = "ROLLED_BACK"
+    db.commit()
+    return {"message": "Deployment rolled back", "deployment_id": deployment_id, "stores_reverted": reverted}
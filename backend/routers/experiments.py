@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from typing import Optional
 from .. import models, schemas
 from ..database import get_db
 from ..services.experiment_service import experiment_service
+from ..services.experiment_stats import experiment_stats
 
 router = APIRouter(
     prefix="/v1/experiments",
@@ -30,3 +32,23 @@ def assign_experiment(experiment_id: str, db: Session = Depends(get_db)):
         return result
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{experiment_id}/results")
+def experiment_results(
+    experiment_id: str,
+    alpha: Optional[float] = None,
+    tau: Optional[float] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Running A/B results per metric: Welch t-test, CUPED and the sequential
+    (mSPRT) stopping boundary, computed from the group statistics kept at ingest.
+    """
+    experiment = db.query(models.Experiment).filter(models.Experiment.id == experiment_id).first()
+    if not experiment:
+        raise HTTPException(status_code=404, detail="Experiment not found")
+    return {
+        "experiment_id": experiment.id,
+        "status": experiment.status,
+        "metrics": experiment_stats.results(db, experiment.id, alpha=alpha, tau=tau)
+    }
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 
 from backend import models, schemas
 from backend.database import get_db
-from backend.services.log_processor import process_execution_log
+from backend.services.log_processor import process_execution_log, process_execution_log_batch
+from backend.services.log_buffer import log_buffer
+from backend.services.log_bus import log_bus
+from backend.services.deviation_aggregator import deviation_aggregator, STORE, RECIPE_VERSION
+from backend.services.log_partitions import run_log_maintenance
+from backend.services.log_archive import query_archive
+from backend.services.pagination import keyset_paginate, apply_time_range
+from backend.routers.alerts import filter_alerts
 
 router = APIRouter(
     prefix="/v1/logs",
@@ -13,14 +26,67 @@ router = APIRouter(
 
 @router.get("/", response_model=List[schemas.ExecutionLog])
 def get_execution_logs(
+    response: Response,
     org_id: str = "demo_org",
+    store_id: Optional[str] = None,
+    event_type: Optional[schemas.ExecutionLogType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    """Get execution logs list"""
-    return db.query(models.ExecutionLog).filter(
-        models.ExecutionLog.org_id == org_id
-    ).order_by(models.ExecutionLog.ts.desc()).limit(limit).all()
+    """Get execution logs list, newest first. Pass the X-Next-Cursor header back as `cursor` for the next page."""
+    query = db.query(models.ExecutionLog).filter(models.ExecutionLog.org_id == org_id)
+    if store_id:
+        query = query.filter(models.ExecutionLog.store_id == store_id)
+    if event_type:
+        query = query.filter(models.ExecutionLog.event_type == event_type.value)
+    query = apply_time_range(query, models.ExecutionLog.ts, since, until)
+    return keyset_paginate(
+        query, [(models.ExecutionLog.ts, True)], models.ExecutionLog.id,
+        cursor=cursor, limit=limit, response=response
+    )
+
+STREAM_KEEPALIVE_SECONDS = 15.0
+
+@router.get("/stream")
+async def stream_logs(
+    request: Request,
+    org_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    event_type: Optional[schemas.ExecutionLogType] = None,
+    min_deviation: Optional[float] = None
+):
+    """
+    Live tail of committed execution logs (SSE). Filters are evaluated server-side.
+    Events:
+    - type: log (execution log + deviation_pct)
+    - type: dropped (this client fell behind; `count` events were skipped so far)
+    """
+    async def event_stream():
+        sub = log_bus.subscribe(
+            org_id=org_id,
+            store_id=store_id,
+            event_type=event_type.value if event_type else None,
+            min_deviation=min_deviation
+        )
+        reported_drops = 0
+        try:
+            while not await request.is_disconnected():
+                try:
+                    log_event = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if sub.dropped != reported_drops:
+                    reported_drops = sub.dropped
+                    yield f"data: {json.dumps({'type': 'dropped', 'count': reported_drops})}\n\n"
+                yield f"data: {json.dumps({'type': 'log', **log_event})}\n\n"
+        finally:
+            log_bus.unsubscribe(sub)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @router.post("/execution", response_model=schemas.ExecutionLog)
 def create_execution_log(
@@ -38,10 +104,146 @@ def create_execution_log(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/execution/async", status_code=202)
+async def enqueue_execution_log(
+    log_data: schemas.ExecutionLogCreate,
+    org_id: str = "demo_org", # Auth placeholder
+):
+    """
+    Ingest execution log without waiting on the database.
+    The log is written (and deviation-checked) by the write-behind buffer's next flush.
+    Returns 429 when the buffer is full.
+    """
+    log_id = log_buffer.submit(log_data, org_id)
+    return {"id": log_id, "status": "queued"}
+
+@router.get("/ingest/metrics")
+def get_ingest_metrics():
+    """Write-behind buffer metrics (queue depth, flush latency, rows/sec)"""
+    return log_buffer.metrics()
+
+@router.post("/execution/batch")
+async def create_execution_log_batch(
+    request: Request,
+    org_id: str = "demo_org", # Auth placeholder
+    db: Session = Depends(get_db)
+):
+    """
+    Ingest many execution logs in one request.
+    Body is a JSON array, or NDJSON (one log per line) with
+    Content-Type application/x-ndjson, read as it streams in.
+    Returns per-item status; invalid items are rejected without failing the batch.
+    """
+    content_type = request.headers.get("content-type", "")
+    items = []
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(_parse_ndjson_line(line) for line in lines if line.strip())
+        if buffer.strip():
+            items.append(_parse_ndjson_line(buffer))
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array of logs")
+
+    try:
+        return await run_in_threadpool(process_execution_log_batch, items, org_id, db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Rejected per item by the batch validator
+        return None
+
+@router.get("/deviation")
+def get_rolling_deviation(
+    store_id: Optional[str] = None,
+    recipe_version_id: Optional[str] = None
+):
+    """Live rolling deviation (count / mean / p95 per window, EWMA) for a store or recipe version"""
+    if store_id:
+        snapshot = deviation_aggregator.snapshot(STORE, store_id)
+    elif recipe_version_id:
+        snapshot = deviation_aggregator.snapshot(RECIPE_VERSION, recipe_version_id)
+    else:
+        raise HTTPException(status_code=400, detail="store_id or recipe_version_id is required")
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No deviation data in memory")
+    return snapshot
+
+@router.get("/partitions")
+def get_log_partitions(db: Session = Depends(get_db)):
+    """Daily execution-log partitions and their compaction / retention status"""
+    return db.query(models.LogPartition).order_by(models.LogPartition.day.desc()).all()
+
+@router.post("/maintenance")
+def run_maintenance(retention_days: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Compact closed daily partitions into StoreDailyMetric and
+    drop raw logs older than the retention window.
+    """
+    return run_log_maintenance(db, retention_days=retention_days)
+
+@router.get("/analytics")
+def get_log_analytics(
+    group_by: str = "step_name",
+    metric: str = "deviation_pct",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    org_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    region: Optional[str] = None,
+    event_type: Optional[str] = None,
+    step_name: Optional[str] = None,
+    limit: int = 100
+):
+    """
+    Grouped aggregations over the Parquet log archive (closed, compacted days).
+    e.g. ?group_by=region,step_name ranks steps by mean deviation per region.
+    `since` / `until` are partition days (YYYY-MM-DD, until exclusive).
+    """
+    return query_archive(
+        [c.strip() for c in group_by.split(",") if c.strip()],
+        metric=metric,
+        since=since,
+        until=until,
+        org_id=org_id,
+        store_id=store_id,
+        region=region,
+        event_type=event_type,
+        step_name=step_name,
+        limit=limit
+    )
+
 @router.get("/alerts", response_model=List[schemas.Alert])
-def get_alerts(org_id: str = "demo_org", db: Session = Depends(get_db)):
-    """Get active alerts"""
-    return db.query(models.Alert).filter(
+def get_alerts(
+    response: Response,
+    org_id: str = "demo_org",
+    store_id: Optional[str] = None,
+    severity: Optional[schemas.AlertSeverity] = None,
+    alert_type: Optional[schemas.AlertType] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Get active alerts, newest first (keyset paginated via X-Next-Cursor)"""
+    query = db.query(models.Alert).filter(
         models.Alert.org_id == org_id,
         models.Alert.is_resolved == 0
-    ).order_by(models.Alert.created_at.desc()).all()
+    )
+    query = filter_alerts(query, store_id, severity, alert_type, since, until)
+    return keyset_paginate(
+        query, [(models.Alert.created_at, True)], models.Alert.id,
+        cursor=cursor, limit=limit, response=response
+    )
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from .. import models, schemas
 from ..database import get_db
 from ..services import version_control
+from ..services.pagination import keyset_paginate
 
 router = APIRouter(
     prefix="/v1/recipes",
@@ -20,9 +21,27 @@ def create_recipe(recipe: schemas.RecipeCreate, db: Session = Depends(get_db)):
     return db_recipe
 
 @router.get("/", response_model=List[schemas.Recipe])
-def read_recipes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    recipes = db.query(models.Recipe).offset(skip).limit(limit).all()
-    return recipes
+def read_recipes(
+    response: Response,
+    org_id: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Newest first; pass the X-Next-Cursor header back as `cursor` for the next page"""
+    query = db.query(models.Recipe)
+    if org_id:
+        query = query.filter(models.Recipe.org_id == org_id)
+    if status:
+        query = query.filter(models.Recipe.status == status)
+    if category:
+        query = query.filter(models.Recipe.menu_category == category)
+    return keyset_paginate(
+        query, [(models.Recipe.created_at, True)], models.Recipe.id,
+        cursor=cursor, limit=limit, response=response
+    )
 
 @router.post("/{recipe_id}/versions", response_model=schemas.RecipeVersion)
 def create_recipe_version(recipe_id: str, version: schemas.RecipeVersionCreate, db: Session = Depends(get_db)):
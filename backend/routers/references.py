@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from backend import models, schemas
 from backend.database import get_db, SessionLocal
 from backend.services.reference_pipeline import process_file_upload, run_metric_estimation
+from backend.services.bulk_vectorizer import extract_keywords, revectorize_references
+from backend.services import upload_sessions, reference_arrow
+from backend.services.pagination import keyset_paginate
 
 router = APIRouter(
     prefix="/v1/references",
@@ -46,6 +50,57 @@ def upload_references(
     
     return new_refs
 
+@router.post("/uploads", response_model=schemas.ReferenceUpload)
+def start_chunked_upload(
+    filename: str,
+    org_id: str = "default_org", # TODO: Get from auth
+    db: Session = Depends(get_db)
+):
+    """Open a resumable upload session; send chunks 0..n-1, then call /complete"""
+    return upload_sessions.create_upload_session(db, org_id, filename)
+
+@router.put("/uploads/{upload_id}/chunks/{index}", response_model=schemas.ReferenceUpload)
+def upload_chunk(
+    upload_id: str,
+    index: int,
+    chunk: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Append one chunk (spooled to disk). Already acknowledged chunks are ignored;
+    after a failure, resume from `received_chunks`.
+    """
+    return upload_sessions.append_chunk(db, upload_id, index, chunk.file)
+
+@router.get("/uploads/{upload_id}", response_model=schemas.ReferenceUpload)
+def get_chunked_upload(upload_id: str, db: Session = Depends(get_db)):
+    return upload_sessions.get_upload(db, upload_id)
+
+@router.post("/uploads/{upload_id}/complete", response_model=schemas.ReferenceUpload)
+def complete_chunked_upload(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Finish receiving and start parsing/inserting/vectorizing in the background"""
+    upload = upload_sessions.complete_upload(db, upload_id)
+    background_tasks.add_task(upload_sessions.process_upload, upload.id, SessionLocal)
+    return upload
+
+@router.get("/uploads/{upload_id}/events")
+def stream_upload_progress(upload_id: str):
+    """
+    Stream upload progress.
+    Events:
+    - type: progress (rows parsed / inserted / deduped / vectorized)
+    - type: complete
+    - type: error
+    """
+    return StreamingResponse(
+        upload_sessions.upload_progress_events(upload_id, SessionLocal),
+        media_type="text/event-stream"
+    )
+
 @router.post("/demo/seed")
 def seed_sample_data(db: Session = Depends(get_db)):
     """Create basic sample data for demonstration"""
@@ -104,6 +159,47 @@ def seed_sample_data(db: Session = Depends(get_db)):
     db.commit()
     return {"message": "Sample data seeded successfully", "org_id": "demo_org"}
 
+@router.post("/revectorize")
+def revectorize(
+    org_id: Optional[str] = None,
+    category: Optional[str] = None,
+    version: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Re-fingerprint all matching references with a bumped version.
+    Pass the `version` of an interrupted run to resume it.
+    """
+    return revectorize_references(db, org_id=org_id, category=category, version=version)
+
+@router.get("/export")
+def export_references(
+    org_id: Optional[str] = None,
+    category: Optional[str] = None,
+    format: str = "parquet"
+):
+    """
+    Stream references with their current fingerprint as Parquet or an Arrow IPC stream.
+    Vectors are a fixed-size list<double> column.
+    """
+    stream = reference_arrow.export_references(SessionLocal, org_id=org_id, category=category, fmt=format)
+    return StreamingResponse(
+        stream,
+        media_type=reference_arrow.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="references.{format}"'}
+    )
+
+@router.post("/import")
+def import_references(
+    file: UploadFile = File(...),
+    org_id: Optional[str] = None,
+    format: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Bulk import a Parquet/Arrow export (existing reference ids are skipped)"""
+    fmt = format or ("arrow" if file.filename.endswith((".arrow", ".arrows")) else "parquet")
+    return reference_arrow.import_references(db, file.file, org_id=org_id, fmt=fmt)
+
 @router.post("/{reference_id}/vectorize")
 def vectorize_reference(reference_id: str, db: Session = Depends(get_db)):
     """Generate vector based on keywords in metadata"""
@@ -111,27 +207,18 @@ def vectorize_reference(reference_id: str, db: Session = Depends(get_db)):
     if not ref:
         raise HTTPException(status_code=404, detail="Reference not found")
         
-    # Extract keywords
-    metadata = ref.metadata_json or {}
-    keywords = metadata.get("keywords", [])
-    if isinstance(keywords, str):
-        keywords = [k.strip() for k in keywords.split(",")]
-        
-    if not keywords:
-        # If no keywords, fail or return empty logic
-        # For demo, let's allow trying to parse 'menu_category' as a fallback keyword
-        if ref.menu_category:
-            keywords.append(ref.menu_category)
+    # Extract keywords (falls back to 'menu_category' when metadata has none)
+    keywords = extract_keywords(ref.metadata_json, ref.menu_category)
     
     # Generate Vector
     from ..services.rule_vectorizer import rule_vectorizer
     vector = rule_vectorizer.vectorize_from_keywords(keywords)
     
     # Save to Fingerprint
-    # Check existing fingerprint
-    fingerprint = db.query(models.ReferenceFingerprint).filter(
+    # Update the current fingerprint; the newest version may be an unflipped bulk checkpoint
+    fingerprint = ref.current_fingerprint or db.query(models.ReferenceFingerprint).filter(
         models.ReferenceFingerprint.reference_id == reference_id
-    ).first()
+    ).order_by(models.ReferenceFingerprint.version.desc()).first()
     
     if fingerprint:
         fingerprint.vector = vector
@@ -223,9 +310,27 @@ def create_reference(ref: schemas.ReferenceCreate, db: Session = Depends(get_db)
     return db_ref
 
 @router.get("/", response_model=List[schemas.Reference])
-def read_references(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    refs = db.query(models.Reference).offset(skip).limit(limit).all()
-    return refs
+def read_references(
+    response: Response,
+    org_id: Optional[str] = None,
+    category: Optional[str] = None,
+    reference_type: Optional[schemas.ReferenceType] = None,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Newest first; pass the X-Next-Cursor header back as `cursor` for the next page"""
+    query = db.query(models.Reference)
+    if org_id:
+        query = query.filter(models.Reference.org_id == org_id)
+    if category:
+        query = query.filter(models.Reference.menu_category == category)
+    if reference_type:
+        query = query.filter(models.Reference.reference_type == reference_type.value)
+    return keyset_paginate(
+        query, [(models.Reference.created_at, True)], models.Reference.id,
+        cursor=cursor, limit=limit, response=response
+    )
 
 @router.get("/{reference_id}", response_model=schemas.Reference)
 def read_reference(reference_id: str, db: Session = Depends(get_db)):
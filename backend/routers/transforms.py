@@ -5,6 +5,7 @@ import uuid
 from .. import models, schemas
 from ..database import get_db
 from ..services import strategy_engine
+from ..services.reference_repository import reference_repository
 
 router = APIRouter(
     prefix="/v1/transforms",
@@ -27,17 +28,22 @@ def process_transform(transform_id: str):
         db.commit()
 
         # Fetch References
-        ref1 = db.query(models.Reference).filter(models.Reference.id == transform.reference_1_id).first()
-        ref2 = db.query(models.Reference).filter(models.Reference.id == transform.reference_2_id).first()
+        refs = {
+            r.id: r for r in reference_repository.load_with_vectors(
+                db, [transform.reference_1_id, transform.reference_2_id]
+            )
+        }
+        ref1 = refs.get(transform.reference_1_id)
+        ref2 = refs.get(transform.reference_2_id)
         
         if not ref1 or not ref2:
             transform.status = 'FAILED'
             db.commit()
             return
 
-        # Extract Vectors (Assume latest fingerprint v1 exists for MVP)
-        vec1 = ref1.fingerprints[0].vector if ref1.fingerprints else []
-        vec2 = ref2.fingerprints[0].vector if ref2.fingerprints else []
+        # Extract Vectors (current fingerprint pointer)
+        vec1 = ref1.current_vector or []
+        vec2 = ref2.current_vector or []
         
         if not vec1 or not vec2:
             transform.status = 'FAILED'
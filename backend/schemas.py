@@ -82,11 +82,37 @@ class Reference(ReferenceBase):
     org_id: str
     created_at: datetime
     process_status: ReferenceProcessStatus
+    current_fingerprint_id: Optional[str] = None
+    current_vector: Optional[List[float]] = None
     fingerprints: List[ReferenceFingerprint] = []
 
     class Config:
         orm_mode = True
 
+# --- Reference Upload Schemas ---
+class ReferenceUploadStatus(str, Enum):
+    RECEIVING = 'RECEIVING'
+    PROCESSING = 'PROCESSING'
+    COMPLETED = 'COMPLETED'
+    FAILED = 'FAILED'
+
+class ReferenceUpload(BaseModel):
+    id: str
+    org_id: str
+    filename: str
+    status: ReferenceUploadStatus
+    received_chunks: int = 0
+    received_bytes: int = 0
+    rows_parsed: int = 0
+    rows_inserted: int = 0
+    rows_deduped: int = 0
+    rows_vectorized: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # --- Recipe Version Schemas ---
 class RecipeVersionBase(BaseModel):
     version_label: str
@@ -158,6 +184,7 @@ class StoreBase(BaseModel):
     name: str
     org_id: str
     region: Optional[str] = None
+    sales_tier: Optional[str] = None
 
 class StoreCreate(StoreBase):
     pass
@@ -188,6 +215,8 @@ class DeploymentCreate(DeploymentBase):
 class Deployment(DeploymentBase):
     id: str
     status: str
+    rollout_stage: Optional[int] = None
+    stage_started_at: Optional[datetime] = None
     created_at: datetime
 
     class Config:
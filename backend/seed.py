@@ -1,10 +1,11 @@
 from sqlalchemy.orm import Session
 from .database import SessionLocal, engine
 from . import models
+from .migrations import upgrade_schema
 import uuid
 
-# Ensure tables exist
-models.Base.metadata.create_all(bind=engine)
+# Ensure tables (and columns added since) exist
+upgrade_schema(engine)
 
 def seed_data():
     db = SessionLocal()
@@ -2,6 +2,7 @@ import random
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
 from backend import models
+from backend.services.reference_repository import reference_repository
 
 AXES = ["매운맛", "단맛", "감칠맛", "상큼함", "풍미"]
 
@@ -95,13 +96,12 @@ def calculate_synergy_map(
     Calculate synergy and conflict between multiple references.
     """
     refs = []
-    for ref_id in reference_ids:
-        ref = db.query(models.Reference).filter(models.Reference.id == ref_id).first()
-        if ref and ref.fingerprints:
+    for ref in reference_repository.load_with_vectors(db, reference_ids):
+        if ref.current_vector:
             refs.append({
                 "id": ref.id,
                 "name": ref.name,
-                "vector": ref.fingerprints[0].vector[:5]
+                "vector": ref.current_vector[:5]
             })
     
     if len(refs) < 2:
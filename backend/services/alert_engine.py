@@ -0,0 +1,310 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .alert_grouping import incident_grouper, SEVERITY_RANK
+from ..config import float_env
+
+THRESHOLD = "threshold"
+RATE_OF_CHANGE = "rate_of_change"
+SUSTAINED = "sustained"
+RULE_KINDS = (THRESHOLD, RATE_OF_CHANGE, SUSTAINED)
+
+HISTORY_SIZE = 256
+# Seconds before the open-alert index is reloaded, picking up alerts resolved
+# or opened by other replicas and workers
+INDEX_TTL = float_env("FLAVOROS_ALERT_INDEX_TTL", 60.0)
+_PENDING_KEY = "alert_engine_open"  # session.info: {AlertEngine: Counter} until commit
+
+
+class AlertRule(NamedTuple):
+    """
+    Declarative rule over a store's rolling deviation (Store.deviation).
+
+    - threshold: deviation > threshold
+    - rate_of_change: deviation rose by more than `threshold` points within `window_seconds`
+    - sustained: deviation stayed above `threshold` for `window_seconds`
+
+    `escalations` raise the severity when the deviation exceeds each bound.
+    `message` is formatted with store, deviation, change and minutes.
+    """
+    name: str
+    kind: str
+    threshold: float
+    severity: str = schemas.AlertSeverity.MEDIUM.value
+    window_seconds: int = 0
+    escalations: Tuple[Tuple[float, str], ...] = ()
+    alert_type: str = schemas.AlertType.DEVIATION_HIGH.value
+    message: str = "{store} 편차 {deviation:.1f}% - 즉시 점검 필요"
+
+    def severity_for(self, deviation: float) -> str:
+        severity = self.severity
+        for bound, escalated in self.escalations:
+            if deviation > bound and SEVERITY_RANK[escalated] > SEVERITY_RANK[severity]:
+                severity = escalated
+        return severity
+
+
+DEFAULT_RULES = [
+    AlertRule(
+        name="deviation_threshold",
+        kind=THRESHOLD,
+        threshold=15.0,
+        escalations=((20.0, "HIGH"), (25.0, "CRITICAL"))
+    ),
+    AlertRule(
+        name="deviation_spike",
+        kind=RATE_OF_CHANGE,
+        threshold=10.0,
+        window_seconds=300,
+        severity="HIGH",
+        message="{store} 편차 급증 +{change:.1f}%p ({deviation:.1f}%) - 즉시 점검 필요"
+    ),
+    AlertRule(
+        name="deviation_sustained",
+        kind=SUSTAINED,
+        threshold=10.0,
+        window_seconds=600,
+        message="{store} 편차 {deviation:.1f}% - {minutes:.0f}분 이상 지속"
+    ),
+]
+
+
+def load_rules(raw: Optional[str]) -> List[AlertRule]:
+    """Rules from a JSON list of AlertRule fields (FLAVOROS_ALERT_RULES), else the defaults"""
+    if not raw:
+        return list(DEFAULT_RULES)
+    try:
+        rules = [
+            AlertRule(**{**item, "escalations": tuple(tuple(e) for e in item.get("escalations", ()))})
+            for item in json.loads(raw)
+        ]
+    except (ValueError, TypeError):
+        return list(DEFAULT_RULES)
+    return [r for r in rules if r.kind in RULE_KINDS] or list(DEFAULT_RULES)
+
+
+class DeviationReading(NamedTuple):
+    store_id: str
+    org_id: Optional[str]
+    store_name: Optional[str]
+    deviation: Optional[float]
+    recipe_version_id: Optional[str] = None
+
+
+class _StoreState:
+    def __init__(self):
+        self.history = deque(maxlen=HISTORY_SIZE)  # (ts, deviation)
+        self.above_since: Dict[str, float] = {}
+
+
+class AlertEngine:
+    """
+    Incremental rule evaluation for store deviation alerts.
+
+    Deviation updates are fed in as they happen (see log_processor), so an
+    alert fires in the same transaction as the log that triggered it. Open
+    alerts are indexed in memory per (store, alert_type): dedupe is a dict
+    lookup instead of a query per store. Changes tracked in a session reach
+    this engine's index only after commit, so rolled-back alerts never block
+    new ones. Other processes' changes arrive when the index is reloaded,
+    at most `index_ttl` seconds after it was loaded.
+    """
+
+    def __init__(self, rules: Optional[List[AlertRule]] = None, index_ttl: float = INDEX_TTL):
+        self.rules = rules or list(DEFAULT_RULES)
+        self.index_ttl = index_ttl
+        self._open: Dict[object, Counter] = {}
+        self._loaded_at: Dict[object, float] = {}
+        self._state: Dict[str, _StoreState] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def history_seconds(self) -> int:
+        return max([r.window_seconds for r in self.rules if r.kind == RATE_OF_CHANGE] or [0])
+
+    def _index(self, db: Session) -> Counter:
+        bind = db.get_bind()
+        with self._lock:
+            index = self._open.get(bind)
+            fresh = index is not None and time.monotonic() - self._loaded_at[bind] < self.index_ttl
+        # Once this transaction has tracked changes, a reload would count its own rows twice
+        if index is not None and (fresh or self._pending(db, create=False)):
+            return index
+        loaded_at = time.monotonic()
+        rows = db.query(models.Alert.store_id, models.Alert.alert_type).filter(
+            models.Alert.is_resolved == 0,
+            models.Alert.store_id.isnot(None)
+        ).all()
+        with self._lock:
+            if self._open.get(bind) is not index:
+                # Reloaded concurrently
+                return self._open[bind]
+            self._open[bind] = Counter((r.store_id, r.alert_type) for r in rows)
+            self._loaded_at[bind] = loaded_at
+            return self._open[bind]
+
+    def _pending(self, db: Session, create: bool = True) -> Counter:
+        """This engine's uncommitted changes in `db`"""
+        if not create:
+            return db.info.get(_PENDING_KEY, {}).get(self, Counter())
+        return db.info.setdefault(_PENDING_KEY, {}).setdefault(self, Counter())
+
+    def is_open(self, db: Session, store_id: str, alert_type: str) -> bool:
+        key = (store_id, alert_type)
+        return self._index(db)[key] + self._pending(db, create=False)[key] > 0
+
+    def open_alerts(self, db: Session, rows: List[Dict]) -> int:
+        """Insert alert rows raised outside the rules (e.g. per-step checks) and index them"""
+        # Load first, so the index never counts this transaction's rows twice
+        self._index(db)
+        return self._insert(db, rows)
+
+    def track(self, db: Session, keys, delta: int = 1):
+        """Record alerts opened (or resolved, delta=-1) in this session; applied on commit"""
+        self._index(db)
+        pending = self._pending(db)
+        for key in keys:
+            if key[0]:
+                pending[key] += delta
+
+    def _apply(self, session: Session, pending: Counter):
+        bind = session.get_bind()
+        with self._lock:
+            index = self._open.get(bind)
+            if index is None:
+                # Not loaded yet: the first _index() read will see the committed rows
+                return
+            for key, delta in pending.items():
+                index[key] = max(0, index[key] + delta)
+                if not index[key]:
+                    del index[key]
+
+    def _fire(self, rule: AlertRule, state: _StoreState, deviation: float, now: float) -> Optional[Dict]:
+        if rule.kind == THRESHOLD:
+            if deviation > rule.threshold:
+                return {"change": 0.0, "minutes": 0.0}
+        elif rule.kind == RATE_OF_CHANGE:
+            recent = [v for ts, v in state.history if now - ts <= rule.window_seconds]
+            if recent and deviation - min(recent) > rule.threshold:
+                return {"change": deviation - min(recent), "minutes": rule.window_seconds / 60}
+        elif rule.kind == SUSTAINED:
+            if deviation > rule.threshold:
+                since = state.above_since.setdefault(rule.name, now)
+                if now - since >= rule.window_seconds:
+                    return {"change": 0.0, "minutes": (now - since) / 60}
+            else:
+                state.above_since.pop(rule.name, None)
+        return None
+
+    def evaluate(self, db: Session, readings: List[DeviationReading], now: Optional[float] = None) -> int:
+        """
+        Run every rule against new deviation readings and bulk insert the alerts
+        that are not already open (grouped into incidents, see alert_grouping).
+        Does not commit. Returns the number of alert rows written.
+        """
+        now = time.time() if now is None else now
+        index = self._index(db)
+        pending = self._pending(db)
+
+        rows = []
+        raised = set()
+        with self._lock:
+            for reading in readings:
+                if reading.deviation is None or not reading.store_id:
+                    continue
+                deviation = float(reading.deviation)
+                state = self._state.setdefault(reading.store_id, _StoreState())
+
+                best = None
+                for rule in self.rules:
+                    detail = self._fire(rule, state, deviation, now)
+                    if detail is None:
+                        continue
+                    severity = rule.severity_for(deviation)
+                    if best is None or SEVERITY_RANK[severity] > SEVERITY_RANK[best[1]]:
+                        best = (rule, severity, detail)
+
+                state.history.append((now, deviation))
+                while state.history and now - state.history[0][0] > self.history_seconds:
+                    state.history.popleft()
+
+                if best is None:
+                    continue
+                rule, severity, detail = best
+                key = (reading.store_id, rule.alert_type)
+                if index[key] + pending[key] > 0 or key in raised:
+                    continue
+                raised.add(key)
+                rows.append({
+                    "id": models.generate_uuid(),
+                    "org_id": reading.org_id,
+                    "store_id": reading.store_id,
+                    "recipe_version_id": reading.recipe_version_id,
+                    "alert_type": rule.alert_type,
+                    "severity": severity,
+                    "message": rule.message.format(
+                        store=reading.store_name or reading.store_id,
+                        deviation=deviation,
+                        **detail
+                    ),
+                    "is_resolved": 0
+                })
+
+        return self._insert(db, rows, datetime.fromtimestamp(now, tz=timezone.utc))
+
+    def check_stores(self, db: Session) -> Tuple[int, int]:
+        """
+        Re-evaluate the stored deviation of every store above the lowest rule
+        threshold (manual / scheduled sweep). Does not commit.
+        Returns (alerts raised, stores checked).
+        """
+        floor = min(rule.threshold for rule in self.rules)
+        stores = db.query(
+            models.Store.id, models.Store.org_id, models.Store.name, models.Store.deviation, models.Store.active_recipe_version_id
+        ).filter(models.Store.deviation > floor).all()
+        raised = self.evaluate(db, [
+            DeviationReading(s.id, s.org_id, s.name, float(s.deviation), s.active_recipe_version_id) for s in stores
+        ])
+        return raised, len(stores)
+
+    def _insert(self, db: Session, rows: List[Dict], now: Optional[datetime] = None) -> int:
+        # Storm control: rows beyond the incident's rate limit are only counted
+        rows = incident_grouper.assign(db, rows, now)
+        if rows:
+            db.execute(insert(models.Alert), rows)
+            self.track(db, [(row.get("store_id"), row["alert_type"]) for row in rows])
+        return len(rows)
+
+    def reset(self):
+        with self._lock:
+            self._open.clear()
+            self._loaded_at.clear()
+            self._state.clear()
+
+
+alert_engine = AlertEngine(load_rules(os.getenv("FLAVOROS_ALERT_RULES")))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_tracked(session):
+    # Releasing a savepoint also fires after_commit; wait for the outermost commit
+    if session.in_nested_transaction():
+        return
+    for engine, pending in session.info.pop(_PENDING_KEY, {}).items():
+        # Each engine's index takes the changes it tracked
+        engine._apply(session, pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_tracked(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .llm_reliability import llm_service
+from ..config import int_env
+
+SEVERITY_RANK = {s.value: i for i, s in enumerate(schemas.AlertSeverity)}
+ANALYSIS_SAMPLE_SIZE = 5
+
+# (org_id, recipe_version_id, alert_type)
+IncidentKey = Tuple[Optional[str], Optional[str], str]
+
+
+class IncidentGrouper:
+    """
+    Folds alerts into incidents keyed by (org, recipe version, alert type, time bucket).
+
+    A bad version rolled out to hundreds of stores becomes one incident: only the
+    first `max_alerts_per_incident` alerts of a bucket get their own row, the rest
+    are counted as suppressed, and root cause analysis runs once per incident
+    (after it turns CRITICAL) instead of once per store. Suppressed stores have
+    no open alert to dedupe their later readings, so the incident remembers
+    them and counts each once.
+
+    Analysis is not part of ingestion: the LLM cache commits the session it is
+    given, so `analyze_pending` runs afterwards on its own session (scheduler
+    job "incident_analysis", or right after a manual deviation check).
+    """
+
+    def __init__(self, bucket_seconds: int = 900, max_alerts_per_incident: int = 20):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.max_alerts_per_incident = max(1, max_alerts_per_incident)
+
+    def bucket_start(self, now: datetime) -> datetime:
+        ts = int(now.timestamp())
+        return datetime.fromtimestamp(ts - ts % self.bucket_seconds, tz=timezone.utc)
+
+    def assign(self, db: Session, rows: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Attach alert rows (optionally carrying "recipe_version_id") to incidents.
+        Creates or updates the incidents, does not commit.
+        Returns the rows to insert, each with incident_id set.
+        """
+        if not rows:
+            return []
+        now = now or datetime.now(timezone.utc)
+        bucket = self.bucket_start(now)
+
+        grouped: Dict[IncidentKey, List[Dict]] = {}
+        for row in rows:
+            key = (row.get("org_id"), row.pop("recipe_version_id", None), row["alert_type"])
+            grouped.setdefault(key, []).append(row)
+
+        incidents = self._load(db, bucket, grouped)
+        missing = [key for key in grouped if key not in incidents]
+        if missing:
+            incidents.update(self._create(db, bucket, now, missing))
+
+        kept = []
+        changes = []
+        for key, group in grouped.items():
+            incident = incidents[key]
+            room = max(0, self.max_alerts_per_incident - incident["alert_count"])
+            group_kept = group[:room]
+            suppressed_ids = list(incident["suppressed_store_ids"])
+            suppressed = 0
+            for row in group[room:]:
+                store_id = row.get("store_id")
+                if store_id is None:
+                    suppressed += 1
+                elif store_id not in suppressed_ids:
+                    suppressed_ids.append(store_id)
+                    suppressed += 1
+
+            severity = incident["severity"]
+            for row in group:
+                if SEVERITY_RANK[row["severity"]] > SEVERITY_RANK[severity]:
+                    severity = row["severity"]
+
+            changes.append({
+                "id": incident["id"],
+                "severity": severity,
+                "alert_count": incident["alert_count"] + len(group_kept),
+                "suppressed_count": incident["suppressed_count"] + suppressed,
+                "suppressed_store_ids": suppressed_ids,
+                "last_seen_at": now,
+                # New alerts reopen an incident resolved earlier in the same bucket
+                "status": "OPEN",
+                "resolved_at": None
+            })
+            for row in group_kept:
+                row["incident_id"] = incident["id"]
+            kept.extend(group_kept)
+
+        db.execute(update(models.Incident), changes)
+
+        by_incident = {incident["id"]: incident for incident in incidents.values()}
+        for row in kept:
+            # Critical alerts carry their incident's analysis once there is one (see analyze_pending)
+            if row["severity"] == schemas.AlertSeverity.CRITICAL.value:
+                row["root_cause_analysis"] = by_incident[row["incident_id"]]["root_cause_analysis"]
+        return kept
+
+    def _load(self, db: Session, bucket: datetime, grouped: Dict[IncidentKey, List[Dict]]) -> Dict[IncidentKey, Dict]:
+        rows = db.query(
+            models.Incident.id,
+            models.Incident.org_id,
+            models.Incident.recipe_version_id,
+            models.Incident.alert_type,
+            models.Incident.severity,
+            models.Incident.alert_count,
+            models.Incident.suppressed_count,
+            models.Incident.suppressed_store_ids,
+            models.Incident.root_cause_analysis
+        ).filter(
+            models.Incident.bucket_start == bucket,
+            models.Incident.alert_type.in_({key[2] for key in grouped}),
+            or_(
+                models.Incident.recipe_version_id.in_({key[1] for key in grouped if key[1]}),
+                models.Incident.recipe_version_id.is_(None)
+            )
+        ).all()
+        return {
+            (r.org_id, r.recipe_version_id, r.alert_type): {
+                "id": r.id,
+                "severity": r.severity,
+                "alert_count": r.alert_count or 0,
+                "suppressed_count": r.suppressed_count or 0,
+                "suppressed_store_ids": r.suppressed_store_ids or [],
+                "root_cause_analysis": r.root_cause_analysis
+            }
+            for r in rows
+            if (r.org_id, r.recipe_version_id, r.alert_type) in grouped
+        }
+
+    def _create(self, db: Session, bucket: datetime, now: datetime, keys: List[IncidentKey]) -> Dict[IncidentKey, Dict]:
+        created = {
+            key: {
+                "id": models.generate_uuid(),
+                "severity": schemas.AlertSeverity.LOW.value,
+                "alert_count": 0,
+                "suppressed_count": 0,
+                "suppressed_store_ids": [],
+                "root_cause_analysis": None
+            }
+            for key in keys
+        }
+        try:
+            # Savepoint: another writer may open the same incident first
+            with db.begin_nested():
+                db.execute(insert(models.Incident), [
+                    {
+                        "id": incident["id"],
+                        "org_id": key[0],
+                        "recipe_version_id": key[1],
+                        "alert_type": key[2],
+                        "bucket_start": bucket,
+                        "severity": incident["severity"],
+                        "status": "OPEN",
+                        "alert_count": 0,
+                        "suppressed_count": 0,
+                        "first_seen_at": now,
+                        "last_seen_at": now
+                    }
+                    for key, incident in created.items()
+                ])
+        except IntegrityError:
+            loaded = self._load(db, bucket, {key: [] for key in keys})
+            remaining = [key for key in keys if key not in loaded]
+            if remaining:
+                loaded.update(self._create(db, bucket, now, remaining))
+            return loaded
+        return created
+
+    def analyze_pending(self, db: Session, limit: int = 20) -> Dict[str, str]:
+        """
+        One AI root cause analysis per CRITICAL incident that has none yet,
+        copied onto its critical alerts. Commits after each incident (the LLM
+        cache commits `db` anyway), so call it on a session with no other
+        pending work. Failures are stored too, so an incident is tried once.
+        """
+        pending = db.query(models.Incident).filter(
+            models.Incident.severity == schemas.AlertSeverity.CRITICAL.value,
+            models.Incident.root_cause_analysis.is_(None)
+        ).order_by(models.Incident.first_seen_at).limit(limit).all()
+
+        analyses = {}
+        for incident in pending:
+            messages = [
+                message for (message,) in db.query(models.Alert.message).filter(
+                    models.Alert.incident_id == incident.id
+                ).order_by(models.Alert.created_at).limit(ANALYSIS_SAMPLE_SIZE)
+            ]
+            stores = (incident.alert_count or 0) + (incident.suppressed_count or 0)
+            prompt = (
+                f"{stores} stores report {incident.alert_type} in the same window. "
+                f"Alerts: {'; '.join(messages)}. Estimate root cause."
+            )
+            try:
+                analysis = llm_service.safe_generate(prompt, db=db)
+                text = analysis.get("content", "No analysis")
+            except Exception as e:
+                db.rollback()
+                text = f"Analysis failed: {str(e)}"
+
+            db.execute(
+                update(models.Incident)
+                .where(models.Incident.id == incident.id)
+                .values(root_cause_analysis=text)
+                .execution_options(synchronize_session=False)
+            )
+            db.execute(
+                update(models.Alert)
+                .where(
+                    models.Alert.incident_id == incident.id,
+                    models.Alert.severity == schemas.AlertSeverity.CRITICAL.value,
+                    models.Alert.root_cause_analysis.is_(None)
+                )
+                .values(root_cause_analysis=text)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            analyses[incident.id] = text
+        return analyses
+
+
+incident_grouper = IncidentGrouper(
+    bucket_seconds=int_env("FLAVOROS_INCIDENT_BUCKET_SECONDS", 900),
+    max_alerts_per_incident=int_env("FLAVOROS_INCIDENT_MAX_ALERTS", 20)
+)
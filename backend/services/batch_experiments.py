@@ -1,141 +1,666 @@
+import json
+import math
+import os
 import time
-import asyncio
-from typing import List
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import Response
+from sqlalchemy import delete, insert, or_, update
 from sqlalchemy.orm import Session
-from backend import models, schemas
-from backend.services.strategy_analyzer import analyze_strategy
+from backend import models
+from backend.config import float_env, int_env
+from backend.services.pagination import keyset_paginate
+from backend.services.reference_repository import reference_repository
 
-def run_batch_experiment(
+CHUNK_SIZE = 50000  # combinations per kernel call
+PROGRESS_INTERVAL = 0.25  # seconds between progress writes
+RESULT_INSERT_SIZE = 5000
+# A RUNNING run whose heartbeat (claim / progress write) is older than this is
+# presumed orphaned and re-queued; keep it well above the slowest chunk.
+STALE_RUN_SECONDS = float_env("FLAVOROS_EXPERIMENT_STALE_SECONDS", 600.0)
+STREAM_TIMEOUT = float_env("FLAVOROS_EXPERIMENT_STREAM_TIMEOUT", 1800.0)  # SSE progress deadline
+KEEPALIVE_INTERVAL = float_env("FLAVOROS_SSE_KEEPALIVE_SECONDS", 15.0)
+
+GRID = "grid"          # score the full target x mode x alpha product
+ADAPTIVE = "adaptive"  # successive halving with continuous alpha (adaptive_search)
+SEARCH_MODES = (GRID, ADAPTIVE)
+DEFAULT_BUDGET_FRACTION = 0.1  # adaptive budget as a share of the grid size
+MIN_BUDGET = 20
+
+
+def _default_workers() -> int:
+    return max(1, int_env("FLAVOROS_EXPERIMENT_WORKERS", os.cpu_count() or 1))
+
+
+def create_batch_run(
+    db: Session,
     base_reference_id: str,
     target_reference_ids: List[str],
     modes: List[str],
     alphas: List[float],
     org_id: str,
-    db: Session
+    search_mode: str = GRID,
+    budget: Optional[int] = None,
+    objective: Optional[str] = None,
+    seed: int = 0
 ) -> models.ExperimentRun:
     """
-    Run batch experiment with multiple strategy combinations.
-    Returns ExperimentRun with aggregated results.
+    Record a QUEUED run; a worker picks it up with execute_batch_run.
+    Adaptive runs treat `alphas` as a range (min..max) and score at most
+    `budget` points (default: 10% of the grid); total_combinations is the budget.
     """
-    start_time = time.time()
-    
-    # Calculate total combinations
-    total = len(target_reference_ids) * len(modes) * len(alphas)
-    
-    # Create experiment run record
+    if search_mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search_mode '{search_mode}' (one of {', '.join(SEARCH_MODES)})")
+    objective = objective or DEFAULT_OBJECTIVE
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}' (one of {', '.join(OBJECTIVES)})")
+    grid_size = len(target_reference_ids) * len(modes) * len(alphas)
+    config = {
+        "base_reference_id": base_reference_id,
+        "target_reference_ids": target_reference_ids,
+        "modes": modes,
+        "alphas": alphas
+    }
+    total = grid_size
+    if search_mode == ADAPTIVE:
+        if budget is None:
+            budget = min(grid_size, max(math.ceil(grid_size * DEFAULT_BUDGET_FRACTION), MIN_BUDGET))
+        config.update({"search_mode": ADAPTIVE, "budget": budget, "objective": objective, "seed": seed})
+        total = budget
+
     run = models.ExperimentRun(
         id=models.generate_uuid(),
         org_id=org_id,
-        config_json={
-            "base_reference_id": base_reference_id,
-            "target_reference_ids": target_reference_ids,
-            "modes": modes,
-            "alphas": alphas
-        },
-        status="RUNNING",
+        config_json=config,
+        status="QUEUED",
         total_combinations=total,
         completed_count=0,
         results_json=[]
     )
     db.add(run)
     db.commit()
-    
-    results = []
+    db.refresh(run)
+    return run
+
+
+class RunSuperseded(Exception):
+    """The run was re-queued and claimed again; this worker's writes are discarded"""
+
+
+def claim_run(db: Session, run_id: str) -> Optional[int]:
+    """
+    QUEUED -> RUNNING, so exactly one worker executes a run.
+    Returns the attempt number (1 on the first claim), or None when the run
+    was not QUEUED. Later writes are conditioned on that attempt.
+    """
+    run = models.ExperimentRun
+    result = db.execute(
+        update(run)
+        .where(run.id == run_id, run.status == "QUEUED")
+        .values(status="RUNNING", attempts=run.attempts + 1, heartbeat_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return None
+    return db.query(run.attempts).filter(run.id == run_id).scalar()
+
+
+def execute_batch_run(
+    db: Session,
+    run_id: str,
+    max_workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    progress_interval: float = PROGRESS_INTERVAL
+) -> bool:
+    """
+    Score every (target x mode x alpha) combination of a queued run, or,
+    for adaptive runs, the points adaptive_search picks within the budget.
+
+    Vectors are loaded once; each chunk of targets is scored by the NumPy
+    kernel (score_grid), and chunks fan out across a process pool when there
+    is more than one. completed_count is written at most every
+    `progress_interval` seconds; scored rows go to experiment_run_results
+    as each chunk finishes and become visible with that progress.
+    Progress writes double as the heartbeat requeue_stale_runs checks; a
+    re-executed run starts over from no results.
+    Returns False when another worker already claimed the run, or when this
+    worker was superseded after its run went stale.
+    """
+    attempt = claim_run(db, run_id)
+    if not attempt:
+        return False
+    run = db.query(models.ExperimentRun).filter(models.ExperimentRun.id == run_id).first()
+    start_time = time.time()
     completed = 0
-    
+    errors = 0
+
     try:
-        # Run each combination
-        for target_id in target_reference_ids:
-            for mode in modes:
-                for alpha in alphas:
-                    try:
-                        # Simulate strategy analysis for this combination
-                        result = _run_single_combination(
-                            base_reference_id, target_id, mode, alpha, org_id, db
-                        )
-                        results.append({
-                            "config": {
-                                "target_id": target_id,
-                                "mode": mode,
-                                "alpha": alpha
-                            },
-                            "result": result
-                        })
-                    except Exception as e:
-                        results.append({
-                            "config": {
-                                "target_id": target_id,
-                                "mode": mode,
-                                "alpha": alpha
-                            },
-                            "error": str(e)
-                        })
-                    
-                    completed += 1
-                    run.completed_count = completed
-                    db.commit()
-        
-        # Complete
-        run.status = "COMPLETED"
-        run.results_json = results
-        run.duration_ms = int((time.time() - start_time) * 1000)
-        db.commit()
-        
+        if attempt > 1:
+            # Rows committed by the orphaned attempt; this one re-scores everything
+            db.execute(delete(models.ExperimentRunResult).where(models.ExperimentRunResult.run_id == run_id))
+        config = run.config_json or {}
+        base_id = config["base_reference_id"]
+        target_ids = config.get("target_reference_ids") or []
+        vectors = {
+            ref.id: ref.current_vector or [0.5] * 5
+            for ref in reference_repository.load_with_vectors(db, [base_id, *target_ids])
+        }
+        modes = config.get("modes") or []
+        alphas = config.get("alphas") or []
+        targets = [(target_id, vectors.get(target_id)) for target_id in target_ids]
+        adaptive = config.get("search_mode") == ADAPTIVE
+        # Whole targets per chunk: each chunk is one kernel call over its (t x M x A) grid
+        targets_per_chunk = max(1, chunk_size // max(1, len(modes) * len(alphas)))
+        chunks = [
+            (vectors.get(base_id), targets[i:i + targets_per_chunk], modes, alphas, i)
+            for i in range(0, len(targets), targets_per_chunk)
+        ] if modes and alphas and not adaptive else []
+        summary = {}
+
+        last_flush = time.monotonic()
+
+        def collect(rows: List[Dict]):
+            nonlocal completed, errors, last_flush
+            for row in rows:
+                row["id"] = models.generate_uuid()
+                row["run_id"] = run_id
+                errors += row["error"] is not None
+            for start in range(0, len(rows), RESULT_INSERT_SIZE):
+                db.execute(insert(models.ExperimentRunResult), rows[start:start + RESULT_INSERT_SIZE])
+            completed += len(rows)
+            # Results and progress become visible together, at most every progress_interval
+            if time.monotonic() - last_flush >= progress_interval:
+                _write_progress(db, run_id, attempt, completed=completed)
+                last_flush = time.monotonic()
+
+        workers = min(max_workers or _default_workers(), len(chunks))
+        if adaptive:
+            # Rounds depend on earlier scores, so the search runs in-process
+            summary = adaptive_search(
+                vectors.get(base_id), targets, modes, (min(alphas), max(alphas)), config.get("budget") or 0,
+                objective=config.get("objective") or DEFAULT_OBJECTIVE, seed=config.get("seed") or 0,
+                on_batch=collect
+            ) if modes and alphas else {}
+        elif workers <= 1:
+            for chunk in chunks:
+                collect(_score_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in as_completed([pool.submit(_score_chunk, chunk) for chunk in chunks]):
+                    collect(future.result())
+
+        final = {
+            "status": "COMPLETED",
+            "completed_count": completed,
+            "results_json": {"errors": errors, **summary},
+            "duration_ms": int((time.time() - start_time) * 1000)
+        }
+        if adaptive:
+            final["total_combinations"] = completed
+        _write_progress(db, run_id, attempt, **final)
+    except RunSuperseded:
+        return False
     except Exception as e:
-        run.status = "FAILED"
-        run.results_json = {"error": str(e), "partial_results": results}
-        db.commit()
-    
+        db.rollback()
+        try:
+            _write_progress(
+                db, run_id, attempt, status="FAILED", results_json={"error": str(e)},
+                duration_ms=int((time.time() - start_time) * 1000)
+            )
+        except RunSuperseded:
+            return False
+    return True
+
+
+def _write_progress(db: Session, run_id: str, attempt: int, **values):
+    """
+    Update the run and commit, refreshing its heartbeat, only while this
+    attempt still owns it; otherwise roll back (with any uncommitted result
+    rows) and raise RunSuperseded.
+    """
+    run = models.ExperimentRun
+    result = db.execute(
+        update(run)
+        .where(run.id == run_id, run.attempts == attempt, run.status == "RUNNING")
+        .values(heartbeat_at=datetime.now(timezone.utc), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        raise RunSuperseded(run_id)
+    db.commit()
+
+
+def requeue_stale_runs(db: Session, stale_after: float = STALE_RUN_SECONDS) -> int:
+    """RUNNING runs without a heartbeat for `stale_after` seconds (worker died) go back to QUEUED"""
+    run = models.ExperimentRun
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    result = db.execute(
+        update(run)
+        .where(run.status == "RUNNING", or_(run.heartbeat_at.is_(None), run.heartbeat_at < cutoff))
+        .values(status="QUEUED", completed_count=0)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def process_queued_runs(db: Session, limit: int = 5) -> List[str]:
+    """
+    Scheduler job: execute runs left QUEUED (e.g. enqueued on a replica that
+    went away), after re-queueing RUNNING runs whose worker stopped heartbeating.
+    """
+    requeue_stale_runs(db)
+    queued = [
+        run_id for (run_id,) in db.query(models.ExperimentRun.id).filter(
+            models.ExperimentRun.status == "QUEUED"
+        ).order_by(models.ExperimentRun.created_at).limit(limit)
+    ]
+    return [run_id for run_id in queued if execute_batch_run(db, run_id)]
+
+
+def run_batch_in_background(run_id: str, db_session_factory):
+    """Background task entry point: own session for the whole run"""
+    db = db_session_factory()
+    try:
+        execute_batch_run(db, run_id)
+    finally:
+        db.close()
+
+
+def run_batch_experiment(
+    base_reference_id: str,
+    target_reference_ids: List[str],
+    modes: List[str],
+    alphas: List[float],
+    org_id: str,
+    db: Session,
+    max_workers: Optional[int] = None,
+    **search
+) -> models.ExperimentRun:
+    """
+    Run batch experiment with multiple strategy combinations, synchronously.
+    Returns ExperimentRun with aggregated results.
+    `search` takes create_batch_run's search_mode / budget / objective / seed.
+    """
+    run = create_batch_run(db, base_reference_id, target_reference_ids, modes, alphas, org_id, **search)
+    execute_batch_run(db, run.id, max_workers=max_workers)
     db.refresh(run)
     return run
 
-def _run_single_combination(base_id: str, target_id: str, mode: str, alpha: float, org_id: str, db: Session) -> dict:
-    """
-    Run a single strategy combination and return simplified result.
-    """
-    # Get vectors
-    base_ref = db.query(models.Reference).filter(models.Reference.id == base_id).first()
-    target_ref = db.query(models.Reference).filter(models.Reference.id == target_id).first()
-    
-    if not base_ref or not target_ref:
-        raise ValueError("Reference not found")
-    
-    base_vec = base_ref.fingerprints[0].vector if base_ref.fingerprints else [0.5] * 5
-    target_vec = target_ref.fingerprints[0].vector if target_ref.fingerprints else [0.5] * 5
-    
-    # Simulate result vector based on mode
-    if mode == "COPY":
-        result_vec = base_vec.copy()
-    elif mode == "DISTANCE":
-        result_vec = [base_vec[i] + alpha * (target_vec[i] - base_vec[i]) for i in range(5)]
-    else:  # REDIRECT
-        result_vec = [base_vec[i] - alpha * (target_vec[i] - base_vec[i]) for i in range(5)]
-    
-    # Clamp values
-    result_vec = [max(0, min(1, v)) for v in result_vec]
-    
-    # Calculate predicted metrics
-    distance = sum([(result_vec[i] - target_vec[i])**2 for i in range(5)]) ** 0.5
-    
+
+# Mode -> direction of the step from base towards the target
+MODE_SIGN = {"COPY": 0.0, "DISTANCE": 1.0, "REDIRECT": -1.0}
+
+
+def score_grid(base_vec, target_vecs, modes: List[str], alphas: List[float]) -> Dict[str, np.ndarray]:
+    """
+    Vectorized strategy kernel over the whole (target x mode x alpha) grid.
+    base (D,), targets (T x D) -> result vectors (T x M x A x D) clamped to
+    [0, 1], distances to target (T x M x A), lift and risk (A,).
+    Modes other than COPY and DISTANCE redirect (step away from the target).
+    """
+    base = np.asarray(base_vec, dtype=float)
+    targets = np.asarray(target_vecs, dtype=float).reshape(-1, base.shape[0])
+    sign = np.array([MODE_SIGN.get(mode, -1.0) for mode in modes])
+    alpha = np.asarray(alphas, dtype=float)
+
+    step = (sign[:, None] * alpha[None, :])[None, :, :, None]  # (1, M, A, 1)
+    delta = (targets - base)[:, None, None, :]  # (T, 1, 1, D)
+    result = np.clip(base + step * delta, 0.0, 1.0)
+    distance = np.sqrt(((result - targets[:, None, None, :]) ** 2).sum(axis=-1))
     return {
-        "result_vector": result_vec,
-        "distance_from_target": round(distance, 3),
-        "predicted_sales_lift": round(0.05 + alpha * 0.1, 3),
-        "execution_risk": round(alpha * 0.5, 2)
+        "result_vector": result,
+        "distance_from_target": np.round(distance, 3),
+        "predicted_sales_lift": np.round(0.05 + alpha * 0.1, 3),
+        "execution_risk": np.round(alpha * 0.5, 2)
     }
 
-def get_experiment_run_status(run_id: str, db: Session) -> dict:
-    """Get experiment run status and progress"""
-    run = db.query(models.ExperimentRun).filter(models.ExperimentRun.id == run_id).first()
-    if not run:
-        raise ValueError(f"Experiment run {run_id} not found")
-    
+
+def score_points(base_vec, target_vecs, modes: List[str], alphas) -> Dict[str, np.ndarray]:
+    """
+    score_grid for individual points: point i steps from base towards
+    target_vecs[i] with modes[i] and alphas[i] (all length N).
+    Result vectors (N x D), distances, lift and risk (N,).
+    """
+    base = np.asarray(base_vec, dtype=float)
+    targets = np.asarray(target_vecs, dtype=float).reshape(-1, base.shape[0])
+    sign = np.array([MODE_SIGN.get(mode, -1.0) for mode in modes])
+    alpha = np.asarray(alphas, dtype=float)
+
+    result = np.clip(base + (sign * alpha)[:, None] * (targets - base), 0.0, 1.0)
+    distance = np.sqrt(((result - targets) ** 2).sum(axis=-1))
+    return {
+        "result_vector": result,
+        "distance_from_target": np.round(distance, 3),
+        "predicted_sales_lift": np.round(0.05 + alpha * 0.1, 3),
+        "execution_risk": np.round(alpha * 0.5, 2)
+    }
+
+
+# Objective name -> score to maximize, from the kernel's metric arrays.
+# "score" trades lift against risk and the remaining distance to the target.
+OBJECTIVES = {
+    "score": lambda m: m["predicted_sales_lift"] - 0.1 * m["execution_risk"] - 0.1 * m["distance_from_target"],
+    "predicted_sales_lift": lambda m: m["predicted_sales_lift"],
+    "distance_from_target": lambda m: -m["distance_from_target"],
+}
+DEFAULT_OBJECTIVE = "score"
+HALVING_RATE = 3        # keep the best 1/eta arms each round
+SAMPLES_PER_ARM = 2     # alphas re-sampled per surviving arm each round
+EXPLORE_SHARE = 0.2     # share of a round spent on arms not tried yet
+PLATEAU_ROUNDS = 2      # stop after this many rounds without improvement
+PLATEAU_TOL = 1e-4
+
+
+def adaptive_search(
+    base_vec,
+    targets: List[Tuple[str, Optional[List[float]]]],
+    modes: List[str],
+    alpha_range: Tuple[float, float],
+    budget: int,
+    objective: str = DEFAULT_OBJECTIVE,
+    eta: int = HALVING_RATE,
+    patience: int = PLATEAU_ROUNDS,
+    seed: int = 0,
+    on_batch=None
+) -> Dict:
+    """
+    Successive halving over (target, mode) arms with alpha searched continuously.
+
+    Round 0 scores every arm once at a uniform random alpha (a random subset
+    when arms exceed half the budget). Each later round keeps the best 1/eta
+    arms, re-samples alpha around each survivor's best within a window that
+    shrinks by eta, and spends EXPLORE_SHARE of the round on untried arms.
+    Stops when the budget is spent or the best objective has not improved by
+    PLATEAU_TOL for `patience` rounds. Rows (ExperimentRunResult dicts, idx =
+    evaluation order) go to `on_batch` round by round; returns the summary.
+    Targets without a usable vector are skipped.
+    """
+    score = OBJECTIVES[objective]
+    rng = np.random.default_rng(seed)
+    lo, hi = float(alpha_range[0]), float(alpha_range[1])
+    valid = [
+        (target_id, vec) for target_id, vec in targets
+        if base_vec is not None and vec is not None and len(vec) == len(base_vec)
+    ]
+    summary = {
+        "search_mode": ADAPTIVE,
+        "objective": objective,
+        "evaluations": 0,
+        "rounds": 0,
+        "stopped": "budget",
+        "skipped_targets": len(targets) - len(valid),
+        "best": None
+    }
+    n_modes = len(modes)
+    n_arms = len(valid) * n_modes
+    if not n_arms or budget <= 0:
+        return summary
+
+    target_matrix = np.asarray([vec for _, vec in valid], dtype=float)
+    arm_best: Dict[int, Tuple[float, float]] = {}  # arm -> (objective, alpha)
+    best_value = -math.inf
+
+    def evaluate(arms: np.ndarray, alphas: np.ndarray):
+        nonlocal best_value
+        alphas = np.round(np.clip(alphas, lo, hi), 3)
+        positions = arms // n_modes
+        point_modes = [modes[m] for m in (arms % n_modes).tolist()]
+        metrics = score_points(base_vec, target_matrix[positions], point_modes, alphas)
+        values = score(metrics).tolist()
+        vectors = metrics["result_vector"].tolist()
+        distances = metrics["distance_from_target"].tolist()
+        lifts = metrics["predicted_sales_lift"].tolist()
+        risks = metrics["execution_risk"].tolist()
+
+        rows = []
+        for i, arm in enumerate(arms.tolist()):
+            row = {
+                "idx": summary["evaluations"] + i,
+                "target_id": valid[positions[i]][0],
+                "mode": point_modes[i],
+                "alpha": alphas[i].item(),
+                "distance_from_target": distances[i],
+                "predicted_sales_lift": lifts[i],
+                "execution_risk": risks[i],
+                "result_vector": vectors[i],
+                "error": None
+            }
+            rows.append(row)
+            if arm not in arm_best or values[i] > arm_best[arm][0]:
+                arm_best[arm] = (values[i], row["alpha"])
+            if values[i] > best_value:
+                best_value = values[i]
+                summary["best"] = {
+                    "index": row["idx"],
+                    "config": {"target_id": row["target_id"], "mode": row["mode"], "alpha": row["alpha"]},
+                    "objective": round(values[i], 6) + 0.0  # no -0.0 for distance
+                }
+        summary["evaluations"] += len(rows)
+        summary["rounds"] += 1
+        if on_batch:
+            on_batch(rows)
+
+    order = rng.permutation(n_arms)
+    explored = min(n_arms, max(1, budget // 2))
+    survivors = order[:explored]
+    evaluate(survivors, rng.uniform(lo, hi, explored))
+
+    width = (hi - lo) / 2
+    stale = 0
+    while summary["evaluations"] < budget:
+        ranked = sorted(survivors.tolist(), key=lambda arm: arm_best[arm][0], reverse=True)
+        survivors = np.array(ranked[:max(1, math.ceil(len(ranked) / eta))])
+        width /= eta
+        remaining = budget - summary["evaluations"]
+
+        exploit = np.repeat(survivors, SAMPLES_PER_ARM)[:remaining]
+        centres = np.array([arm_best[arm][1] for arm in exploit.tolist()])
+        n_explore = min(remaining - len(exploit), n_arms - explored, math.ceil(len(exploit) * EXPLORE_SHARE))
+        fresh = order[explored:explored + n_explore]
+        explored += n_explore
+
+        previous = best_value
+        evaluate(
+            np.concatenate([exploit, fresh]),
+            np.concatenate([centres + rng.normal(0.0, width, len(exploit)), rng.uniform(lo, hi, n_explore)])
+        )
+        survivors = np.concatenate([survivors, fresh])
+        stale = stale + 1 if best_value - previous < PLATEAU_TOL else 0
+        if stale >= patience:
+            summary["stopped"] = "plateau"
+            break
+    return summary
+
+
+def _score_chunk(chunk) -> List[Dict]:
+    """
+    Worker entry point: pure CPU work, no DB access (must stay picklable).
+    A chunk is a slice of targets scored against every mode and alpha;
+    returns one flat ExperimentRunResult row per combination.
+    """
+    base_vec, targets, modes, alphas, first_target = chunk
+    per_target = len(modes) * len(alphas)
+    rows = []
+
+    valid = [
+        (pos, vec) for pos, (_, vec) in enumerate(targets)
+        if base_vec is not None and vec is not None and len(vec) == len(base_vec)
+    ]
+    scored = {}
+    if valid:
+        grid = score_grid(base_vec, [vec for _, vec in valid], modes, alphas)
+        vectors = grid["result_vector"].tolist()
+        distances = grid["distance_from_target"].tolist()
+        lifts = grid["predicted_sales_lift"].tolist()
+        risks = grid["execution_risk"].tolist()
+        scored = {pos: row for row, (pos, _) in enumerate(valid)}
+
+    for pos, (target_id, _) in enumerate(targets):
+        row = scored.get(pos)
+        base_index = (first_target + pos) * per_target
+        for m, mode in enumerate(modes):
+            for a, alpha in enumerate(alphas):
+                entry = {
+                    "idx": base_index + m * len(alphas) + a,
+                    "target_id": target_id,
+                    "mode": mode,
+                    "alpha": alpha,
+                    "distance_from_target": None,
+                    "predicted_sales_lift": None,
+                    "execution_risk": None,
+                    "result_vector": None,
+                    "error": None
+                }
+                if row is None:
+                    entry["error"] = "Reference not found"
+                else:
+                    entry["distance_from_target"] = distances[row][m][a]
+                    entry["predicted_sales_lift"] = lifts[a]
+                    entry["execution_risk"] = risks[a]
+                    entry["result_vector"] = vectors[row][m][a]
+                rows.append(entry)
+    return rows
+
+
+_STATUS_COLUMNS = (
+    models.ExperimentRun.id,
+    models.ExperimentRun.status,
+    models.ExperimentRun.completed_count,
+    models.ExperimentRun.total_combinations,
+    models.ExperimentRun.duration_ms,
+    models.ExperimentRun.results_json
+)
+
+
+def _status_payload(run) -> dict:
     return {
         "id": run.id,
         "status": run.status,
         "completed": run.completed_count,
         "total": run.total_combinations,
-        "progress_pct": round((run.completed_count / max(1, run.total_combinations)) * 100, 1),
+        "progress_pct": round(((run.completed_count or 0) / max(1, run.total_combinations or 0)) * 100, 1),
         "duration_ms": run.duration_ms,
-        "results": run.results_json if run.status == "COMPLETED" else None
+        "summary": run.results_json or None
     }
+
+
+def get_experiment_run_status(run_id: str, db: Session) -> dict:
+    """Get experiment run status, progress and summary (results are paged from list_run_results)"""
+    run = db.query(*_STATUS_COLUMNS).filter(models.ExperimentRun.id == run_id).first()
+    if not run:
+        raise ValueError(f"Experiment run {run_id} not found")
+    return _status_payload(run)
+
+
+RESULT_SORTS = {
+    "index": models.ExperimentRunResult.idx,
+    "predicted_sales_lift": models.ExperimentRunResult.predicted_sales_lift,
+    "distance_from_target": models.ExperimentRunResult.distance_from_target,
+    "execution_risk": models.ExperimentRunResult.execution_risk,
+    "alpha": models.ExperimentRunResult.alpha,
+}
+
+
+def list_run_results(
+    db: Session,
+    run_id: str,
+    sort: str = "index",
+    descending: bool = False,
+    mode: Optional[str] = None,
+    target_id: Optional[str] = None,
+    include_errors: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    response: Optional[Response] = None
+) -> List[Dict]:
+    """
+    One page of a run's results, straight from experiment_run_results, e.g.
+    top-k by lift: sort="predicted_sales_lift", descending=True, limit=k.
+    Keyset-paginated (X-Next-Cursor); failed combinations only with include_errors.
+    """
+    if sort not in RESULT_SORTS:
+        raise ValueError(f"Unknown sort '{sort}' (one of {', '.join(RESULT_SORTS)})")
+    result = models.ExperimentRunResult
+    query = db.query(result).filter(result.run_id == run_id)
+    if mode:
+        query = query.filter(result.mode == mode)
+    if target_id:
+        query = query.filter(result.target_id == target_id)
+    if not include_errors:
+        query = query.filter(result.error.is_(None))
+
+    order = [(RESULT_SORTS[sort], descending)]
+    if sort != "index":
+        order.append((result.idx, False))
+    rows = keyset_paginate(query, order, result.id, cursor=cursor, limit=limit, response=response)
+    return [_result_payload(row) for row in rows]
+
+
+def _result_payload(row: models.ExperimentRunResult) -> Dict:
+    payload = {
+        "index": row.idx,
+        "config": {"target_id": row.target_id, "mode": row.mode, "alpha": row.alpha}
+    }
+    if row.error is not None:
+        payload["error"] = row.error
+    else:
+        payload["result"] = {
+            "result_vector": row.result_vector,
+            "distance_from_target": row.distance_from_target,
+            "predicted_sales_lift": row.predicted_sales_lift,
+            "execution_risk": row.execution_risk
+        }
+    return payload
+
+
+def experiment_run_events(
+    run_id: str,
+    db_session_factory,
+    poll_interval: float = PROGRESS_INTERVAL,
+    timeout: float = STREAM_TIMEOUT,
+    keepalive: float = KEEPALIVE_INTERVAL
+):
+    """
+    Generator for SSE progress. Yields a progress event whenever the counters change.
+    Events: progress, complete, error. While nothing changes a keep-alive
+    comment goes out every `keepalive` seconds, so a disconnected client is
+    noticed on the next write. Gives up with an error event after `timeout`
+    seconds; clients reconnect to keep following a longer run.
+    """
+    last_payload = None
+    deadline = time.monotonic() + timeout
+    last_write = time.monotonic()
+    while True:
+        db = db_session_factory()
+        try:
+            run = db.query(*_STATUS_COLUMNS).filter(models.ExperimentRun.id == run_id).first()
+            if not run:
+                yield f"data: {json.dumps({'type': 'error', 'message': 'Experiment run not found'})}\n\n"
+                return
+            payload = _status_payload(run)
+        finally:
+            db.close()
+
+        if payload["status"] == "COMPLETED":
+            yield f"data: {json.dumps({'type': 'complete', **payload})}\n\n"
+            return
+        if payload["status"] == "FAILED":
+            yield f"data: {json.dumps({'type': 'error', **payload})}\n\n"
+            return
+        if payload != last_payload:
+            yield f"data: {json.dumps({'type': 'progress', **payload})}\n\n"
+            last_payload = payload
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= keepalive:
+            yield ": keep-alive\n\n"
+            last_write = time.monotonic()
+        if time.monotonic() >= deadline:
+            yield f"data: {json.dumps({'type': 'error', 'message': 'Progress stream timed out', **payload})}\n\n"
+            return
+        time.sleep(poll_interval)
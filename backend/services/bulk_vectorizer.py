@@ -0,0 +1,185 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .rule_vectorizer import rule_vectorizer
+from .reference_repository import reference_repository
+from ..config import int_env
+
+DEFAULT_SHARD_SIZE = 500
+
+
+def _default_workers() -> int:
+    return max(1, int_env("FLAVOROS_VECTORIZE_WORKERS", os.cpu_count() or 1))
+
+
+def extract_keywords(metadata: Optional[dict], menu_category: Optional[str]) -> List[str]:
+    """Keywords used for rule-based vectorization (falls back to the menu category)."""
+    metadata = metadata or {}
+    keywords = metadata.get("keywords", [])
+    if isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(",")]
+    keywords = list(keywords)
+
+    if not keywords and menu_category:
+        keywords.append(menu_category)
+    return keywords
+
+
+def _vectorize_shard(shard: List[Tuple[str, List[str]]]) -> List[Tuple[str, List[str], List[float]]]:
+    """Worker entry point: pure CPU work, no DB access (must stay picklable)."""
+    return [
+        (ref_id, keywords, rule_vectorizer.vectorize_from_keywords(keywords))
+        for ref_id, keywords in shard
+    ]
+
+
+def revectorize_references(
+    db: Session,
+    org_id: Optional[str] = None,
+    category: Optional[str] = None,
+    version: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Dict:
+    """
+    Re-fingerprint every matching reference with a bumped version.
+
+    References are sharded across a process pool; each finished shard is
+    bulk-inserted and committed as a checkpoint only: current_fingerprint_id,
+    current_vector and process_status stay on the previous version, so readers
+    never see a mix of versions. Once every shard is written, pointers and
+    statuses of the whole selection flip in one transaction.
+
+    Resume: an interrupted run leaves committed but not yet current
+    fingerprints. Calling again with the same `version` skips the references
+    that already have it, writes the rest, and performs the flip; until then
+    readers keep getting the old version.
+    """
+    start_time = time.time()
+
+    criteria = []
+    if org_id:
+        criteria.append(models.Reference.org_id == org_id)
+    if category:
+        criteria.append(models.Reference.menu_category == category)
+
+    rows = db.query(
+        models.Reference.id,
+        models.Reference.menu_category,
+        models.Reference.metadata_json
+    ).filter(*criteria).all()
+
+    fingerprints = db.query(models.ReferenceFingerprint).join(
+        models.Reference, models.Reference.id == models.ReferenceFingerprint.reference_id
+    ).filter(*criteria)
+
+    # 1. Resolve target version (one above the newest existing fingerprint)
+    if version is None:
+        current_max = fingerprints.with_entities(
+            func.max(models.ReferenceFingerprint.version)
+        ).scalar() or 0
+        version = current_max + 1
+
+    # 2. Resume: skip references that already have this version
+    done_ids = {
+        rid for (rid,) in fingerprints.with_entities(
+            models.ReferenceFingerprint.reference_id
+        ).filter(models.ReferenceFingerprint.version >= version).distinct()
+    }
+
+    pending = [
+        (r.id, extract_keywords(r.metadata_json, r.menu_category))
+        for r in rows if r.id not in done_ids
+    ]
+    shards = [pending[i:i + shard_size] for i in range(0, len(pending), shard_size)]
+
+    # 3. Compute and write shard by shard
+    processed = 0
+    workers = min(max_workers or _default_workers(), max(1, len(shards)))
+    if workers <= 1:
+        for shard in shards:
+            processed += _write_shard(db, _vectorize_shard(shard), version)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_vectorize_shard, shard) for shard in shards]
+            for future in as_completed(futures):
+                processed += _write_shard(db, future.result(), version)
+
+    # 4. Flip pointers and statuses of the whole selection in one transaction
+    #    (also completes the flip of a resumed run whose shards were all written)
+    if rows:
+        reference_repository.refresh_current_fingerprints(db, *criteria)
+        written = select(models.ReferenceFingerprint.reference_id).where(
+            models.ReferenceFingerprint.version == version
+        )
+        db.execute(
+            update(models.Reference)
+            .where(*criteria, models.Reference.id.in_(written))
+            .values(process_status=schemas.ReferenceProcessStatus.COMPLETED)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    duration = time.time() - start_time
+    return {
+        "version": version,
+        "total": len(rows),
+        "skipped": len(done_ids),
+        "processed": processed,
+        "shards": len(shards),
+        "workers": workers,
+        "duration_ms": int(duration * 1000),
+        "refs_per_sec": round(processed / duration, 1) if duration > 0 else None
+    }
+
+
+def _write_shard(db: Session, results: List[Tuple[str, List[str], List[float]]], version: int) -> int:
+    """Bulk insert one shard of fingerprints and commit it as a resume checkpoint (not yet current)."""
+    if not results:
+        return 0
+
+    db.execute(insert(models.ReferenceFingerprint), [
+        {
+            "id": models.generate_uuid(),
+            "reference_id": ref_id,
+            "version": version,
+            "vector": vector,
+            "metrics_json": {"vector_source": "rule_based", "keywords": keywords},
+            "notes": f"Bulk re-vectorization v{version}"
+        }
+        for ref_id, keywords, vector in results
+    ])
+    db.commit()
+    return len(results)
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk re-fingerprint references")
+    parser.add_argument("--org-id", default=None)
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--version", type=int, default=None, help="Resume a previous run at this version")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(revectorize_references(
+            session,
+            org_id=args.org_id,
+            category=args.category,
+            version=args.version,
+            max_workers=args.workers,
+            shard_size=args.shard_size
+        ))
+    finally:
+        session.close()
@@ -0,0 +1,246 @@
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, exists, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .spec_index import to_number
+from .store_criteria import compile_criteria, stable_rank
+
+DEFAULT_STAGES = (1.0, 10.0, 50.0, 100.0)
+DEFAULT_MIN_STAGE_MINUTES = 30.0
+DEFAULT_MAX_DEVIATION_DELTA = 5.0
+PAUSE = "pause"
+ROLLBACK = "rollback"
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+
+def target_filter(deployment: models.Deployment) -> list:
+    """
+    WHERE clauses on Store for the stores a deployment reaches.
+    SELECTED_STORES filters by target_group_json (see store_criteria.compile_criteria):
+    {"region": .., "sales_tier": .., "store_ids": [..]}
+    """
+    if deployment.scope != "SELECTED_STORES":
+        return [models.Store.org_id == deployment.org_id]
+    return compile_criteria(deployment.org_id, deployment.target_group_json)
+
+
+class RolloutPlan(NamedTuple):
+    """
+    Staged rollout from target_group_json["rollout"] (`true` for the defaults):
+      {"stages": [1, 10, 50, 100], "min_stage_minutes": 30, "max_deviation_delta": 5, "on_breach": "pause"}
+    Stages are percentages of the target stores. A stage is promoted once it has
+    run `min_stage_minutes` without its mean deviation exceeding the control
+    stores' by more than `max_deviation_delta` points; a breach pauses or rolls back.
+    """
+    stages: Tuple[float, ...] = DEFAULT_STAGES
+    min_stage_minutes: float = DEFAULT_MIN_STAGE_MINUTES
+    max_deviation_delta: float = DEFAULT_MAX_DEVIATION_DELTA
+    on_breach: str = PAUSE
+
+
+def rollout_plan(deployment) -> Optional[RolloutPlan]:
+    """The deployment's RolloutPlan, or None for an all-at-once deployment"""
+    raw = (deployment.target_group_json or {}).get("rollout")
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        return RolloutPlan()
+
+    stages = sorted({min(pct, 100.0) for pct in map(to_number, raw.get("stages") or DEFAULT_STAGES) if pct and pct > 0})
+    if not stages or stages[-1] < 100.0:
+        stages.append(100.0)
+    min_minutes = to_number(raw.get("min_stage_minutes"))
+    max_delta = to_number(raw.get("max_deviation_delta"))
+    return RolloutPlan(
+        stages=tuple(stages),
+        min_stage_minutes=min_minutes if min_minutes is not None else DEFAULT_MIN_STAGE_MINUTES,
+        max_deviation_delta=max_delta if max_delta is not None else DEFAULT_MAX_DEVIATION_DELTA,
+        on_breach=ROLLBACK if raw.get("on_breach") == ROLLBACK else PAUSE
+    )
+
+
+def stage_memberships(db: Session, deployment, stage: int, plan: RolloutPlan, now: datetime) -> List[Dict]:
+    """
+    Membership rows for the stores entering `stage`: the first stages[stage]%
+    of the target stores in a fixed per-deployment hash order, so every stage
+    extends the previous one. Stores already in the rollout are skipped.
+    """
+    membership = models.DeploymentMembership
+    stores = db.query(models.Store.id, models.Store.active_recipe_version_id).filter(*target_filter(deployment)).all()
+    members = {
+        store_id for (store_id,) in db.query(membership.store_id).filter(membership.deployment_id == deployment.id)
+    }
+    stores.sort(key=lambda store: stable_rank(deployment.id, store.id))
+    reach = math.ceil(len(stores) * plan.stages[stage] / 100.0)
+    return [
+        {
+            "deployment_id": deployment.id,
+            "store_id": store.id,
+            "previous_version_id": store.active_recipe_version_id,
+            "stage": stage,
+            "applied_at": now
+        }
+        for store in stores[:reach]
+        if store.id not in members
+    ]
+
+
+def write_stages(db: Session, memberships: List[Dict], versions: Dict[str, str], deployments: List[Dict]):
+    """
+    Apply stage transitions of any number of deployments in bulk: the new
+    memberships, their stores' version switch (`versions` maps deployment id
+    to its version) and the deployment rows. Does not commit.
+    """
+    if memberships:
+        db.execute(insert(models.DeploymentMembership), memberships)
+        db.execute(update(models.Store), [
+            {"id": m["store_id"], "active_recipe_version_id": versions[m["deployment_id"]]} for m in memberships
+        ])
+    if deployments:
+        db.execute(update(models.Deployment), deployments)
+
+
+def create_deployment(db: Session, data: schemas.DeploymentCreate, org_id: str) -> models.Deployment:
+    version = db.query(models.RecipeVersion).filter(models.RecipeVersion.id == data.recipe_version_id).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Recipe version not found")
+    if version.approval_status != schemas.VersionApprovalStatus.APPROVED.value:
+        raise HTTPException(status_code=400, detail="Only APPROVED versions can be deployed")
+
+    deployment = models.Deployment(
+        org_id=org_id,
+        recipe_version_id=data.recipe_version_id,
+        scope=data.scope,
+        target_group_json=data.target_group_json,
+        scheduled_at=data.scheduled_at,
+        rollback_condition_json=data.rollback_condition_json,
+        rollback_policy_json=data.rollback_policy_json,
+        status="SCHEDULED"
+    )
+    db.add(deployment)
+    db.flush()
+
+    scheduled_at = _utc(data.scheduled_at)
+    if scheduled_at is None or scheduled_at <= datetime.now(timezone.utc):
+        apply_deployment(db, deployment)
+    db.commit()
+    db.refresh(deployment)
+    return deployment
+
+
+def apply_deployment(db: Session, deployment: models.Deployment, now: Optional[datetime] = None) -> int:
+    """
+    Switch the target stores to the deployment's version, remembering what each
+    ran before. Two statements whatever the fleet size. A staged rollout only
+    reaches its first stage and stays ROLLING_OUT. Does not commit.
+    """
+    now = now or datetime.now(timezone.utc)
+    membership = models.DeploymentMembership
+
+    plan = rollout_plan(deployment)
+    if plan is not None:
+        rows = stage_memberships(db, deployment, 0, plan, now)
+        write_stages(db, rows, {deployment.id: deployment.recipe_version_id}, [])
+        deployment.rollout_stage = 0
+        deployment.stage_started_at = now
+        deployment.status = "DEPLOYED" if len(plan.stages) == 1 else "ROLLING_OUT"
+        return len(rows)
+
+    result = db.execute(insert(membership).from_select(
+        ["deployment_id", "store_id", "previous_version_id", "applied_at"],
+        select(
+            literal(deployment.id),
+            models.Store.id,
+            models.Store.active_recipe_version_id,
+            literal(now, DateTime(timezone=True))
+        ).where(*target_filter(deployment))
+    ))
+    db.execute(
+        update(models.Store)
+        .where(models.Store.id.in_(select(membership.store_id).where(membership.deployment_id == deployment.id)))
+        .values(active_recipe_version_id=deployment.recipe_version_id)
+        .execution_options(synchronize_session=False)
+    )
+    deployment.status = "DEPLOYED"
+    return result.rowcount
+
+
+def apply_due_deployments(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """Apply every SCHEDULED deployment whose time has come (scheduler job). Commits each one."""
+    now = now or datetime.now(timezone.utc)
+    due = db.query(models.Deployment).filter(
+        models.Deployment.status == "SCHEDULED",
+        (models.Deployment.scheduled_at.is_(None)) | (models.Deployment.scheduled_at <= now)
+    ).order_by(models.Deployment.scheduled_at).all()
+    applied = []
+    for deployment in due:
+        apply_deployment(db, deployment, now)
+        db.commit()
+        applied.append(deployment.id)
+    return applied
+
+
+def backfill_memberships(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Memberships for DEPLOYED deployments created before memberships existed:
+    every store on the deployment's version, with no known previous version.
+    """
+    now = now or datetime.now(timezone.utc)
+    membership = models.DeploymentMembership
+    legacy = select(
+        models.Deployment.id,
+        models.Store.id,
+        literal(now, DateTime(timezone=True))
+    ).join(
+        models.Store, models.Store.active_recipe_version_id == models.Deployment.recipe_version_id
+    ).where(
+        models.Deployment.status == "DEPLOYED",
+        ~exists().where(membership.deployment_id == models.Deployment.id)
+    )
+    result = db.execute(insert(membership).from_select(["deployment_id", "store_id", "applied_at"], legacy))
+    return result.rowcount
+
+
+def revert_stores(db: Session, deployment_ids: List[str], now: Optional[datetime] = None) -> int:
+    """
+    Put every store of the given deployments back on the exact version it ran
+    before, in one UPDATE (correlated on the membership rows). Stores that have
+    since moved to another version are left alone. Does not commit.
+    """
+    if not deployment_ids:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    membership = models.DeploymentMembership
+    on_this_deployment = and_(
+        membership.store_id == models.Store.id,
+        membership.deployment_id.in_(deployment_ids),
+        membership.reverted_at.is_(None),
+        models.Deployment.recipe_version_id == models.Store.active_recipe_version_id
+    )
+    previous = select(membership.previous_version_id).join(
+        models.Deployment, models.Deployment.id == membership.deployment_id
+    ).where(on_this_deployment).order_by(membership.applied_at.desc()).limit(1).scalar_subquery()
+
+    result = db.execute(
+        update(models.Store)
+        .where(exists(select(membership.store_id).join(
+            models.Deployment, models.Deployment.id == membership.deployment_id
+        ).where(on_this_deployment)))
+        .values(active_recipe_version_id=previous)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(membership)
+        .where(membership.deployment_id.in_(deployment_ids), membership.reverted_at.is_(None))
+        .values(reverted_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,325 @@
+"""
+Rolling step-deviation metrics per store and per recipe version.
+
+The windows and EWMA live in process memory. DeviationRollup holds the last
+persisted snapshot of each series; `rehydrate()` seeds the aggregator from it
+on startup, so a restart resumes from (approximately) where the previous
+process stopped instead of from empty windows. Replicas are not merged: each
+keeps the series for the events it processed, and their rollups overwrite one
+another. Run log ingestion on one replica when alert inputs and rollout health
+must cover every event.
+"""
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+from ..config import float_env
+
+# Fixed-width histogram for p95: 0.5% bins up to 200%, plus one overflow bin
+BIN_WIDTH = 0.5
+MAX_TRACKED = 200.0
+N_BINS = int(MAX_TRACKED / BIN_WIDTH)
+SLOTS_PER_WINDOW = 60
+
+DEFAULT_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+
+STORE = "STORE"
+RECIPE_VERSION = "RECIPE_VERSION"
+
+
+def _bin(value: float) -> int:
+    return min(int(value / BIN_WIDTH), N_BINS) if value > 0 else 0
+
+
+def _parse_windows(raw: Optional[str]) -> Dict[str, int]:
+    """"5m=300,1h=3600" -> {"5m": 300, "1h": 3600}"""
+    if not raw:
+        return dict(DEFAULT_WINDOWS)
+    windows = {}
+    for part in raw.split(","):
+        label, _, seconds = part.partition("=")
+        if label.strip() and seconds.strip().isdigit():
+            windows[label.strip()] = int(seconds)
+    return windows or dict(DEFAULT_WINDOWS)
+
+
+class RollingWindow:
+    """
+    Count / mean / p95 over the last `seconds`.
+    Events land in one of SLOTS_PER_WINDOW time slots; whole slots are evicted
+    as they age out, so adding and evicting are O(1) and memory is bounded by
+    the number of slots, not the number of events.
+    """
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.slot_seconds = seconds / SLOTS_PER_WINDOW
+        self._slots = deque()  # [slot_index, count, sum, Counter(bin -> count)]
+        self.count = 0
+        self.total = 0.0
+        self.hist = [0] * (N_BINS + 1)
+
+    def add(self, value: float, now: float):
+        self.evict(now)
+        index = int(now // self.slot_seconds)
+        if not self._slots or self._slots[-1][0] < index:
+            self._slots.append([index, 0, 0.0, Counter()])
+        slot = self._slots[-1]
+        b = _bin(value)
+        slot[1] += 1
+        slot[2] += value
+        slot[3][b] += 1
+        self.count += 1
+        self.total += value
+        self.hist[b] += 1
+
+    def evict(self, now: float):
+        oldest = int((now - self.seconds) // self.slot_seconds)
+        while self._slots and self._slots[0][0] <= oldest:
+            _, count, total, bins = self._slots.popleft()
+            self.count -= count
+            self.total -= total
+            for b, n in bins.items():
+                self.hist[b] -= n
+        if not self._slots:
+            # Reset float drift once the window is empty
+            self.total = 0.0
+
+    def seed(self, count: int, mean: float, p95: Optional[float], at: float):
+        """
+        Restore a persisted snapshot as one slot at `at`. Count and mean are
+        exact; the histogram only keeps the p95, split between the mean's bin
+        and the p95's bin.
+        """
+        if count <= 0 or mean is None:
+            return
+        below = math.ceil(0.95 * count) - 1
+        bins = Counter({_bin(mean): below})
+        bins[_bin(p95 if p95 is not None else mean)] += count - below
+        self._slots.append([int(at // self.slot_seconds), count, mean * count, bins])
+        self.count += count
+        self.total += mean * count
+        for b, n in bins.items():
+            self.hist[b] += n
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Approximate percentile, interpolated inside the histogram bin"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for b, n in enumerate(self.hist):
+            if n and seen + n >= rank:
+                if b == N_BINS:
+                    return MAX_TRACKED
+                return (b + (rank - seen) / n) * BIN_WIDTH
+            seen += n
+        return MAX_TRACKED
+
+
+class _SeriesStats:
+    def __init__(self, windows: Dict[str, int], alpha: float):
+        self.alpha = alpha
+        self.windows = {label: RollingWindow(seconds) for label, seconds in windows.items()}
+        self.ewma: Optional[float] = None
+
+    def add(self, value: float, now: float):
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+        for window in self.windows.values():
+            window.add(value, now)
+
+
+class DeviationAggregator:
+    """
+    Streaming per-store and per-recipe-version step deviation metrics.
+
+    `observe()` is O(1) per event. Snapshots are written to `DeviationRollup`
+    by `maybe_persist()` at most every `persist_interval` seconds, and only for
+    series that changed since the last write.
+    """
+
+    def __init__(
+        self,
+        windows: Optional[Dict[str, int]] = None,
+        alpha: float = 0.2,
+        persist_interval: float = 30.0,
+        primary_window: Optional[str] = None
+    ):
+        self.windows = windows or dict(DEFAULT_WINDOWS)
+        self.alpha = alpha
+        self.persist_interval = persist_interval
+        self.primary_window = primary_window if primary_window in self.windows else next(iter(self.windows))
+        self._series: Dict[Tuple[str, str], _SeriesStats] = {}
+        self._dirty = set()
+        self._last_persist = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, store_id: Optional[str], recipe_version_id: Optional[str], deviation_pct: float, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for key in ((STORE, store_id), (RECIPE_VERSION, recipe_version_id)):
+                if key[1] is None:
+                    continue
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _SeriesStats(self.windows, self.alpha)
+                series.add(deviation_pct, now)
+                self._dirty.add(key)
+
+    def snapshot(self, scope: str, scope_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        """{"ewma": .., "windows": {label: {"count", "mean", "p95"}}} or None if never observed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            series = self._series.get((scope, scope_id))
+            if series is None:
+                return None
+            return self._snapshot(series, now)
+
+    def _snapshot(self, series: _SeriesStats, now: float) -> Dict:
+        windows = {}
+        for label, window in series.windows.items():
+            window.evict(now)
+            windows[label] = {
+                "count": window.count,
+                "mean": window.mean,
+                "p95": window.percentile(0.95)
+            }
+        return {"ewma": series.ewma, "windows": windows}
+
+    def rolling_mean(self, scope: str, scope_id: str, now: Optional[float] = None) -> Optional[float]:
+        """Mean over the primary window (what Store.deviation reports)"""
+        snap = self.snapshot(scope, scope_id, now)
+        return snap["windows"][self.primary_window]["mean"] if snap else None
+
+    def rehydrate(self, db: Session, now: Optional[float] = None) -> int:
+        """
+        Seed series not observed yet from their DeviationRollup rows (startup).
+        Windows whose rollup is older than the window itself stay empty.
+        Returns the number of series restored.
+        """
+        now = time.time() if now is None else now
+        rollups = db.query(models.DeviationRollup).filter(
+            models.DeviationRollup.window_label.in_(list(self.windows))
+        ).all()
+        restored = 0
+        with self._lock:
+            live = set(self._series)
+            for rollup in rollups:
+                key = (rollup.scope, rollup.scope_id)
+                if key in live:
+                    continue
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = _SeriesStats(self.windows, self.alpha)
+                    restored += 1
+                if rollup.ewma_deviation is not None:
+                    series.ewma = float(rollup.ewma_deviation)
+                window = series.windows[rollup.window_label]
+                at = _timestamp(rollup.updated_at) if rollup.updated_at is not None else now
+                if window.seconds == rollup.window_seconds and now - at < window.seconds:
+                    window.seed(
+                        rollup.sample_count or 0,
+                        _float(rollup.mean_deviation),
+                        _float(rollup.p95_deviation),
+                        at
+                    )
+        return restored
+
+    def maybe_persist(self, db: Session, force: bool = False, now: Optional[float] = None) -> int:
+        """Write rollups for changed series if the persist interval has elapsed. Does not commit."""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._dirty or (not force and now - self._last_persist < self.persist_interval):
+                return 0
+            snapshots = [(key, self._snapshot(self._series[key], now)) for key in self._dirty]
+            persisted_at = datetime.fromtimestamp(now, tz=timezone.utc)
+            self._dirty = set()
+            self._last_persist = now
+
+        try:
+            # Savepoint: a concurrent writer racing on a new rollup must not fail the caller's batch
+            with db.begin_nested():
+                self._write_rollups(db, snapshots, persisted_at)
+        except IntegrityError:
+            with self._lock:
+                self._dirty.update(key for key, _ in snapshots)
+            return 0
+        return len(snapshots)
+
+    def _write_rollups(self, db: Session, snapshots: List[Tuple[Tuple[str, str], Dict]], persisted_at: datetime):
+        scope_ids = {scope_id for (_, scope_id), _ in snapshots}
+        existing = {
+            (r.scope, r.scope_id, r.window_label): r.id
+            for r in db.query(
+                models.DeviationRollup.id,
+                models.DeviationRollup.scope,
+                models.DeviationRollup.scope_id,
+                models.DeviationRollup.window_label
+            ).filter(models.DeviationRollup.scope_id.in_(scope_ids))
+        }
+
+        inserts, updates = [], []
+        for (scope, scope_id), snap in snapshots:
+            for label, stats in snap["windows"].items():
+                row = {
+                    "sample_count": stats["count"],
+                    "mean_deviation": _round(stats["mean"]),
+                    "p95_deviation": _round(stats["p95"]),
+                    "ewma_deviation": _round(snap["ewma"]),
+                    "updated_at": persisted_at  # rehydrate() ages restored windows from here
+                }
+                rollup_id = existing.get((scope, scope_id, label))
+                if rollup_id:
+                    updates.append({"id": rollup_id, **row})
+                else:
+                    inserts.append({
+                        "id": models.generate_uuid(),
+                        "scope": scope,
+                        "scope_id": scope_id,
+                        "window_label": label,
+                        "window_seconds": self.windows[label],
+                        **row
+                    })
+        if inserts:
+            db.execute(insert(models.DeviationRollup), inserts)
+        if updates:
+            db.execute(update(models.DeviationRollup), updates)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._dirty = set()
+            self._last_persist = 0.0
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def _timestamp(ts: datetime) -> float:
+    return (ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts).timestamp()
+
+
+deviation_aggregator = DeviationAggregator(
+    windows=_parse_windows(os.getenv("FLAVOROS_DEVIATION_WINDOWS")),
+    alpha=float_env("FLAVOROS_DEVIATION_EWMA_ALPHA", 0.2),
+    persist_interval=float_env("FLAVOROS_DEVIATION_PERSIST_INTERVAL", 30.0),
+    primary_window=os.getenv("FLAVOROS_DEVIATION_PRIMARY_WINDOW", "1h")
+)
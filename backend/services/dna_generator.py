@@ -2,6 +2,7 @@ import hashlib
 import statistics
 from sqlalchemy.orm import Session
 from backend import models, schemas
+from backend.services.reference_repository import reference_repository
 
 # Flavor axis names (Korean)
 AXES = ["매운맛", "단맛", "감칠맛", "상큼함", "풍미"]
@@ -20,15 +21,14 @@ def generate_dna_signature(reference_id: str, org_id: str, db: Session) -> model
     Generate a unique DNA signature for a brand reference.
     """
     # 1. Get reference and its fingerprint
-    ref = db.query(models.Reference).filter(models.Reference.id == reference_id).first()
+    ref = reference_repository.get_with_vector(db, reference_id)
     if not ref:
         raise ValueError(f"Reference {reference_id} not found")
     
-    if not ref.fingerprints:
+    if not ref.current_fingerprint_id:
         raise ValueError(f"Reference {reference_id} has no fingerprint vectors")
     
-    fp = ref.fingerprints[0]  # Latest fingerprint
-    vector = fp.vector
+    vector = ref.current_vector  # Latest fingerprint
     
     if not vector or len(vector) < 5:
         # Use default vector if missing
@@ -87,7 +87,7 @@ def get_radar_animation_data(transform_id: str, db: Session) -> dict:
     
     # Get before vector (from reference_1)
     ref1 = db.query(models.Reference).filter(models.Reference.id == transform.reference_1_id).first()
-    before = ref1.fingerprints[0].vector if ref1 and ref1.fingerprints else [0.5] * 5
+    before = ref1.current_vector if ref1 and ref1.current_vector else [0.5] * 5
     
     # Get after vector (from result recipe version)
     recipe_ver = db.query(models.RecipeVersion).filter(
@@ -1,8 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-import random
+from sqlalchemy import update
+from typing import Dict, List
 from .. import models, schemas
-from datetime import datetime
+from .experiment_stats import experiment_stats
+from .spec_index import to_number
+from .store_criteria import compile_criteria, stable_rank
+
+# Strata that assignment balances by default; any of these can be named in "stratify_by"
+STRATA_COLUMNS = {
+    "region": models.Store.region,
+    "sales_tier": models.Store.sales_tier,
+    "status": models.Store.status,
+}
+DEFAULT_STRATA = ("region", "sales_tier")
 
 class ExperimentService:
     def create_experiment(self, db: Session, exp_create: schemas.ExperimentCreate, test_version_id: str, control_version_id: str):
@@ -23,34 +33,71 @@ class ExperimentService:
         return experiment
 
     def assign_stores(self, db: Session, experiment_id: str):
-        """Randomly assign eligible stores to Control/Test groups"""
+        """
+        Assign the stores matching target_criteria_json to Control/Test groups.
+
+        Eligible stores come from one filtered query (see
+        store_criteria.compile_criteria; ACTIVE stores unless the criteria name
+        a status). Within each stratum (by default region x sales tier) stores
+        are ordered by hash(experiment_id, store_id) and split at `test_ratio`,
+        so the split is balanced per stratum and the same on every run.
+        Groups and versions are written in one bulk UPDATE.
+        """
         experiment = db.query(models.Experiment).filter(models.Experiment.id == experiment_id).first()
         if not experiment:
             raise ValueError("Experiment not found")
-            
-        # 1. Find eligible stores (Simple mock: All active stores in org)
-        # In real world: Filter by target_criteria_json (Region, Sales, etc.)
-        stores = db.query(models.Store).filter(
-            models.Store.org_id == experiment.org_id,
-            models.Store.status == 'ACTIVE'
-        ).all()
-        
-        assigned_count = 0
-        for store in stores:
-            # Random assignment 50/50
-            group = 'TEST' if random.random() > 0.5 else 'CONTROL'
-            store.experiment_group = group
-            
-            # Set active version based on group
-            if group == 'TEST':
-                store.active_recipe_version_id = experiment.test_version_id
-            else:
-                store.active_recipe_version_id = experiment.control_version_id
-            
-            assigned_count += 1
-            
+
+        criteria = experiment.target_criteria_json or {}
+        stratify_by = [key for key in criteria.get("stratify_by", DEFAULT_STRATA) if key in STRATA_COLUMNS]
+        test_ratio = to_number(criteria.get("test_ratio"))
+        test_ratio = min(max(test_ratio, 0.0), 1.0) if test_ratio is not None else 0.5
+
+        stores = db.query(
+            models.Store.id, *[STRATA_COLUMNS[key] for key in stratify_by]
+        ).filter(*compile_criteria(experiment.org_id, criteria, default_status="ACTIVE")).all()
+        groups = stratified_split(experiment.id, stores, test_ratio)
+
+        versions = {"TEST": experiment.test_version_id, "CONTROL": experiment.control_version_id}
+        if groups:
+            db.execute(update(models.Store), [
+                {"id": store_id, "experiment_group": group, "active_recipe_version_id": versions[group]}
+                for store_id, group in groups.items()
+            ])
+        # Results restart from this assignment's units and baselines
+        experiment_stats.initialize(db, experiment, groups)
+
         experiment.status = schemas.ExperimentStatus.RUNNING
         db.commit()
-        return {"assigned_stores": assigned_count}
+        test_count = sum(1 for group in groups.values() if group == "TEST")
+        return {
+            "assigned_stores": len(groups),
+            "test_stores": test_count,
+            "control_stores": len(groups) - test_count,
+            "strata": len({tuple(store[1:]) for store in stores})
+        }
+
+
+def stratified_split(experiment_id: str, stores, test_ratio: float = 0.5) -> Dict[str, str]:
+    """
+    store id -> 'TEST' / 'CONTROL'. `stores` are (id, *stratum) rows; each
+    stratum sends about n * test_ratio of its stores to TEST, in hash order.
+    """
+    strata: Dict[tuple, List[str]] = {}
+    for store in stores:
+        strata.setdefault(tuple(store[1:]), []).append(store[0])
+
+    groups = {}
+    # The rounding remainder carries over between strata, so the overall split
+    # stays at test_ratio as well
+    carry = 0.0
+    for key in sorted(strata, key=lambda key: tuple(str(part) for part in key)):
+        store_ids = sorted(strata[key], key=lambda store_id: stable_rank(experiment_id, store_id))
+        exact = len(store_ids) * test_ratio + carry
+        test_count = min(len(store_ids), max(0, int(exact + 0.5)))
+        carry = exact - test_count
+        for i, store_id in enumerate(store_ids):
+            groups[store_id] = "TEST" if i < test_count else "CONTROL"
+    return groups
+
 
 experiment_service = ExperimentService()
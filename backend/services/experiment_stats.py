@@ -0,0 +1,393 @@
+import math
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend import models
+from ..config import float_env, int_env
+
+STEP_DEVIATION = "step_deviation"
+DAILY_DEVIATION = "daily_deviation"
+DAILY_SALES = "daily_sales"
+METRICS = (STEP_DEVIATION, DAILY_DEVIATION, DAILY_SALES)
+GROUPS = ("CONTROL", "TEST")
+
+# Which baseline is the CUPED covariate of each metric
+_BASELINE = {STEP_DEVIATION: "baseline_deviation", DAILY_DEVIATION: "baseline_deviation", DAILY_SALES: "baseline_sales"}
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+class Observation(NamedTuple):
+    store_id: str
+    metric: str
+    value: float
+    recipe_version_id: Optional[str] = None  # step observations count only on the group's version
+    day: Optional[date] = None  # daily metrics count only from the assignment day on
+
+
+class RunningStats(NamedTuple):
+    """Sufficient statistics of y (metric) and x (baseline covariate)"""
+    n: int = 0
+    sum_y: float = 0.0
+    sum_y2: float = 0.0
+    sum_x: float = 0.0
+    sum_x2: float = 0.0
+    sum_xy: float = 0.0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum_y / self.n if self.n else None
+
+    @property
+    def mean_x(self) -> Optional[float]:
+        return self.sum_x / self.n if self.n else None
+
+    def _centered(self, a: float, b: float, ab: float) -> float:
+        return ab - a * b / self.n
+
+    @property
+    def var(self) -> Optional[float]:
+        return max(self._centered(self.sum_y, self.sum_y, self.sum_y2), 0.0) / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def var_x(self) -> Optional[float]:
+        return max(self._centered(self.sum_x, self.sum_x, self.sum_x2), 0.0) / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def cov_xy(self) -> Optional[float]:
+        return self._centered(self.sum_x, self.sum_y, self.sum_xy) / (self.n - 1) if self.n > 1 else None
+
+
+# --- Distributions (no scipy in this deployment) ---
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction of the incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def t_two_sided_p(t: float, df: float) -> float:
+    if df <= 0 or math.isnan(t):
+        return 1.0
+    return _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def normal_two_sided_p(z: float) -> float:
+    return math.erfc(abs(z) / math.sqrt(2.0))
+
+
+# --- Tests ---
+
+def welch_test(control: RunningStats, test: RunningStats) -> Optional[Dict]:
+    """Welch's unequal-variance t-test on test - control"""
+    if control.n < 2 or test.n < 2:
+        return None
+    va, vb = control.var / control.n, test.var / test.n
+    diff = test.mean - control.mean
+    se2 = va + vb
+    if se2 <= 0:
+        return {"diff": diff, "se": 0.0, "t": None, "df": None, "p_value": 1.0 if diff == 0 else 0.0}
+    se = math.sqrt(se2)
+    df = se2 ** 2 / (va ** 2 / (control.n - 1) + vb ** 2 / (test.n - 1))
+    t = diff / se
+    return {"diff": diff, "se": se, "t": t, "df": df, "p_value": t_two_sided_p(t, df)}
+
+
+def cuped_test(control: RunningStats, test: RunningStats) -> Optional[Dict]:
+    """
+    CUPED: y - theta * (x - mean x), theta pooled over both groups.
+    Same difference in expectation, lower variance when the baseline predicts y.
+    """
+    if control.n < 2 or test.n < 2:
+        return None
+    var_x = (control.n - 1) * control.var_x + (test.n - 1) * test.var_x
+    if var_x <= 0:
+        return None
+    theta = ((control.n - 1) * control.cov_xy + (test.n - 1) * test.cov_xy) / var_x
+    mean_x = (control.sum_x + test.sum_x) / (control.n + test.n)
+
+    def adjusted(s: RunningStats) -> Tuple[float, float]:
+        mean = s.mean - theta * (s.mean_x - mean_x)
+        var = max(s.var - 2 * theta * s.cov_xy + theta * theta * s.var_x, 0.0)
+        return mean, var / s.n
+
+    mean_a, va = adjusted(control)
+    mean_b, vb = adjusted(test)
+    raw = control.var / control.n + test.var / test.n
+    se = math.sqrt(va + vb)
+    diff = mean_b - mean_a
+    z = diff / se if se > 0 else None
+    return {
+        "diff": diff,
+        "se": se,
+        "theta": theta,
+        "variance_reduction": 1.0 - (va + vb) / raw if raw > 0 else 0.0,
+        "p_value": normal_two_sided_p(z) if z is not None else (1.0 if diff == 0 else 0.0)
+    }
+
+
+def msprt(diff: float, se: float, tau: float, alpha: float) -> Optional[Dict]:
+    """
+    Mixture sequential probability ratio test (normal mixture N(0, tau^2) on
+    the effect). Valid at any number of looks: stop once the likelihood
+    ratio reaches 1/alpha, i.e. |diff| crosses `boundary`.
+    """
+    if se is None or se <= 0 or tau <= 0:
+        return None
+    v, t2 = se * se, tau * tau
+    log_lr = 0.5 * math.log(v / (v + t2)) + t2 * diff * diff / (2 * v * (v + t2))
+    boundary = math.sqrt(2 * v * (v + t2) / t2 * (math.log(1 / alpha) + 0.5 * math.log((v + t2) / v)))
+    return {
+        "likelihood_ratio": math.exp(min(log_lr, 700.0)),
+        "p_value": min(1.0, math.exp(-log_lr)),
+        "boundary": boundary,
+        "decision": "STOP" if log_lr >= math.log(1 / alpha) else "CONTINUE"
+    }
+
+
+class ExperimentStats:
+    """
+    Online A/B results.
+
+    Assignment records each store's unit (group + pre-experiment baseline) and
+    one ExperimentGroupStats row per group and metric. Stores are the unit of
+    randomization, so readings are first averaged per store (running count and
+    sum on ExperimentUnit) and the group rows hold sums over store means: a busy
+    store weighs as much as a quiet one and repeated readings do not inflate n.
+    Ingestion updates both with one batch each, so reading results never
+    rescans history: Welch, CUPED and the sequential boundary come from six rows.
+    """
+
+    def __init__(self, baseline_days: int = 14, tau: float = 2.0, alpha: float = 0.05):
+        self.baseline_days = baseline_days
+        self.tau = tau
+        self.alpha = alpha
+
+    def initialize(self, db: Session, experiment: models.Experiment, groups: Dict[str, str],
+                   now: Optional[datetime] = None) -> int:
+        """(Re)start the statistics for a fresh assignment. Does not commit."""
+        now = now or datetime.now(timezone.utc)
+        db.execute(delete(models.ExperimentUnit).where(models.ExperimentUnit.experiment_id == experiment.id))
+        db.execute(delete(models.ExperimentGroupStats).where(models.ExperimentGroupStats.experiment_id == experiment.id))
+        db.execute(insert(models.ExperimentGroupStats), [
+            {
+                "id": models.generate_uuid(), "experiment_id": experiment.id, "group_name": group, "metric": metric,
+                "n": 0, "sum_y": 0.0, "sum_y2": 0.0, "sum_x": 0.0, "sum_x2": 0.0, "sum_xy": 0.0
+            }
+            for group in GROUPS for metric in METRICS
+        ])
+        if not groups:
+            return 0
+
+        baselines = self._baselines(db, list(groups), now)
+        db.execute(insert(models.ExperimentUnit), [
+            {
+                "experiment_id": experiment.id,
+                "store_id": store_id,
+                "group_name": group,
+                "baseline_deviation": baselines.get(store_id, (None, None))[0],
+                "baseline_sales": baselines.get(store_id, (None, None))[1],
+                "assigned_at": now
+            }
+            for store_id, group in groups.items()
+        ])
+        return len(groups)
+
+    def _baselines(self, db: Session, store_ids: List[str], now: datetime) -> Dict[str, Tuple[float, float]]:
+        """Pre-period means per store; deviation falls back to Store.deviation, sales to the cohort mean"""
+        since = now - timedelta(days=self.baseline_days)
+        metric = models.StoreDailyMetric
+        pre = {
+            store_id: (dev, sales)
+            for store_id, dev, sales in db.query(
+                metric.store_id, func.avg(metric.avg_deviation), func.avg(metric.total_sales)
+            ).filter(
+                metric.store_id.in_(store_ids), metric.date >= since, metric.date < now
+            ).group_by(metric.store_id)
+        }
+        known_sales = [float(sales) for _, sales in pre.values() if sales is not None]
+        cohort_sales = sum(known_sales) / len(known_sales) if known_sales else 0.0
+        current = dict(db.query(models.Store.id, models.Store.deviation).filter(models.Store.id.in_(store_ids)))
+
+        baselines = {}
+        for store_id in store_ids:
+            dev, sales = pre.get(store_id, (None, None))
+            if dev is None:
+                dev = current.get(store_id)
+            baselines[store_id] = (
+                float(dev) if dev is not None else 0.0,
+                float(sales) if sales is not None else cohort_sales
+            )
+        return baselines
+
+    def observe(self, db: Session, observations: Iterable[Observation]) -> int:
+        """
+        Fold observations from stores in RUNNING experiments into their units'
+        running sums, and move each touched store's mean in the group
+        statistics: one unit lookup and one executemany UPDATE per table.
+        Does not commit. Returns the number of observations counted.
+        """
+        observations = [o for o in observations if o.store_id and o.value is not None and o.metric in _BASELINE]
+        if not observations:
+            return 0
+        units = {}
+        for unit, control_version, test_version in db.query(
+            models.ExperimentUnit, models.Experiment.control_version_id, models.Experiment.test_version_id
+        ).join(
+            models.Experiment, models.Experiment.id == models.ExperimentUnit.experiment_id
+        ).filter(
+            models.ExperimentUnit.store_id.in_({o.store_id for o in observations}),
+            models.Experiment.status == "RUNNING"
+        ):
+            version = test_version if unit.group_name == "TEST" else control_version
+            units.setdefault(unit.store_id, []).append((unit, version))
+        if not units:
+            return 0
+
+        # (unit, metric) -> [count, sum] of this batch
+        batch: Dict[Tuple[str, str, str], List] = {}
+        for o in observations:
+            for unit, version in units.get(o.store_id, ()):
+                if o.recipe_version_id is not None and o.recipe_version_id != version:
+                    continue
+                if o.day is not None and o.day < _utc(unit.assigned_at).date():
+                    continue
+                b = batch.setdefault((unit.experiment_id, unit.store_id, o.metric), [unit, 0, 0.0])
+                b[1] += 1
+                b[2] += float(o.value)
+        if not batch:
+            return 0
+
+        deltas: Dict[Tuple[str, str, str], List[float]] = {}
+        unit_rows = []
+        for (experiment_id, store_id, metric), (unit, count, total) in batch.items():
+            old_n = getattr(unit, f"{metric}_n") or 0
+            old_sum = getattr(unit, f"{metric}_sum") or 0.0
+            new_n, new_sum = old_n + count, old_sum + total
+            old_mean = old_sum / old_n if old_n else 0.0
+            new_mean = new_sum / new_n
+            x = getattr(unit, _BASELINE[metric]) or 0.0
+            first = not old_n
+
+            d = deltas.setdefault((experiment_id, unit.group_name, metric), [0, 0.0, 0.0, 0.0, 0.0, 0.0])
+            d[0] += first
+            d[1] += new_mean - old_mean
+            d[2] += new_mean * new_mean - old_mean * old_mean
+            d[3] += x if first else 0.0
+            d[4] += x * x if first else 0.0
+            d[5] += x * (new_mean - old_mean)
+            unit_rows.append({
+                "experiment_id": experiment_id, "store_id": store_id,
+                f"{metric}_n": new_n, f"{metric}_sum": new_sum
+            })
+            set_committed_value(unit, f"{metric}_n", new_n)
+            set_committed_value(unit, f"{metric}_sum", new_sum)
+
+        # One executemany per metric (rows of a statement share their columns)
+        for metric in METRICS:
+            rows = [row for row in unit_rows if f"{metric}_n" in row]
+            if rows:
+                db.execute(update(models.ExperimentUnit), rows)
+
+        stats = models.ExperimentGroupStats.__table__
+        db.execute(
+            update(stats)
+            .where(
+                stats.c.experiment_id == bindparam("_experiment_id"),
+                stats.c.group_name == bindparam("_group"),
+                stats.c.metric == bindparam("_metric")
+            )
+            .values(
+                n=stats.c.n + bindparam("_n"),
+                sum_y=stats.c.sum_y + bindparam("_sum_y"),
+                sum_y2=stats.c.sum_y2 + bindparam("_sum_y2"),
+                sum_x=stats.c.sum_x + bindparam("_sum_x"),
+                sum_x2=stats.c.sum_x2 + bindparam("_sum_x2"),
+                sum_xy=stats.c.sum_xy + bindparam("_sum_xy")
+            ),
+            [
+                {
+                    "_experiment_id": key[0], "_group": key[1], "_metric": key[2],
+                    "_n": d[0], "_sum_y": d[1], "_sum_y2": d[2], "_sum_x": d[3], "_sum_x2": d[4], "_sum_xy": d[5]
+                }
+                for key, d in deltas.items()
+            ]
+        )
+        return sum(count for _, count, _ in batch.values())
+
+    def results(self, db: Session, experiment_id: str, alpha: Optional[float] = None,
+                tau: Optional[float] = None) -> Dict[str, Dict]:
+        """Per-metric results from the running statistics (no history scan)"""
+        alpha = alpha or self.alpha
+        tau = tau or self.tau
+        rows = db.query(models.ExperimentGroupStats).filter(
+            models.ExperimentGroupStats.experiment_id == experiment_id
+        ).all()
+        stats: Dict[str, Dict[str, RunningStats]] = {}
+        for row in rows:
+            stats.setdefault(row.metric, {})[row.group_name] = RunningStats(
+                row.n or 0, row.sum_y or 0.0, row.sum_y2 or 0.0, row.sum_x or 0.0, row.sum_x2 or 0.0, row.sum_xy or 0.0
+            )
+
+        results = {}
+        for metric in METRICS:
+            control = stats.get(metric, {}).get("CONTROL", RunningStats())
+            test = stats.get(metric, {}).get("TEST", RunningStats())
+            welch = welch_test(control, test)
+            cuped = cuped_test(control, test)
+            # The sequential test uses the tighter CUPED estimate when there is one
+            best = cuped or welch
+            results[metric] = {
+                "control": {"n": control.n, "mean": control.mean, "var": control.var},
+                "test": {"n": test.n, "mean": test.mean, "var": test.var},
+                "welch": welch,
+                "cuped": cuped,
+                "sequential": msprt(best["diff"], best["se"], tau, alpha) if best else None
+            }
+        return results
+
+
+experiment_stats = ExperimentStats(
+    baseline_days=int_env("FLAVOROS_EXPERIMENT_BASELINE_DAYS", 14),
+    tau=float_env("FLAVOROS_EXPERIMENT_MSPRT_TAU", 2.0),
+    alpha=float_env("FLAVOROS_EXPERIMENT_ALPHA", 0.05)
+)
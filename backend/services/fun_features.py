@@ -3,6 +3,7 @@ import hashlib
 from datetime import datetime
 from sqlalchemy.orm import Session
 from backend import models
+from backend.services.reference_repository import reference_repository
 
 AXES = ["매운맛", "단맛", "감칠맛", "상큼함", "풍미"]
 
@@ -99,8 +100,8 @@ def create_vector_snapshot(
         raise ValueError("Reference not found")
     
     vector = [0.5] * 5
-    if ref.fingerprints:
-        vector = ref.fingerprints[0].vector[:5]
+    if ref.current_vector:
+        vector = ref.current_vector[:5]
     
     # Generate unique share code
     share_code = hashlib.sha256(
@@ -131,14 +132,15 @@ def mix_battle(
     """
     Mix two references and score the result.
     """
-    ref1 = db.query(models.Reference).filter(models.Reference.id == ref1_id).first()
-    ref2 = db.query(models.Reference).filter(models.Reference.id == ref2_id).first()
+    refs = {r.id: r for r in reference_repository.load_with_vectors(db, [ref1_id, ref2_id])}
+    ref1 = refs.get(ref1_id)
+    ref2 = refs.get(ref2_id)
     
     if not ref1 or not ref2:
         raise ValueError("Reference not found")
     
-    vec1 = _normalize_vector(ref1.fingerprints[0].vector if ref1.fingerprints else [])
-    vec2 = _normalize_vector(ref2.fingerprints[0].vector if ref2.fingerprints else [])
+    vec1 = _normalize_vector(ref1.current_vector or [])
+    vec2 = _normalize_vector(ref2.current_vector or [])
     
     # Mix vectors
     mixed = [vec1[i] * (1 - mix_ratio) + vec2[i] * mix_ratio for i in range(5)]
@@ -244,13 +246,12 @@ def optimize_portfolio(
     """
     # Get all reference vectors
     refs = []
-    for ref_id in reference_ids:
-        ref = db.query(models.Reference).filter(models.Reference.id == ref_id).first()
-        if ref and ref.fingerprints:
+    for ref in reference_repository.load_with_vectors(db, reference_ids):
+        if ref.current_vector:
             refs.append({
                 "id": ref.id,
                 "name": ref.name,
-                "vector": ref.fingerprints[0].vector[:5]
+                "vector": ref.current_vector[:5]
             })
     
     if len(refs) < 2:
@@ -5,6 +5,8 @@ import re
 from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
+from ..config import float_env, int_env
+
 try:
     from llama_cpp import Llama
 except Exception:
@@ -13,26 +15,6 @@ except Exception:
 logger = logging.getLogger(__name__)
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = os.getenv(name)
-    if raw is None or raw.strip() == "":
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
-
-
-def _float_env(name: str, default: float) -> float:
-    raw = os.getenv(name)
-    if raw is None or raw.strip() == "":
-        return default
-    try:
-        return float(raw)
-    except ValueError:
-        return default
-
-
 def _extract_json(text: str) -> Optional[Any]:
     if not text:
         return None
@@ -58,9 +40,9 @@ def _load_llm() -> Optional["Llama"]:
     model_path = os.getenv("JOOMIDANG_LLM_MODEL", "").strip()
     if not model_path:
         return None
-    n_ctx = _int_env("JOOMIDANG_LLM_N_CTX", 4096)
-    n_threads = _int_env("JOOMIDANG_LLM_N_THREADS", 0)
-    n_gpu_layers = _int_env("JOOMIDANG_LLM_GPU_LAYERS", -1)
+    n_ctx = int_env("JOOMIDANG_LLM_N_CTX", 4096)
+    n_threads = int_env("JOOMIDANG_LLM_N_THREADS", 0)
+    n_gpu_layers = int_env("JOOMIDANG_LLM_GPU_LAYERS", -1)
     chat_format = os.getenv("JOOMIDANG_LLM_CHAT_FORMAT", "gemma").strip() or None
     try:
         return Llama(
@@ -85,8 +67,8 @@ def generate_chat(messages: List[Dict[str, str]]) -> Optional[str]:
     llm = _load_llm()
     if llm is None:
         return None
-    max_tokens = _int_env("JOOMIDANG_LLM_MAX_NEW_TOKENS", 512)
-    temperature = _float_env("JOOMIDANG_LLM_TEMPERATURE", 0.2)
+    max_tokens = int_env("JOOMIDANG_LLM_MAX_NEW_TOKENS", 512)
+    temperature = float_env("JOOMIDANG_LLM_TEMPERATURE", 0.2)
     try:
         out = llm.create_chat_completion(
             messages=messages,
@@ -0,0 +1,250 @@
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from backend import models
+from .log_processor import collect_step_checks
+from .spec_index import spec_index
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+    pc = None
+    ds = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("FLAVOROS_LOG_ARCHIVE_DIR", "./log_archive")
+ARCHIVE_BATCH_SIZE = 5000
+
+
+def archive_enabled() -> bool:
+    """
+    Archiving is on unless FLAVOROS_LOG_ARCHIVE turns it off. While it is on,
+    retention only drops partitions that have been archived, even if
+    pyarrow is missing.
+    """
+    return os.getenv("FLAVOROS_LOG_ARCHIVE", "1").strip().lower() not in ("0", "false", "no")
+
+GROUP_COLUMNS = ("day", "org_id", "store_id", "region", "recipe_version_id", "event_type", "step_name", "param", "unit")
+METRIC_COLUMNS = ("deviation_pct", "measured", "target")
+
+
+def archive_schema():
+    """Raw log rows with payload_json flattened (one row per measured param)"""
+    return pa.schema([
+        ("log_id", pa.string()),
+        ("org_id", pa.string()),
+        ("store_id", pa.string()),
+        ("region", pa.string()),
+        ("recipe_version_id", pa.string()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("event_type", pa.string()),
+        ("step_name", pa.string()),
+        ("param", pa.string()),
+        ("unit", pa.string()),
+        ("measured", pa.float64()),
+        ("target", pa.float64()),
+        ("deviation_pct", pa.float64()),
+    ])
+
+
+def _require_arrow():
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+
+
+def _partition_dir(day: str) -> str:
+    # Hive-style layout so the dataset reader prunes whole days from the path
+    return os.path.join(ARCHIVE_DIR, f"day={day}")
+
+
+def _flatten(rows: List, db: Session) -> "pa.RecordBatch":
+    """(ExecutionLog, region) rows -> archive record batch"""
+    logs = [row for row, _ in rows]
+    checks = collect_step_checks(logs, db)
+
+    by_log: Dict[str, List[int]] = {}
+    if checks is not None:
+        for i, log in enumerate(checks.logs):
+            by_log.setdefault(log.id, []).append(i)
+
+    columns = {name: [] for name in archive_schema().names}
+    for log, region in rows:
+        payload = log.payload_json or {}
+        ts = log.ts.replace(tzinfo=timezone.utc) if log.ts is not None and log.ts.tzinfo is None else log.ts
+        base = {
+            "log_id": log.id,
+            "org_id": log.org_id,
+            "store_id": log.store_id,
+            "region": region,
+            "recipe_version_id": log.recipe_version_id,
+            "ts": ts,
+            "event_type": log.event_type,
+            "step_name": payload.get("step_name"),
+            "unit": payload.get("unit"),
+        }
+        hits = by_log.get(log.id) or [None]
+        for i in hits:
+            row = dict(base)
+            if i is None:
+                row.update(param=payload.get("param"), measured=None, target=None, deviation_pct=None)
+            else:
+                row.update(
+                    param=checks.params[i],
+                    measured=float(checks.measured[i]),
+                    target=float(checks.target[i]),
+                    deviation_pct=float(checks.deviation_pct[i]) if checks.valid[i] else None
+                )
+            for name, value in row.items():
+                columns[name].append(value)
+
+    return pa.RecordBatch.from_pydict(columns, schema=archive_schema())
+
+
+def archive_partition(db: Session, day: str) -> Dict:
+    """
+    Export one closed day of raw logs to Parquet (one row group per batch).
+    The file is written under a temporary name and renamed, so readers never see a partial day.
+    """
+    _require_arrow()
+    partition = db.query(models.LogPartition).filter(models.LogPartition.day == day).first()
+    if partition is None:
+        raise ValueError(f"Unknown log partition {day}")
+
+    query = db.query(models.ExecutionLog, models.Store.region).outerjoin(
+        models.Store, models.Store.id == models.ExecutionLog.store_id
+    ).filter(models.ExecutionLog.partition_day == day)
+
+    # Compile specs up front so no other query runs while rows are streaming
+    spec_index.prime(db, (
+        rid for (rid,) in db.query(models.ExecutionLog.recipe_version_id).filter(
+            models.ExecutionLog.partition_day == day
+        ).distinct()
+    ))
+
+    directory = _partition_dir(day)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "part-0.parquet")
+    # Dot-prefixed so dataset scans skip it until the rename
+    tmp_path = os.path.join(directory, ".part-0.parquet.tmp")
+
+    rows_written = 0
+    with pq.ParquetWriter(tmp_path, archive_schema(), compression="zstd") as writer:
+        batch = []
+        for row in query.yield_per(ARCHIVE_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) >= ARCHIVE_BATCH_SIZE:
+                record_batch = _flatten(batch, db)
+                writer.write_batch(record_batch)
+                rows_written += record_batch.num_rows
+                batch = []
+        if batch:
+            record_batch = _flatten(batch, db)
+            writer.write_batch(record_batch)
+            rows_written += record_batch.num_rows
+    os.replace(tmp_path, path)
+
+    partition.archive_path = path
+    partition.archived_at = datetime.now(timezone.utc)
+    return {"day": day, "path": path, "rows": rows_written}
+
+
+def archive_pending_partitions(db: Session) -> List[Dict]:
+    """
+    Archive every compacted partition that has no Parquet file yet (no-op
+    without pyarrow). A failed day stays unarchived and is retried next pass.
+    """
+    if pa is None or not archive_enabled():
+        if pa is None and archive_enabled():
+            logger.warning("pyarrow is not installed; log partitions are not archived and will not be dropped")
+        return []
+    pending = db.query(models.LogPartition.day).filter(
+        models.LogPartition.status == "COMPACTED",
+        models.LogPartition.archived_at.is_(None)
+    ).order_by(models.LogPartition.day).all()
+
+    archived = []
+    for (day,) in pending:
+        try:
+            archived.append(archive_partition(db, day))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to archive log partition %s", day)
+    return archived
+
+
+def query_archive(
+    group_by: List[str],
+    metric: str = "deviation_pct",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    org_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    region: Optional[str] = None,
+    event_type: Optional[str] = None,
+    step_name: Optional[str] = None,
+    limit: int = 100
+) -> Dict:
+    """
+    Grouped count / mean / min / max / stddev of `metric` over archived days.
+    Day bounds prune partition directories; the other filters are pushed down
+    to the Parquet scan (row-group statistics).
+    """
+    _require_arrow()
+    unknown = [c for c in group_by if c not in GROUP_COLUMNS]
+    if not group_by or unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must be a subset of {list(GROUP_COLUMNS)}")
+    if metric not in METRIC_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {list(METRIC_COLUMNS)}")
+
+    if not os.path.isdir(ARCHIVE_DIR):
+        return {"metric": metric, "group_by": group_by, "groups": [], "rows_matched": 0}
+
+    dataset = ds.dataset(
+        ARCHIVE_DIR,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("day", pa.string())]), flavor="hive")
+    )
+
+    expr = pc.field(metric).is_valid()
+    if since:
+        expr &= pc.field("day") >= since
+    if until:
+        expr &= pc.field("day") < until
+    for column, value in (("org_id", org_id), ("store_id", store_id), ("region", region),
+                          ("event_type", event_type), ("step_name", step_name)):
+        if value:
+            expr &= pc.field(column) == value
+
+    table = dataset.to_table(columns=list(dict.fromkeys(group_by + [metric])), filter=expr)
+    grouped = table.group_by(group_by).aggregate([
+        (metric, "count"),
+        (metric, "mean"),
+        (metric, "min"),
+        (metric, "max"),
+        (metric, "stddev"),
+    ]).sort_by([(f"{metric}_mean", "descending")])
+
+    groups = [
+        {
+            **{c: row[c] for c in group_by},
+            "count": row[f"{metric}_count"],
+            "mean": row[f"{metric}_mean"],
+            "min": row[f"{metric}_min"],
+            "max": row[f"{metric}_max"],
+            "stddev": row[f"{metric}_stddev"],
+        }
+        for row in grouped.slice(0, limit).to_pylist()
+    ]
+    return {"metric": metric, "group_by": group_by, "groups": groups, "rows_matched": table.num_rows}
@@ -0,0 +1,296 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from backend import models, schemas
+from backend.database import SessionLocal
+from .log_processor import write_execution_logs
+from ..config import float_env, int_env
+
+logger = logging.getLogger(__name__)
+
+SPILL_DIR = os.getenv("FLAVOROS_LOG_SPILL_DIR", os.path.join(tempfile.gettempdir(), "flavoros_log_spill"))
+
+
+class ExecutionLogBuffer:
+    """
+    Write-behind pipeline for execution logs.
+
+    Requests enqueue validated logs and return immediately; a background task
+    flushes them in bulk when `flush_size` logs are waiting or `flush_interval`
+    seconds have passed, whichever comes first. A full queue rejects with 429.
+    `stop()` drains everything still queued before returning.
+
+    Logs are already acknowledged (202), so a failed flush is retried
+    `retries` times with exponential backoff; a batch that still fails is
+    spilled to an NDJSON file under SPILL_DIR (ids kept) and written back on
+    the next start or after the next successful flush. A spill file that
+    cannot be parsed, or fails `replay_attempts` times, is renamed to
+    `.bad` and left for an operator.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_size: int = 50000,
+        flush_size: int = 2000,
+        flush_interval: float = 0.2,
+        retries: int = 3,
+        retry_backoff: float = 0.2,
+        spill_dir: Optional[str] = None,
+        replay_attempts: int = 5
+    ):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff
+        self.spill_dir = spill_dir or SPILL_DIR
+        self.replay_attempts = max(1, replay_attempts)
+        self._replay_failures: Dict[str, int] = {}
+        self._spill_pending = True  # Files may be left from an earlier process
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.quarantined = 0
+        self.flushes = 0
+        self.alerts = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_flush_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop accepting logs and flush whatever is still queued"""
+        if not self.running:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+
+    def submit(self, log: schemas.ExecutionLogCreate, org_id: str) -> str:
+        """Enqueue one log and return its id (the row is written on the next flush)"""
+        if not self.running or self._stopping:
+            raise HTTPException(status_code=503, detail="Log buffer is not running")
+
+        log_id = models.generate_uuid()
+        try:
+            self._queue.put_nowait((log_id, org_id, log))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Log buffer is full, retry later",
+                headers={"Retry-After": str(max(1, int(self.flush_interval * 5)))}
+            )
+        self.enqueued += 1
+        return log_id
+
+    async def _collect(self) -> List[Tuple[str, str, schemas.ExecutionLogCreate]]:
+        batch = []
+        if self._stopping:
+            while not self._queue.empty() and len(batch) < self.flush_size:
+                batch.append(self._queue.get_nowait())
+            return batch
+
+        try:
+            batch.append(await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval))
+        except asyncio.TimeoutError:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        await asyncio.to_thread(self.replay_spilled)
+        while True:
+            batch = await self._collect()
+            if batch:
+                await asyncio.to_thread(self._flush, batch)
+            elif self._stopping:
+                return
+
+    def _write(self, batch: List[Tuple[str, str, schemas.ExecutionLogCreate]]) -> int:
+        db = self.session_factory()
+        try:
+            alerts = write_execution_logs(batch, db)
+            db.commit()
+            return alerts
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, batch: List[Tuple[str, str, schemas.ExecutionLogCreate]]):
+        start = time.perf_counter()
+        written = False
+        for attempt in range(self.retries + 1):
+            try:
+                self.alerts += self._write(batch)
+                self.flushed += len(batch)
+                written = True
+                break
+            except Exception:
+                if attempt == self.retries:
+                    logger.exception("Failed to flush %d execution logs after %d attempts", len(batch), attempt + 1)
+                    self._spill(batch)
+                else:
+                    self.retried += 1
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+        # The database is writable again: bring back batches spilled earlier
+        if written and self._spill_pending:
+            self.replay_spilled()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.last_flush_rows = len(batch)
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+
+    def _spill_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.spill_dir, "*.ndjson")))
+
+    def _spill(self, batch: List[Tuple[str, str, schemas.ExecutionLogCreate]]):
+        """Keep an unwritable batch on disk; only if that fails too are the logs lost (and logged)"""
+        lines = [json.dumps({"id": log_id, "org_id": org_id, "log": log.dict()}, default=str) for log_id, org_id, log in batch]
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{time.time_ns()}-{models.generate_uuid()}.ndjson")
+            # Written under a temporary name so replay never reads half a file
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            os.replace(path + ".tmp", path)
+            self._spill_pending = True
+            self.spilled += len(batch)
+            logger.error("Spilled %d execution logs to %s", len(batch), path)
+        except OSError:
+            self.failed += len(batch)
+            logger.exception("Dropped %d execution logs: %s", len(batch), "\n".join(lines))
+
+    def replay_spilled(self) -> int:
+        """Write spilled batches back (oldest first); a file is removed once its rows are committed"""
+        replayed = 0
+        self._spill_pending = False
+        for path in self._spill_files():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    lines = [line for line in f if line.strip()]
+                try:
+                    records = [json.loads(line) for line in lines]
+                    parsed = [(r["id"], r["org_id"], schemas.ExecutionLogCreate(**r["log"])) for r in records]
+                except (ValueError, KeyError, TypeError):
+                    # Corrupt: no retry will ever read it
+                    self._quarantine(path)
+                    continue
+                db = self.session_factory()
+                try:
+                    # Rows of a file whose removal failed after commit are not written twice
+                    existing = {
+                        log_id for (log_id,) in db.query(models.ExecutionLog.id).filter(
+                            models.ExecutionLog.id.in_([log_id for log_id, _, _ in parsed])
+                        )
+                    }
+                finally:
+                    db.close()
+                batch = [entry for entry in parsed if entry[0] not in existing]
+                if batch:
+                    self.alerts += self._write(batch)
+                os.remove(path)
+                self._replay_failures.pop(path, None)
+            except Exception:
+                logger.exception("Failed to replay spilled execution logs from %s", path)
+                failures = self._replay_failures[path] = self._replay_failures.get(path, 0) + 1
+                if failures >= self.replay_attempts:
+                    self._quarantine(path)
+                else:
+                    self._spill_pending = True
+                continue
+            replayed += len(batch)
+        self.replayed += replayed
+        self.flushed += replayed
+        return replayed
+
+    def _quarantine(self, path: str):
+        """Move a spill file that cannot be replayed out of the way (kept as .bad for inspection)"""
+        self._replay_failures.pop(path, None)
+        try:
+            os.replace(path, path + ".bad")
+        except OSError:
+            logger.exception("Could not move aside spill file %s", path)
+            return
+        self.quarantined += 1
+        logger.error("Spill file %s cannot be replayed; moved to %s.bad", path, path)
+
+    def metrics(self) -> Dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "quarantined": self.quarantined,
+            "alerts": self.alerts,
+            "flushes": self.flushes,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "rows_per_sec": round(self.flushed / (self.total_flush_ms / 1000), 1) if self.total_flush_ms else 0.0
+        }
+
+
+log_buffer = ExecutionLogBuffer(
+    max_size=int_env("FLAVOROS_LOG_BUFFER_SIZE", 50000),
+    flush_size=int_env("FLAVOROS_LOG_FLUSH_SIZE", 2000),
+    flush_interval=float_env("FLAVOROS_LOG_FLUSH_INTERVAL", 0.2),
+    retries=int_env("FLAVOROS_LOG_FLUSH_RETRIES", 3),
+    retry_backoff=float_env("FLAVOROS_LOG_FLUSH_BACKOFF", 0.2),
+    replay_attempts=int_env("FLAVOROS_LOG_REPLAY_ATTEMPTS", 5)
+)
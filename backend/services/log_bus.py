@@ -0,0 +1,120 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SUBSCRIBER_BUFFER_SIZE = 1000
+_STAGED_KEY = "log_bus_events"
+
+
+class LogSubscription:
+    """
+    One live-tail consumer: a server-side filter plus a bounded queue.
+    When the consumer falls behind, the oldest events are dropped (and counted)
+    instead of growing memory or blocking publishers.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        org_id: Optional[str] = None,
+        store_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+        min_deviation: Optional[float] = None,
+        buffer_size: int = SUBSCRIBER_BUFFER_SIZE
+    ):
+        self.loop = loop
+        self.org_id = org_id
+        self.store_id = store_id
+        self.event_type = event_type
+        self.min_deviation = min_deviation
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def matches(self, log_event: Dict) -> bool:
+        if self.org_id and log_event.get("org_id") != self.org_id:
+            return False
+        if self.store_id and log_event.get("store_id") != self.store_id:
+            return False
+        if self.event_type and log_event.get("event_type") != self.event_type:
+            return False
+        if self.min_deviation is not None:
+            deviation = log_event.get("deviation_pct")
+            if deviation is None or deviation <= self.min_deviation:
+                return False
+        return True
+
+    def _offer(self, log_event: Dict):
+        # Runs on the subscriber's event loop
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(log_event)
+
+
+class LogBus:
+    """
+    In-process pub/sub for committed execution logs.
+
+    Writers stage events on their Session with `stage()`; they are published
+    only after that session commits, so subscribers never see rolled-back rows.
+    `publish()` is safe to call from worker threads.
+    """
+
+    def __init__(self):
+        self._subscribers: List[LogSubscription] = []
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def subscribe(self, **filters) -> LogSubscription:
+        sub = LogSubscription(asyncio.get_running_loop(), **filters)
+        with self._lock:
+            self._subscribers = self._subscribers + [sub]
+        return sub
+
+    def unsubscribe(self, sub: LogSubscription):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s is not sub]
+
+    def publish(self, log_events: List[Dict]):
+        for sub in self._subscribers:
+            matched = [e for e in log_events if sub.matches(e)]
+            if not matched:
+                continue
+            for log_event in matched:
+                try:
+                    sub.loop.call_soon_threadsafe(sub._offer, log_event)
+                except RuntimeError:
+                    # Subscriber's loop already closed
+                    self.unsubscribe(sub)
+                    break
+
+    def stage(self, db: Session, log_events: List[Dict]):
+        """Queue events for publication when `db` commits (no-op without subscribers)"""
+        if self._subscribers and log_events:
+            db.info.setdefault(_STAGED_KEY, []).extend(log_events)
+
+
+log_bus = LogBus()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_staged(session):
+    # Releasing a savepoint also fires after_commit; publish only on the outermost commit
+    if session.in_nested_transaction():
+        return
+    staged = session.info.pop(_STAGED_KEY, None)
+    if staged:
+        log_bus.publish(staged)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_staged(session, previous_transaction):
+    # A savepoint rollback leaves the outer transaction (and its events) alive
+    if not previous_transaction.nested:
+        session.info.pop(_STAGED_KEY, None)
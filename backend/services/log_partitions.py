@@ -0,0 +1,187 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .experiment_stats import experiment_stats, Observation, DAILY_DEVIATION
+from .log_processor import collect_step_checks
+from .spec_index import spec_index
+from .log_archive import archive_enabled, archive_pending_partitions
+from ..config import int_env
+
+COMPACT_BATCH_SIZE = 5000
+
+
+def _default_retention_days() -> int:
+    return max(1, int_env("FLAVOROS_LOG_RETENTION_DAYS", 30))
+
+
+def _today() -> str:
+    return models.partition_day_for(datetime.now(timezone.utc))
+
+
+def backfill_partition_days(db: Session) -> int:
+    """Assign a partition to rows written before partition_day existed"""
+    return db.query(models.ExecutionLog).filter(
+        models.ExecutionLog.partition_day.is_(None)
+    ).update({models.ExecutionLog.partition_day: func.date(models.ExecutionLog.ts)}, synchronize_session=False)
+
+
+def sync_partitions(db: Session, today: Optional[str] = None) -> List[str]:
+    """Register closed days (before `today`) that hold raw logs but are not in the catalog yet"""
+    today = today or _today()
+    known = {day for (day,) in db.query(models.LogPartition.day)}
+    days = [
+        day for (day,) in db.query(models.ExecutionLog.partition_day).filter(
+            models.ExecutionLog.partition_day < today
+        ).distinct()
+        if day and day not in known
+    ]
+    if days:
+        db.execute(insert(models.LogPartition), [{"day": day, "status": "ACTIVE"} for day in days])
+    return days
+
+
+def compact_partition(db: Session, day: str) -> Dict:
+    """
+    Roll the raw STEP events of one day into per-store StoreDailyMetric rows
+    (mean deviation and sample count). Raw rows are kept until retention drops them.
+    """
+    query = db.query(models.ExecutionLog).filter(models.ExecutionLog.partition_day == day)
+    row_count = query.count()
+
+    sums: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    batch = []
+
+    def consume(logs):
+        checks = collect_step_checks(logs, db)
+        if checks is None:
+            return
+        for log, dev, valid in zip(checks.logs, checks.deviation_pct, checks.valid):
+            if valid and log.store_id:
+                sums[log.store_id] = sums.get(log.store_id, 0.0) + float(dev)
+                counts[log.store_id] = counts.get(log.store_id, 0) + 1
+
+    step_query = query.filter(models.ExecutionLog.event_type == schemas.ExecutionLogType.STEP.value)
+    # Compile specs up front so no other query runs while rows are streaming
+    spec_index.prime(db, (
+        rid for (rid,) in step_query.with_entities(models.ExecutionLog.recipe_version_id).distinct()
+    ))
+    for log in step_query.yield_per(COMPACT_BATCH_SIZE):
+        batch.append(log)
+        if len(batch) >= COMPACT_BATCH_SIZE:
+            consume(batch)
+            batch = []
+    consume(batch)
+
+    metric_date = datetime.strptime(day, "%Y-%m-%d")
+    existing = {
+        m.store_id: m for m in db.query(models.StoreDailyMetric).filter(
+            models.StoreDailyMetric.date == metric_date,
+            models.StoreDailyMetric.store_id.in_(list(counts))
+        )
+    } if counts else {}
+    daily = []
+    for store_id, count in counts.items():
+        avg = round(sums[store_id] / count, 2)
+        metric = existing.get(store_id)
+        if metric:
+            metric.avg_deviation = avg
+            metric.step_count = count
+        else:
+            db.add(models.StoreDailyMetric(
+                store_id=store_id,
+                date=metric_date,
+                avg_deviation=avg,
+                step_count=count
+            ))
+            daily.append(Observation(store_id, DAILY_DEVIATION, avg, day=metric_date.date()))
+    # Recompacting a day updates its metrics but does not count them twice in experiment results
+    experiment_stats.observe(db, daily)
+
+    partition = db.query(models.LogPartition).filter(models.LogPartition.day == day).first()
+    partition.status = "COMPACTED"
+    partition.row_count = row_count
+    partition.step_count = sum(counts.values())
+    partition.compacted_at = datetime.now(timezone.utc)
+    return {"day": day, "rows": row_count, "stores": len(counts), "steps": partition.step_count}
+
+
+def drop_expired_partitions(db: Session, retention_days: int, today: Optional[str] = None) -> List[str]:
+    """
+    Delete raw logs of compacted partitions older than the retention window.
+    While archiving is enabled, partitions that are not archived yet are kept,
+    because their raw rows exist nowhere else.
+    """
+    today = today or _today()
+    cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+    query = db.query(models.LogPartition).filter(
+        models.LogPartition.status == "COMPACTED",
+        models.LogPartition.day < cutoff
+    )
+    if archive_enabled():
+        query = query.filter(models.LogPartition.archived_at.isnot(None))
+    expired = query.all()
+
+    dropped = []
+    for partition in expired:
+        db.query(models.ExecutionLog).filter(
+            models.ExecutionLog.partition_day == partition.day
+        ).delete(synchronize_session=False)
+        partition.status = "DROPPED"
+        partition.dropped_at = datetime.now(timezone.utc)
+        db.commit()
+        dropped.append(partition.day)
+    return dropped
+
+
+def run_log_maintenance(db: Session, retention_days: Optional[int] = None, today: Optional[str] = None) -> Dict:
+    """
+    Compaction + archive + retention pass over closed daily partitions.
+    Each partition is committed on its own, so an interrupted run picks up where it stopped.
+    """
+    today = today or _today()
+    retention_days = retention_days or _default_retention_days()
+
+    backfilled = backfill_partition_days(db)
+    registered = sync_partitions(db, today)
+    db.commit()
+
+    compacted = []
+    pending = db.query(models.LogPartition.day).filter(
+        models.LogPartition.status == "ACTIVE",
+        models.LogPartition.day < today
+    ).order_by(models.LogPartition.day).all()
+    for (day,) in pending:
+        compacted.append(compact_partition(db, day))
+        db.commit()
+
+    # Raw rows leave the database only after they are in the columnar archive
+    archived = archive_pending_partitions(db)
+    dropped = drop_expired_partitions(db, retention_days, today)
+    return {
+        "backfilled": backfilled,
+        "registered": registered,
+        "compacted": compacted,
+        "archived": archived,
+        "dropped": dropped,
+        "retention_days": retention_days
+    }
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Compact and expire execution log partitions")
+    parser.add_argument("--retention-days", type=int, default=None)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        print(run_log_maintenance(session, retention_days=args.retention_days))
+    finally:
+        session.close()
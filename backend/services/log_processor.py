@@ -1,8 +1,20 @@
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from pydantic import ValidationError
+import numpy as np
 from backend import models, schemas
+from .deviation_aggregator import deviation_aggregator, STORE
+from .spec_index import spec_index, to_number, EMPTY_SPEC, DEFAULT_TOLERANCE_PCT
+from .log_bus import log_bus
+from .alert_engine import alert_engine, DeviationReading
+from .experiment_stats import experiment_stats, Observation, STEP_DEVIATION
 import json
 
+DEVIATION_THRESHOLD_PCT = DEFAULT_TOLERANCE_PCT
+BATCH_INSERT_SIZE = 5000
+
 def process_execution_log(log_data: schemas.ExecutionLogCreate, org_id: str, db: Session):
     # 1. Save Log
     log_db = models.ExecutionLog(
@@ -16,61 +28,236 @@ def process_execution_log(log_data: schemas.ExecutionLogCreate, org_id: str, db:
     db.add(log_db)
     
     # 2. Check Deviation if event is 'STEP'
-    if log_data.event_type == schemas.ExecutionLogType.STEP and log_data.payload_json:
-        _check_step_deviation(log_data, org_id, db)
+    deviations = {}
+    _check_step_deviations([log_data], org_id, db, deviations)
+
+    # 3. Live tail (published once committed)
+    log_bus.stage(db, [_bus_event(log_db.id, org_id, log_data, deviations)])
 
     db.commit()
     return log_db
 
-def _check_step_deviation(log: schemas.ExecutionLogCreate, org_id: str, db: Session):
+def process_execution_log_batch(items: List[Any], org_id: str, db: Session) -> Dict[str, Any]:
     """
-    Simple rule-based deviation check.
-    In real world, we would fetch RecipeVersion.spec_json and compare.
-    Here we assume payload has 'measured' and 'target' keys for simplicity.
+    Validate, bulk insert and deviation-check a batch of logs in one transaction.
+    Invalid items are rejected individually; the rest of the batch is still stored.
+    Returns per-item status in input order.
     """
-    payload = log.payload_json
-    
-    step_name = payload.get('step_name', 'Unknown')
-    
-    # Example Payload: {"step_name": "Salting", "measured": 12.0, "target": 10.0, "unit": "g"}
-    if 'measured' in payload and 'target' in payload:
+    results = []
+    entries = []
+    for index, item in enumerate(items):
         try:
-            measured = float(payload['measured'])
-            target = float(payload['target'])
-            
-            if target == 0:
-                return # Avoid division by zero
-                
-            deviation_pct = abs((measured - target) / target) * 100.0
-            
-            # Threshold: 10%
-            if deviation_pct > 10.0:
-                _create_alert(
-                    org_id, 
-                    log.store_id, 
-                    schemas.AlertType.DEVIATION_HIGH,
-                    schemas.AlertSeverity.MEDIUM,
-                    f"Deviation {deviation_pct:.1f}% in step '{step_name}'. Measured: {measured}, Target: {target}",
-                    db
-                )
-                
-                # Update Store Deviation Score (Mock accumulation)
-                # In reality, this would be a rolling average
-                store = db.query(models.Store).filter(models.Store.id == log.store_id).first()
-                if store:
-                    # Naively update deviation to the latest high deviation
-                    store.deviation = deviation_pct
-                    
-        except ValueError:
-            pass
-
-def _create_alert(org_id: str, store_id: str, type: schemas.AlertType, severity: schemas.AlertSeverity, msg: str, db: Session):
-    alert = models.Alert(
-        id=models.generate_uuid(),
-        org_id=org_id,
-        store_id=store_id,
-        alert_type=type,
-        severity=severity,
-        message=msg
+            if not isinstance(item, dict):
+                raise ValueError("Item must be a JSON object")
+            log = schemas.ExecutionLogCreate(**item)
+        except (ValidationError, ValueError, TypeError) as e:
+            results.append({"index": index, "status": "rejected", "error": str(e)})
+            continue
+
+        log_id = models.generate_uuid()
+        entries.append((log_id, org_id, log))
+        results.append({"index": index, "status": "accepted", "id": log_id})
+
+    try:
+        alerts = write_execution_logs(entries, db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "accepted": len(entries),
+        "rejected": len(results) - len(entries),
+        "alerts": alerts,
+        "items": results
+    }
+
+def write_execution_logs(entries: List[Tuple[str, str, schemas.ExecutionLogCreate]], db: Session) -> int:
+    """
+    Bulk insert already-validated (log_id, org_id, log) entries and run the deviation check.
+    Does not commit. Returns the number of alerts raised.
+    """
+    rows = [
+        {
+            "id": log_id,
+            "org_id": org_id,
+            "store_id": log.store_id,
+            "recipe_version_id": log.recipe_version_id,
+            "event_type": log.event_type.value,
+            "payload_json": log.payload_json
+        }
+        for log_id, org_id, log in entries
+    ]
+    for start in range(0, len(rows), BATCH_INSERT_SIZE):
+        db.execute(insert(models.ExecutionLog), rows[start:start + BATCH_INSERT_SIZE])
+
+    by_org = {}
+    for _, org_id, log in entries:
+        by_org.setdefault(org_id, []).append(log)
+    deviations = {}
+    alerts = sum(_check_step_deviations(logs, org_id, db, deviations) for org_id, logs in by_org.items())
+
+    if log_bus.has_subscribers:
+        log_bus.stage(db, [_bus_event(log_id, org_id, log, deviations) for log_id, org_id, log in entries])
+    return alerts
+
+def _bus_event(log_id: str, org_id: str, log: schemas.ExecutionLogCreate, deviations: Dict[int, float]) -> Dict[str, Any]:
+    return {
+        "id": log_id,
+        "org_id": org_id,
+        "store_id": log.store_id,
+        "recipe_version_id": log.recipe_version_id,
+        "event_type": log.event_type.value,
+        "payload_json": log.payload_json,
+        "deviation_pct": deviations.get(id(log)),
+        "ts": datetime.now(timezone.utc).isoformat()
+    }
+
+class StepChecks(NamedTuple):
+    """One row per (log, measured param) with a known target"""
+    logs: List[Any]
+    params: List[Optional[str]]
+    measured: np.ndarray
+    target: np.ndarray
+    tolerance: np.ndarray
+    deviation_pct: np.ndarray
+    valid: np.ndarray  # zero targets have no meaningful deviation
+
+def collect_step_checks(logs: Iterable[Any], db: Session) -> Optional[StepChecks]:
+    """
+    Extract measured/target pairs from STEP logs (schemas or ExecutionLog rows).
+    Targets come from the payload when the device sends one, otherwise from the
+    compiled RecipeVersion spec (see spec_index); devices may send only measurements:
+      {"step_name": "Salting", "measured": 12.0, "target": 10.0, "unit": "g"}
+      {"step_name": "COOK", "param": "temp_c", "measured": 195}
+      {"step_name": "COOK", "measurements": {"temp_c": 195, "time_s": 150}}
+    """
+    step_logs = [
+        log for log in logs
+        if log.event_type == schemas.ExecutionLogType.STEP and log.payload_json
+    ]
+    if not step_logs:
+        return None
+    specs = spec_index.prime(db, (log.recipe_version_id for log in step_logs))
+
+    steps = []
+    params = []
+    measured = []
+    target = []
+    tolerance = []
+
+    def add_check(log, param, m, t, tol):
+        m, t = to_number(m), to_number(t)
+        if m is None or t is None:
+            return
+        steps.append(log)
+        params.append(param)
+        measured.append(m)
+        target.append(t)
+        tolerance.append(tol)
+
+    for log in step_logs:
+        payload = log.payload_json
+        step_name = str(payload.get('step_name', ''))
+        spec = specs.get(log.recipe_version_id, EMPTY_SPEC)
+
+        if 'measured' in payload and 'target' in payload:
+            add_check(log, payload.get('param'), payload['measured'], payload['target'], DEVIATION_THRESHOLD_PCT)
+        elif isinstance(payload.get('measurements'), dict):
+            for param, value in payload['measurements'].items():
+                hit = spec.lookup(step_name, param)
+                if hit:
+                    add_check(log, param, value, hit[1], hit[2])
+        elif 'measured' in payload:
+            hit = spec.lookup(step_name, payload.get('param'))
+            if hit:
+                add_check(log, hit[0], payload['measured'], hit[1], hit[2])
+
+    if not steps:
+        return None
+
+    measured = np.asarray(measured)
+    target = np.asarray(target)
+    # Avoid division by zero: zero targets never flag
+    safe_target = np.where(target == 0, 1.0, target)
+    return StepChecks(
+        logs=steps,
+        params=params,
+        measured=measured,
+        target=target,
+        tolerance=np.asarray(tolerance),
+        deviation_pct=np.abs((measured - target) / safe_target) * 100.0,
+        valid=target != 0
     )
-    db.add(alert)
+
+def _check_step_deviations(
+    logs: List[schemas.ExecutionLogCreate],
+    org_id: str,
+    db: Session,
+    deviations: Optional[Dict[int, float]] = None
+) -> int:
+    """
+    Rule-based deviation check, vectorized over a list of logs.
+    Returns the number of alerts raised; `deviations` (if given) collects the
+    largest deviation per log, keyed by id(log).
+    """
+    checks = collect_step_checks(logs, db)
+    if checks is None:
+        return 0
+    steps, params, measured, target = checks.logs, checks.params, checks.measured, checks.target
+    deviation_pct = checks.deviation_pct
+    flagged = np.flatnonzero(checks.valid & (deviation_pct > checks.tolerance))
+
+    alert_rows = []
+    for i in flagged:
+        log = steps[i]
+        step_name = log.payload_json.get('step_name', 'Unknown')
+        if params[i]:
+            step_name = f"{step_name}/{params[i]}"
+        alert_rows.append({
+            "id": models.generate_uuid(),
+            "org_id": org_id,
+            "store_id": log.store_id,
+            "recipe_version_id": log.recipe_version_id,
+            "alert_type": schemas.AlertType.DEVIATION_HIGH.value,
+            "severity": schemas.AlertSeverity.MEDIUM.value,
+            "message": f"Deviation {deviation_pct[i]:.1f}% in step '{step_name}'. Measured: {measured[i]}, Target: {target[i]}",
+            "is_resolved": 0
+        })
+    raised = alert_engine.open_alerts(db, alert_rows) if alert_rows else 0
+
+    # Feed every measured step (not only the flagged ones) into the rolling aggregates
+    touched_stores = set()
+    observations = []
+    for i in np.flatnonzero(checks.valid):
+        log = steps[i]
+        deviation_aggregator.observe(log.store_id, log.recipe_version_id, float(deviation_pct[i]))
+        touched_stores.add(log.store_id)
+        observations.append(Observation(log.store_id, STEP_DEVIATION, float(deviation_pct[i]), log.recipe_version_id))
+        if deviations is not None:
+            deviations[id(log)] = max(deviations.get(id(log), 0.0), float(deviation_pct[i]))
+
+    # Store.deviation reports the rolling mean over the aggregator's primary window
+    if touched_stores:
+        readings = [
+            DeviationReading(
+                store.id, store.org_id, store.name,
+                round(deviation_aggregator.rolling_mean(STORE, store.id), 2),
+                store.active_recipe_version_id
+            )
+            for store in db.query(
+                models.Store.id, models.Store.org_id, models.Store.name, models.Store.active_recipe_version_id
+            ).filter(
+                models.Store.id.in_(list(touched_stores))
+            )
+        ]
+        if readings:
+            db.execute(update(models.Store), [
+                {"id": reading.store_id, "deviation": reading.deviation} for reading in readings
+            ])
+            # Store-level rules fire as soon as the rolling deviation moves
+            raised += alert_engine.evaluate(db, readings)
+    # Running A/B statistics for stores in experiments
+    experiment_stats.observe(db, observations)
+    deviation_aggregator.maybe_persist(db)
+    return raised
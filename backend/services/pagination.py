@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, and_, func, or_, select
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+# (column, descending)
+OrderKey = Tuple[Any, bool]
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode_value(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_paginate(
+    query: Query,
+    order_by: List[OrderKey],
+    id_column,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    response: Optional[Response] = None
+) -> list:
+    """
+    One page of `query` ordered by `order_by` + `id_column` (the tie-breaker).
+
+    The cursor carries the sort key of the last row of the previous page, so
+    every page is a bounded index range scan: deep pages cost the same as the first.
+    Each key is re-read from the cursor row itself (falling back to the encoded
+    value if that row is gone), so stored datetime formats never have to round-trip.
+    The next cursor is set on `response` as the X-Next-Cursor header (absent on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    keys = list(order_by) + [(id_column, order_by[-1][1] if order_by else True)]
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        cursor_id = values[-1]
+        bounds = []
+        for (column, _), value in zip(keys[:-1], values[:-1]):
+            from_row = select(column).where(id_column == cursor_id).scalar_subquery()
+            bounds.append(func.coalesce(from_row, _decode_value(column, value)))
+        bounds.append(cursor_id)
+
+        # (k1, k2, ..) after (v1, v2, ..) in the mixed-direction sort order
+        clauses = []
+        for i, (column, descending) in enumerate(keys):
+            prefix = [keys[j][0] == bounds[j] for j in range(i)]
+            step = column < bounds[i] if descending else column > bounds[i]
+            clauses.append(and_(*prefix, step))
+        query = query.filter(or_(*clauses))
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c, descending in keys])
+    rows = query.limit(limit + 1).all()
+
+    if response is not None and len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([
+            getattr(last, column.key) for column, _ in keys
+        ])
+    return rows[:limit]
+
+
+def apply_time_range(query: Query, column, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Query:
+    """since <= column < until"""
+    if since:
+        query = query.filter(column >= since)
+    if until:
+        query = query.filter(column < until)
+    return query
@@ -0,0 +1,268 @@
+import json
+import time
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from backend import models
+from .reference_repository import reference_repository
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    np = None
+    pa = None
+    pq = None
+
+VECTOR_DIM = 5
+EXPORT_BATCH_SIZE = 5000
+
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _require_arrow():
+    if pa is None:
+        raise HTTPException(status_code=501, detail="pyarrow is not installed")
+
+
+def _check_format(fmt: str):
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}' (use parquet or arrow)")
+
+
+def reference_schema():
+    """One row per reference with its current fingerprint; vector is a fixed-size list column"""
+    return pa.schema([
+        ("id", pa.string()),
+        ("org_id", pa.string()),
+        ("name", pa.string()),
+        ("reference_type", pa.string()),
+        ("menu_category", pa.string()),
+        ("source_kind", pa.string()),
+        ("status", pa.string()),
+        ("metadata_json", pa.string()),
+        ("fingerprint_id", pa.string()),
+        ("fingerprint_version", pa.int32()),
+        ("vector", pa.list_(pa.float64(), VECTOR_DIM)),
+        ("metrics_json", pa.string()),
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks = []
+        return out
+
+
+def _to_record_batch(rows: list, schema) -> "pa.RecordBatch":
+    flat = np.full(len(rows) * VECTOR_DIM, np.nan)
+    mask = np.zeros(len(rows), dtype=bool)
+    for i, row in enumerate(rows):
+        vec = row.current_vector
+        if vec:
+            vec = list(vec)[:VECTOR_DIM]
+            flat[i * VECTOR_DIM:i * VECTOR_DIM + len(vec)] = vec
+        else:
+            mask[i] = True
+
+    vectors = pa.FixedSizeListArray.from_arrays(
+        pa.array(flat, pa.float64()), VECTOR_DIM, mask=pa.array(mask)
+    )
+    return pa.RecordBatch.from_arrays([
+        pa.array([r.id for r in rows], pa.string()),
+        pa.array([r.org_id for r in rows], pa.string()),
+        pa.array([r.name for r in rows], pa.string()),
+        pa.array([r.reference_type for r in rows], pa.string()),
+        pa.array([r.menu_category for r in rows], pa.string()),
+        pa.array([r.source_kind for r in rows], pa.string()),
+        pa.array([r.status for r in rows], pa.string()),
+        pa.array([json.dumps(r.metadata_json) if r.metadata_json is not None else None for r in rows], pa.string()),
+        pa.array([r.current_fingerprint_id for r in rows], pa.string()),
+        pa.array([r.version for r in rows], pa.int32()),
+        vectors,
+        pa.array([json.dumps(r.metrics_json) if r.metrics_json is not None else None for r in rows], pa.string()),
+    ], schema=schema)
+
+
+def export_references(
+    db_session_factory,
+    org_id: Optional[str] = None,
+    category: Optional[str] = None,
+    fmt: str = "parquet"
+) -> Iterator[bytes]:
+    """
+    Stream references + current fingerprints as Parquet (one row group per batch)
+    or an Arrow IPC stream. Bytes are yielded as each batch is encoded.
+    """
+    _require_arrow()
+    _check_format(fmt)
+    schema = reference_schema()
+
+    def _generate():
+        db = db_session_factory()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema) if fmt == "parquet" else pa.ipc.new_stream(sink, schema)
+        try:
+            query = db.query(
+                models.Reference.id,
+                models.Reference.org_id,
+                models.Reference.name,
+                models.Reference.reference_type,
+                models.Reference.menu_category,
+                models.Reference.source_kind,
+                models.Reference.status,
+                models.Reference.metadata_json,
+                models.Reference.current_fingerprint_id,
+                models.Reference.current_vector,
+                models.ReferenceFingerprint.version,
+                models.ReferenceFingerprint.metrics_json,
+            ).outerjoin(
+                models.ReferenceFingerprint,
+                models.ReferenceFingerprint.id == models.Reference.current_fingerprint_id
+            )
+            if org_id:
+                query = query.filter(models.Reference.org_id == org_id)
+            if category:
+                query = query.filter(models.Reference.menu_category == category)
+
+            rows = []
+            for row in query.yield_per(EXPORT_BATCH_SIZE):
+                rows.append(row)
+                if len(rows) >= EXPORT_BATCH_SIZE:
+                    writer.write_batch(_to_record_batch(rows, schema))
+                    rows = []
+                    yield sink.drain()
+            if rows:
+                writer.write_batch(_to_record_batch(rows, schema))
+            writer.close()
+            yield sink.drain()
+        finally:
+            db.close()
+
+    return _generate()
+
+
+def _read_table(file: BinaryIO, fmt: str) -> "pa.Table":
+    if fmt == "parquet":
+        return pq.read_table(file)
+    return pa.ipc.open_stream(file).read_all()
+
+
+def _vector_matrix(column) -> "np.ndarray":
+    """(rows x VECTOR_DIM) view over the fixed-size list values, copied only if child nulls force it"""
+    # .values keeps the slots of null rows, so row i stays at i * VECTOR_DIM
+    flat = column.values.slice(column.offset * VECTOR_DIM, len(column) * VECTOR_DIM)
+    try:
+        values = flat.to_numpy(zero_copy_only=True)
+    except pa.ArrowInvalid:
+        values = flat.to_numpy(zero_copy_only=False)
+    return values.reshape(-1, VECTOR_DIM)
+
+
+def import_references(
+    db: Session,
+    file: BinaryIO,
+    org_id: Optional[str] = None,
+    fmt: str = "parquet"
+) -> dict:
+    """
+    Bulk import an export file. References whose id already exists are skipped;
+    new fingerprints are inserted in bulk and current pointers flipped per batch.
+    """
+    _require_arrow()
+    _check_format(fmt)
+    start_time = time.time()
+
+    try:
+        table = _read_table(file, fmt)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading file: {str(e)}")
+
+    missing = set(reference_schema().names) - set(table.column_names)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {sorted(missing)}")
+
+    imported = skipped = fingerprints = 0
+    for batch in table.to_batches(max_chunksize=EXPORT_BATCH_SIZE):
+        cols = batch.to_pydict()
+        ids = cols["id"]
+        existing = {
+            rid for (rid,) in db.query(models.Reference.id).filter(models.Reference.id.in_(ids))
+        }
+        vectors = _vector_matrix(batch.column("vector"))
+        vector_valid = batch.column("vector").is_valid().to_numpy(zero_copy_only=False)
+
+        ref_rows = []
+        fp_rows = []
+        for i, ref_id in enumerate(ids):
+            if ref_id in existing:
+                skipped += 1
+                continue
+            ref_rows.append({
+                "id": ref_id,
+                "org_id": org_id or cols["org_id"][i],
+                "name": cols["name"][i],
+                "reference_type": cols["reference_type"][i],
+                "menu_category": cols["menu_category"][i],
+                "source_kind": cols["source_kind"][i],
+                "status": cols["status"][i] or "ACTIVE",
+                "process_status": "COMPLETED" if vector_valid[i] else "QUEUED",
+                "metadata_json": json.loads(cols["metadata_json"][i]) if cols["metadata_json"][i] else None,
+            })
+            if vector_valid[i]:
+                fp_rows.append({
+                    "id": cols["fingerprint_id"][i] or models.generate_uuid(),
+                    "reference_id": ref_id,
+                    "version": cols["fingerprint_version"][i] or 1,
+                    "vector": vectors[i].tolist(),
+                    "metrics_json": json.loads(cols["metrics_json"][i]) if cols["metrics_json"][i] else None,
+                    "notes": "Imported",
+                })
+
+        if ref_rows:
+            db.execute(insert(models.Reference), ref_rows)
+        if fp_rows:
+            db.execute(insert(models.ReferenceFingerprint), fp_rows)
+            reference_repository.refresh_current_fingerprints(
+                db, models.Reference.id.in_([r["reference_id"] for r in fp_rows])
+            )
+        db.commit()
+        imported += len(ref_rows)
+        fingerprints += len(fp_rows)
+
+    return {
+        "imported": imported,
+        "skipped": skipped,
+        "fingerprints": fingerprints,
+        "duration_ms": int((time.time() - start_time) * 1000)
+    }
@@ -43,34 +43,63 @@ def process_file_upload(file: UploadFile, org_id: str, db: Session):
             # Skip duplicates
             continue
 
-        raw_data = row.to_dict()
-        # Clean NaNs
-        raw_data = {k: v for k, v in raw_data.items() if pd.notna(v)}
-        
-        # Default fields
-        ref_db = models.Reference(
-            id=models.generate_uuid(),
-            org_id=org_id,
-            name=raw_data.get('name'),
-            menu_category=raw_data.get('menu_category', 'Uncategorized'),
-            reference_type=schemas.ReferenceType.BRAND, # Default to BRAND for uploads
-            source_kind=schemas.SourceKind.MARKET,
-            status=schemas.ReferenceStatus.ACTIVE,
-            process_status=schemas.ReferenceProcessStatus.QUEUED,
-            metadata_json=raw_data # Store everything
-        )
-        
-        # Parse 'keywords' if present
-        if 'keywords' in raw_data and isinstance(raw_data['keywords'], str):
-             # "Spicy, Sweet" -> ["Spicy", "Sweet"]
-             ref_db.metadata_json['keywords'] = [k.strip() for k in raw_data['keywords'].split(',')]
-        
+        ref_db = build_reference(row, org_id)
         db.add(ref_db)
         created_refs.append(ref_db)
     
     db.commit()
     return created_refs
 
+def build_reference(row, org_id: str) -> models.Reference:
+    """Map one uploaded row (pandas Series) to a QUEUED Reference"""
+    raw_data = row.to_dict()
+    # Clean NaNs
+    raw_data = {k: v for k, v in raw_data.items() if pd.notna(v)}
+    
+    # Default fields
+    ref_db = models.Reference(
+        id=models.generate_uuid(),
+        org_id=org_id,
+        name=raw_data.get('name'),
+        menu_category=raw_data.get('menu_category', 'Uncategorized'),
+        reference_type=schemas.ReferenceType.BRAND, # Default to BRAND for uploads
+        source_kind=schemas.SourceKind.MARKET,
+        status=schemas.ReferenceStatus.ACTIVE,
+        process_status=schemas.ReferenceProcessStatus.QUEUED,
+        metadata_json=raw_data # Store everything
+    )
+    
+    # Parse 'keywords' if present
+    if 'keywords' in raw_data and isinstance(raw_data['keywords'], str):
+         # "Spicy, Sweet" -> ["Spicy", "Sweet"]
+         ref_db.metadata_json['keywords'] = [k.strip() for k in raw_data['keywords'].split(',')]
+    
+    return ref_db
+
+def build_fingerprint(ref: models.Reference) -> models.ReferenceFingerprint:
+    """Estimate metrics and rule-based vector for a reference (no DB access)"""
+    # Mock estimation logic
+    estimated_taste = estimate_taste_metrics(ref.name, ref.metadata_json)
+    
+    # Rule-based Vectorization
+    keywords = []
+    if ref.metadata_json and 'keywords' in ref.metadata_json:
+        keywords = ref.metadata_json['keywords']
+    # Fallback to name if no keywords
+    if not keywords:
+        keywords = [ref.name]
+    
+    vector = rule_vectorizer.vectorize_from_keywords(keywords)
+
+    return models.ReferenceFingerprint(
+        id=models.generate_uuid(),
+        reference_id=ref.id,
+        version=1,
+        vector=vector,
+        metrics_json=estimated_taste,
+        notes="Auto-generated by Rule Vectorizer"
+    )
+
 def run_metric_estimation(reference_ids: list[str], db_session_factory):
     # This runs in background
     db = db_session_factory()
@@ -84,29 +113,8 @@ def run_metric_estimation(reference_ids: list[str], db_session_factory):
             # For now, we mock basic extraction from name/metadata
             
             try:
-                # Mock estimation logic
-                estimated_taste = estimate_taste_metrics(ref.name, ref.metadata_json)
-                
-                # Rule-based Vectorization
-                keywords = []
-                if ref.metadata_json and 'keywords' in ref.metadata_json:
-                    keywords = ref.metadata_json['keywords']
-                # Fallback to name if no keywords
-                if not keywords:
-                    keywords = [ref.name]
-                
-                vector = rule_vectorizer.vectorize_from_keywords(keywords)
-
                 # Create a fingerprint if not exists
-                fp = models.ReferenceFingerprint(
-                    id=models.generate_uuid(),
-                    reference_id=ref.id,
-                    version=1,
-                    vector=vector,
-                    metrics_json=estimated_taste,
-                    notes="Auto-generated by Rule Vectorizer"
-                )
-                db.add(fp)
+                db.add(build_fingerprint(ref))
                 
                 ref.process_status = schemas.ReferenceProcessStatus.COMPLETED
             except Exception as e:
@@ -0,0 +1,86 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+from .. import models
+
+class ReferenceRepository:
+    """Reference reads that come with the current vector (denormalized on the row) attached."""
+
+    def get_with_vector(self, db: Session, reference_id: str, with_fingerprint: bool = False) -> Optional[models.Reference]:
+        """Single reference; `with_fingerprint` also joins in the current fingerprint row"""
+        query = db.query(models.Reference)
+        if with_fingerprint:
+            query = query.options(joinedload(models.Reference.current_fingerprint))
+        return query.filter(models.Reference.id == reference_id).first()
+
+    def load_with_vectors(
+        self,
+        db: Session,
+        reference_ids: Optional[List[str]] = None,
+        org_id: Optional[str] = None,
+        category: Optional[str] = None,
+        reference_type: Optional[str] = None,
+        created_since: Optional[datetime] = None,
+        exclude_ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        with_fingerprint: bool = False
+    ) -> List[models.Reference]:
+        """
+        References with their current_vector in one query. `with_fingerprint`
+        eager-loads the current fingerprint rows too (one more SELECT ... IN),
+        for callers that need its version or metrics.
+        When `reference_ids` is given the result follows its order (missing ids are dropped).
+        """
+        if reference_ids is not None and not reference_ids:
+            return []
+
+        query = db.query(models.Reference)
+        if with_fingerprint:
+            query = query.options(selectinload(models.Reference.current_fingerprint))
+        if reference_ids is not None:
+            query = query.filter(models.Reference.id.in_(set(reference_ids)))
+        if org_id:
+            query = query.filter(models.Reference.org_id == org_id)
+        if category:
+            query = query.filter(models.Reference.menu_category == category)
+        if reference_type:
+            query = query.filter(models.Reference.reference_type == reference_type)
+        if created_since:
+            query = query.filter(models.Reference.created_at >= created_since)
+        if exclude_ids:
+            query = query.filter(models.Reference.id.notin_(exclude_ids))
+        if limit:
+            query = query.limit(limit)
+        refs = query.all()
+
+        if reference_ids is None:
+            return refs
+        by_id = {r.id: r for r in refs}
+        return [by_id[rid] for rid in reference_ids if rid in by_id]
+
+    def refresh_current_fingerprints(self, db: Session, *criteria) -> None:
+        """
+        Re-point matching references at their newest fingerprint version.
+        Used to flip pointers after bulk inserts (which skip ORM events) and to backfill.
+        Does not commit; both statements land in the caller's transaction.
+        """
+        fp = models.ReferenceFingerprint
+        newest_id = select(fp.id).where(
+            fp.reference_id == models.Reference.id
+        ).order_by(fp.version.desc(), fp.created_at.desc()).limit(1).scalar_subquery()
+
+        db.execute(
+            update(models.Reference).where(*criteria)
+            .values(current_fingerprint_id=newest_id)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(models.Reference).where(*criteria)
+            .values(current_vector=select(fp.vector).where(
+                fp.id == models.Reference.current_fingerprint_id
+            ).scalar_subquery())
+            .execution_options(synchronize_session=False)
+        )
+
+reference_repository = ReferenceRepository()
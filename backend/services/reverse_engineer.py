@@ -47,8 +47,8 @@ def reverse_engineer_reference(reference_id: str, db: Session) -> models.Reverse
     
     # Get fingerprint vector
     vector = [0.5] * 5
-    if ref.fingerprints:
-        vector = ref.fingerprints[0].vector or vector
+    if ref.current_vector:
+        vector = ref.current_vector
     
     # Get keywords
     keywords = []
@@ -0,0 +1,271 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .alert_engine import alert_engine
+from .deployment_service import backfill_memberships, revert_stores
+from .spec_index import to_number
+
+logger = logging.getLogger(__name__)
+
+MEAN = "mean"
+FRACTION = "fraction"
+ANY_STORE = "any_store"
+SUSTAINED = "sustained"
+
+DEFAULT_DEVIATION_THRESHOLD = 20.0
+# Deployments with stores on their version; staged rollouts are guarded too
+LIVE_STATUSES = ("DEPLOYED", "ROLLING_OUT", "PAUSED")
+
+
+class DeploymentHealth(NamedTuple):
+    """Deviation of a deployment's member stores still running its version"""
+    deployment_id: str
+    store_count: int
+    mean_deviation: Optional[float]
+    max_deviation: Optional[float]
+    stores_over: int  # stores above the deployment's deviation_threshold
+
+    @property
+    def bad_fraction(self) -> float:
+        return self.stores_over / self.store_count if self.store_count else 0.0
+
+
+class RollbackPolicy(NamedTuple):
+    """
+    Parsed rollback policy of a deployment:
+      {"policy": "mean", "deviation_threshold": 10}
+      {"policy": "fraction", "deviation_threshold": 20, "max_bad_fraction": 0.1}
+      {"policy": "any_store", "deviation_threshold": 20}
+      {"policy": "sustained", "condition": "mean", "deviation_threshold": 15, "window_minutes": 30}
+    """
+    kind: str
+    deviation_threshold: float
+    max_bad_fraction: float = 0.0
+    window_minutes: float = 0.0
+    condition: str = MEAN
+    revert_stores: bool = True
+
+
+PolicyCheck = Callable[[DeploymentHealth, RollbackPolicy], Optional[str]]
+POLICIES: Dict[str, PolicyCheck] = {}
+
+
+def register_policy(name: str):
+    """Register a check returning the rollback reason, or None when healthy"""
+    def decorator(check: PolicyCheck) -> PolicyCheck:
+        POLICIES[name] = check
+        return check
+    return decorator
+
+
+@register_policy(MEAN)
+def mean_policy(health: DeploymentHealth, policy: RollbackPolicy) -> Optional[str]:
+    if health.mean_deviation is not None and health.mean_deviation > policy.deviation_threshold:
+        return (f"Mean deviation {health.mean_deviation:.1f}% exceeded "
+                f"{policy.deviation_threshold}% across {health.store_count} stores")
+    return None
+
+
+@register_policy(FRACTION)
+@register_policy(ANY_STORE)
+def fraction_policy(health: DeploymentHealth, policy: RollbackPolicy) -> Optional[str]:
+    if health.stores_over and health.bad_fraction > policy.max_bad_fraction:
+        return (f"Deviation exceeded {policy.deviation_threshold}% in "
+                f"{health.stores_over} of {health.store_count} stores")
+    return None
+
+
+def parse_policy(rollback_policy_json, rollback_condition_json) -> Optional[RollbackPolicy]:
+    """
+    `rollback_policy_json` defaults to any_store (threshold 20%), the legacy
+    `rollback_condition_json` to mean (threshold required).
+    """
+    if rollback_policy_json:
+        raw, kind, threshold = rollback_policy_json, ANY_STORE, DEFAULT_DEVIATION_THRESHOLD
+    elif rollback_condition_json:
+        raw, kind, threshold = rollback_condition_json, MEAN, None
+    else:
+        return None
+    if not isinstance(raw, dict):
+        return None
+
+    threshold = to_number(raw.get("deviation_threshold")) if "deviation_threshold" in raw else threshold
+    kind = raw.get("policy", kind)
+    condition = raw.get("condition", MEAN)
+    if threshold is None or (kind not in POLICIES and kind != SUSTAINED) or condition not in POLICIES:
+        return None
+    return RollbackPolicy(
+        kind=kind,
+        deviation_threshold=threshold,
+        max_bad_fraction=0.0 if kind == ANY_STORE else to_number(raw.get("max_bad_fraction")) or 0.0,
+        window_minutes=to_number(raw.get("window_minutes")) or 0.0,
+        condition=condition,
+        revert_stores=bool(raw.get("revert_stores", True))
+    )
+
+
+class RollbackDecision(NamedTuple):
+    deployment_id: str
+    org_id: Optional[str]
+    recipe_version_id: str
+    policy: RollbackPolicy
+    reason: str
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+
+class RollbackEngine:
+    """
+    Health check and auto-rollback for every live deployment.
+
+    One pass costs a fixed number of queries whatever the number of
+    deployments and stores: the deployments, one grouped aggregate over
+    their member stores (thresholds are inlined per deployment), and bulk
+    writes. Rolled back stores return to the version they ran before.
+    """
+
+    def health(self, db: Session, thresholds: Dict[str, float]) -> Dict[str, DeploymentHealth]:
+        """Per-deployment store deviation stats, in a single grouped query"""
+        if not thresholds:
+            return {}
+        threshold = case(thresholds, value=models.Deployment.id, else_=DEFAULT_DEVIATION_THRESHOLD)
+        rows = db.query(
+            models.Deployment.id,
+            func.count(models.Store.id),
+            func.avg(models.Store.deviation),
+            func.max(models.Store.deviation),
+            func.sum(case((models.Store.deviation > threshold, 1), else_=0))
+        ).join(
+            models.DeploymentMembership, and_(
+                models.DeploymentMembership.deployment_id == models.Deployment.id,
+                models.DeploymentMembership.reverted_at.is_(None)
+            )
+        ).join(
+            models.Store, and_(
+                models.Store.id == models.DeploymentMembership.store_id,
+                models.Store.active_recipe_version_id == models.Deployment.recipe_version_id
+            )
+        ).filter(
+            models.Deployment.id.in_(list(thresholds)),
+            models.Store.deviation.isnot(None)
+        ).group_by(models.Deployment.id).all()
+        return {
+            dep_id: DeploymentHealth(
+                dep_id,
+                count,
+                float(mean) if mean is not None else None,
+                float(worst) if worst is not None else None,
+                int(over or 0)
+            )
+            for dep_id, count, mean, worst, over in rows
+        }
+
+    def evaluate(self, db: Session, now: Optional[datetime] = None) -> List[RollbackDecision]:
+        """
+        Check every live deployment with a policy. Records the health check
+        (and sustained-breach start) on the deployments; does not commit.
+        """
+        now = now or datetime.now(timezone.utc)
+        backfill_memberships(db, now)
+        deployments = db.query(
+            models.Deployment.id,
+            models.Deployment.org_id,
+            models.Deployment.recipe_version_id,
+            models.Deployment.rollback_policy_json,
+            models.Deployment.rollback_condition_json,
+            models.Deployment.rollback_breach_since
+        ).filter(models.Deployment.status.in_(LIVE_STATUSES)).all()
+
+        policies = {}
+        for dep in deployments:
+            policy = parse_policy(dep.rollback_policy_json, dep.rollback_condition_json)
+            if policy is not None:
+                policies[dep.id] = policy
+        health = self.health(db, {dep_id: p.deviation_threshold for dep_id, p in policies.items()})
+
+        decisions = []
+        checked = []
+        for dep in deployments:
+            policy = policies.get(dep.id)
+            if policy is None:
+                continue
+            stats = health.get(dep.id)
+            breach_since = None
+            reason = None
+            if stats is not None:
+                check = POLICIES[policy.condition if policy.kind == SUSTAINED else policy.kind]
+                reason = check(stats, policy)
+            if reason and policy.kind == SUSTAINED:
+                breach_since = _utc(dep.rollback_breach_since) or now
+                if now - breach_since < timedelta(minutes=policy.window_minutes):
+                    reason = None
+                else:
+                    reason = f"{reason} for {policy.window_minutes:g} min"
+            checked.append({"id": dep.id, "last_health_check_at": now, "rollback_breach_since": breach_since})
+            if reason:
+                decisions.append(RollbackDecision(dep.id, dep.org_id, dep.recipe_version_id, policy, reason))
+
+        if checked:
+            db.execute(update(models.Deployment), checked)
+        return decisions
+
+    def apply(self, db: Session, decisions: List[RollbackDecision], now: Optional[datetime] = None) -> List[str]:
+        """Roll back deployments, restore their stores' previous versions and alert each store, in bulk. Does not commit."""
+        if not decisions:
+            return []
+        for decision in decisions:
+            logger.warning("ROLLBACK TRIGGERED: Deployment %s - %s", decision.deployment_id, decision.reason)
+
+        db.execute(update(models.Deployment), [
+            {"id": d.deployment_id, "status": "ROLLED_BACK"} for d in decisions
+        ])
+
+        by_id = {d.deployment_id: d for d in decisions}
+        membership = models.DeploymentMembership
+        stores = db.query(
+            models.Store.id, models.Store.org_id, models.Store.active_recipe_version_id, membership.deployment_id
+        ).join(
+            membership, membership.store_id == models.Store.id
+        ).join(
+            models.Deployment, models.Deployment.id == membership.deployment_id
+        ).filter(
+            membership.deployment_id.in_(list(by_id)),
+            membership.reverted_at.is_(None),
+            models.Store.active_recipe_version_id == models.Deployment.recipe_version_id
+        ).all()
+
+        # Exact previous version per store, one UPDATE for the whole fleet
+        revert_stores(db, [d.deployment_id for d in decisions if d.policy.revert_stores], now)
+
+        alert_rows = [
+            {
+                "id": models.generate_uuid(),
+                "org_id": store.org_id,
+                "store_id": store.id,
+                "recipe_version_id": store.active_recipe_version_id,
+                "alert_type": schemas.AlertType.SYSTEM_ERROR.value,
+                "severity": schemas.AlertSeverity.CRITICAL.value,
+                "message": f"Auto-rollback: Deployment {store.deployment_id} - {by_id[store.deployment_id].reason}",
+                "is_resolved": 0
+            }
+            for store in stores
+        ]
+        if alert_rows:
+            alert_engine.open_alerts(db, alert_rows)
+        return [d.deployment_id for d in decisions]
+
+    def run(self, db: Session, now: Optional[datetime] = None) -> List[str]:
+        """One health-check pass; returns the rolled back deployment ids"""
+        rolled_back = self.apply(db, self.evaluate(db, now), now)
+        db.commit()
+        return rolled_back
+
+
+rollback_engine = RollbackEngine()
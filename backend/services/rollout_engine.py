@@ -0,0 +1,267 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .alert_engine import alert_engine
+from .deployment_service import ROLLBACK, rollout_plan, stage_memberships, target_filter, write_stages
+from .rollback_engine import DEFAULT_DEVIATION_THRESHOLD, MEAN, RollbackDecision, RollbackPolicy, parse_policy, rollback_engine
+
+logger = logging.getLogger(__name__)
+
+PROMOTE = "PROMOTE"
+PAUSE = "PAUSE"
+ROLL_BACK = "ROLLBACK"
+
+STAGE = "stage"
+CONTROL = "control"
+
+_DEPLOYMENT_COLUMNS = (
+    models.Deployment.id,
+    models.Deployment.org_id,
+    models.Deployment.recipe_version_id,
+    models.Deployment.scope,
+    models.Deployment.target_group_json,
+    models.Deployment.rollback_policy_json,
+    models.Deployment.rollback_condition_json,
+    models.Deployment.rollout_stage,
+    models.Deployment.stage_started_at,
+    models.Deployment.status
+)
+
+
+class StageHealth(NamedTuple):
+    """Rolling deviation of the current stage's stores against the not-yet-reached (control) stores"""
+    deployment_id: str
+    stage_stores: int
+    stage_mean: Optional[float]
+    control_stores: int
+    control_mean: Optional[float]
+
+    @property
+    def delta(self) -> Optional[float]:
+        if self.stage_mean is None or self.control_mean is None:
+            return None
+        return self.stage_mean - self.control_mean
+
+
+class RolloutStep(NamedTuple):
+    deployment_id: str
+    action: str
+    stage: int
+    reason: str
+
+
+def _utc(ts: Optional[datetime]) -> Optional[datetime]:
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+
+class RolloutEngine:
+    """
+    Moves staged deployments (ROLLING_OUT) through their percentage stages.
+
+    Before each promotion the stage's stores are compared with the target
+    stores it has not reached yet, on the rolling Store.deviation: a stage
+    running more than `max_deviation_delta` points worse than its control
+    pauses the rollout or rolls it back. One pass is one grouped query for
+    every rollout plus bulk writes for all the transitions.
+    """
+
+    def health(self, db: Session, deployments) -> Dict[str, StageHealth]:
+        """Stage vs control deviation per deployment, in a single grouped query"""
+        if not deployments:
+            return {}
+        membership = models.DeploymentMembership
+        arm = case(
+            (membership.store_id.is_(None), CONTROL),
+            (models.Store.active_recipe_version_id == models.Deployment.recipe_version_id, STAGE),
+            else_=None
+        )
+        rows = db.query(
+            models.Deployment.id,
+            arm,
+            func.count(models.Store.id),
+            func.avg(models.Store.deviation)
+        ).join(
+            models.Store, or_(*[and_(models.Deployment.id == dep.id, *target_filter(dep)) for dep in deployments])
+        ).outerjoin(
+            membership, and_(
+                membership.deployment_id == models.Deployment.id,
+                membership.store_id == models.Store.id,
+                membership.reverted_at.is_(None)
+            )
+        ).filter(
+            models.Store.deviation.isnot(None)
+        ).group_by(models.Deployment.id, arm).all()
+
+        stats: Dict[str, Dict[str, tuple]] = {}
+        for dep_id, side, count, mean in rows:
+            if side is not None:
+                stats.setdefault(dep_id, {})[side] = (count, float(mean) if mean is not None else None)
+        health = {}
+        for dep in deployments:
+            stage = stats.get(dep.id, {}).get(STAGE, (0, None))
+            control = stats.get(dep.id, {}).get(CONTROL, (0, None))
+            health[dep.id] = StageHealth(dep.id, stage[0], stage[1], control[0], control[1])
+        return health
+
+    def evaluate(self, db: Session, now: Optional[datetime] = None) -> List[RolloutStep]:
+        """Decide the next step of every running rollout; does not write"""
+        now = now or datetime.now(timezone.utc)
+        deployments = db.query(*_DEPLOYMENT_COLUMNS).filter(models.Deployment.status == "ROLLING_OUT").all()
+        health = self.health(db, deployments)
+
+        steps = []
+        for dep in deployments:
+            plan = rollout_plan(dep)
+            stage = dep.rollout_stage or 0
+            if plan is None or stage + 1 >= len(plan.stages):
+                # Rollout config removed or already complete: finish it
+                steps.append(RolloutStep(dep.id, PROMOTE, stage, "Rollout complete"))
+                continue
+
+            stats = health[dep.id]
+            if stats.delta is not None and stats.delta > plan.max_deviation_delta:
+                reason = (f"Stage {plan.stages[stage]:g}% mean deviation {stats.stage_mean:.1f}% is "
+                          f"{stats.delta:.1f}%p above control ({stats.control_mean:.1f}%, "
+                          f"limit {plan.max_deviation_delta:g}%p)")
+                steps.append(RolloutStep(dep.id, ROLL_BACK if plan.on_breach == ROLLBACK else PAUSE, stage, reason))
+                continue
+
+            started = _utc(dep.stage_started_at) or now
+            if stats.stage_stores and now - started >= timedelta(minutes=plan.min_stage_minutes):
+                steps.append(RolloutStep(dep.id, PROMOTE, stage + 1, f"Stage {plan.stages[stage]:g}% healthy"))
+        return steps
+
+    def apply(self, db: Session, steps: List[RolloutStep], now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """Promote, pause or roll back in bulk. Does not commit."""
+        now = now or datetime.now(timezone.utc)
+        result = {"promoted": [], "paused": [], "rolled_back": []}
+        if not steps:
+            return result
+        by_id = {
+            dep.id: dep
+            for dep in db.query(*_DEPLOYMENT_COLUMNS).filter(models.Deployment.id.in_([s.deployment_id for s in steps]))
+        }
+
+        memberships = []
+        transitions = []
+        decisions = []
+        alert_rows = []
+        for step in steps:
+            dep = by_id[step.deployment_id]
+            if step.action == PROMOTE:
+                plan = rollout_plan(dep)
+                final = plan is None or step.stage + 1 >= len(plan.stages)
+                if plan is not None and step.stage < len(plan.stages):
+                    memberships.extend(stage_memberships(db, dep, step.stage, plan, now))
+                transitions.append({
+                    "id": dep.id,
+                    "rollout_stage": step.stage,
+                    "stage_started_at": now,
+                    "status": "DEPLOYED" if final else "ROLLING_OUT"
+                })
+                result["promoted"].append(dep.id)
+            elif step.action == PAUSE:
+                logger.warning("ROLLOUT PAUSED: Deployment %s - %s", dep.id, step.reason)
+                transitions.append({"id": dep.id, "status": "PAUSED"})
+                alert_rows.append({
+                    "id": models.generate_uuid(),
+                    "org_id": dep.org_id,
+                    "store_id": None,
+                    "recipe_version_id": dep.recipe_version_id,
+                    "alert_type": schemas.AlertType.SYSTEM_ERROR.value,
+                    "severity": schemas.AlertSeverity.HIGH.value,
+                    "message": f"Rollout paused: Deployment {dep.id} - {step.reason}",
+                    "is_resolved": 0
+                })
+                result["paused"].append(dep.id)
+            else:
+                policy = parse_policy(dep.rollback_policy_json, dep.rollback_condition_json) or RollbackPolicy(
+                    MEAN, DEFAULT_DEVIATION_THRESHOLD
+                )
+                decisions.append(RollbackDecision(dep.id, dep.org_id, dep.recipe_version_id, policy, step.reason))
+
+        write_stages(db, memberships, {dep_id: dep.recipe_version_id for dep_id, dep in by_id.items()}, transitions)
+        if alert_rows:
+            alert_engine.open_alerts(db, alert_rows)
+        result["rolled_back"] = rollback_engine.apply(db, decisions, now)
+        return result
+
+    def run(self, db: Session, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        """One rollout pass (scheduler job); commits"""
+        result = self.apply(db, self.evaluate(db, now), now)
+        db.commit()
+        return result
+
+    def _get(self, db: Session, deployment_id: str):
+        dep = db.query(*_DEPLOYMENT_COLUMNS).filter(models.Deployment.id == deployment_id).first()
+        if dep is None:
+            raise HTTPException(status_code=404, detail="Deployment not found")
+        if rollout_plan(dep) is None:
+            raise HTTPException(status_code=400, detail="Deployment is not a staged rollout")
+        return dep
+
+    def promote(self, db: Session, deployment_id: str, force: bool = False, now: Optional[datetime] = None) -> Dict:
+        """
+        Manual promotion to the next stage. Refused while the current stage
+        breaches its control unless `force`. Commits.
+        """
+        dep = self._get(db, deployment_id)
+        if dep.status != "ROLLING_OUT":
+            raise HTTPException(status_code=400, detail=f"Deployment is {dep.status}")
+        plan = rollout_plan(dep)
+        stats = self.health(db, [dep])[dep.id]
+        if not force and stats.delta is not None and stats.delta > plan.max_deviation_delta:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Stage deviation is {stats.delta:.1f}%p above control (limit {plan.max_deviation_delta:g}%p)"
+            )
+        self.apply(db, [RolloutStep(dep.id, PROMOTE, (dep.rollout_stage or 0) + 1, "Manual promotion")], now)
+        db.commit()
+        return self.status(db, deployment_id)
+
+    def set_paused(self, db: Session, deployment_id: str, paused: bool, now: Optional[datetime] = None) -> Dict:
+        """Pause a running rollout, or resume a paused one (its stage clock restarts). Commits."""
+        dep = self._get(db, deployment_id)
+        expected = "ROLLING_OUT" if paused else "PAUSED"
+        if dep.status != expected:
+            raise HTTPException(status_code=400, detail=f"Deployment is {dep.status}")
+        values = {"status": "PAUSED"} if paused else {
+            "status": "ROLLING_OUT", "stage_started_at": now or datetime.now(timezone.utc)
+        }
+        db.execute(
+            update(models.Deployment)
+            .where(models.Deployment.id == dep.id, models.Deployment.status == expected)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return self.status(db, deployment_id)
+
+    def status(self, db: Session, deployment_id: str) -> Dict:
+        dep = self._get(db, deployment_id)
+        plan = rollout_plan(dep)
+        stage = dep.rollout_stage or 0
+        stats = self.health(db, [dep])[dep.id]
+        return {
+            "deployment_id": dep.id,
+            "status": dep.status,
+            "stages": list(plan.stages),
+            "stage": stage,
+            "stage_pct": plan.stages[min(stage, len(plan.stages) - 1)],
+            "stage_started_at": dep.stage_started_at,
+            "stage_stores": stats.stage_stores,
+            "stage_mean_deviation": stats.stage_mean,
+            "control_stores": stats.control_stores,
+            "control_mean_deviation": stats.control_mean,
+            "max_deviation_delta": plan.max_deviation_delta,
+            "on_breach": plan.on_breach
+        }
+
+
+rollout_engine = RolloutEngine()
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.database import SessionLocal
+from .alert_engine import alert_engine
+from .alert_grouping import incident_grouper
+from .batch_experiments import process_queued_runs
+from .deployment_service import apply_due_deployments
+from .deviation_aggregator import deviation_aggregator
+from .llm_cache import llm_cache
+from ..config import float_env
+from .log_partitions import run_log_maintenance
+from .rollback_engine import rollback_engine
+from .rollout_engine import rollout_engine
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "SUCCESS"
+FAILED = "FAILED"
+
+
+class ScheduledJob(NamedTuple):
+    """
+    `run(db)` is called on a fresh session and committed afterwards.
+    Leader-only jobs run on one replica at a time (DB lease); the others run
+    on every replica (e.g. flushing per-process state).
+    """
+    name: str
+    interval: float
+    run: Callable[[Session], Any]
+    leader_only: bool = True
+
+
+def scheduler_enabled() -> bool:
+    """In-process scheduling for the API (FLAVOROS_SCHEDULER_ENABLED=1); the worker always schedules"""
+    return os.getenv("FLAVOROS_SCHEDULER_ENABLED", "").strip().lower() in ("1", "true", "yes")
+
+
+def _holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Scheduler:
+    """
+    Periodic maintenance jobs on jittered intervals.
+
+    Each job runs in its own asyncio task; the job itself runs in a worker
+    thread. Before a leader-only run the replica must hold the job's
+    SchedulerLease row: it is taken when expired (or already ours) with a
+    conditional UPDATE, so exactly one replica wins. The holder keeps renewing
+    it every run, and a heartbeat thread extends it while a run outlasts the
+    lease; if the holder dies, another replica takes over once the lease
+    (interval * lease_factor) expires.
+    """
+
+    def __init__(
+        self,
+        jobs: List[ScheduledJob],
+        session_factory=SessionLocal,
+        jitter: float = 0.1,
+        lease_factor: float = 1.5,
+        holder: Optional[str] = None
+    ):
+        self.jobs = jobs
+        self.session_factory = session_factory
+        self.jitter = min(max(jitter, 0.0), 0.9)
+        self.lease_factor = max(lease_factor, 1.0 + self.jitter)
+        self.holder = holder or _holder_id()
+        self._tasks: List[asyncio.Task] = []
+        self.runs: Dict[str, int] = {job.name: 0 for job in jobs}
+        self.skipped: Dict[str, int] = {job.name: 0 for job in jobs}
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def next_delay(self, job: ScheduledJob) -> float:
+        return job.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def acquire(self, db: Session, job: ScheduledJob, now: datetime) -> bool:
+        """Take or renew the job's lease. Commits."""
+        lease = models.SchedulerLease
+        values = {
+            "holder": self.holder,
+            "expires_at": now + timedelta(seconds=job.interval * self.lease_factor),
+            "last_started_at": now,
+            "last_status": "RUNNING"
+        }
+        result = db.execute(
+            update(lease)
+            .where(lease.job_name == job.name, or_(lease.expires_at <= now, lease.holder == self.holder))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            db.commit()
+            return True
+        if db.query(lease.job_name).filter(lease.job_name == job.name).first() is not None:
+            db.rollback()
+            return False
+        try:
+            db.execute(insert(lease).values(job_name=job.name, run_count=0, **values))
+            db.commit()
+            return True
+        except IntegrityError:
+            # Another replica created the lease first
+            db.rollback()
+            return False
+
+    def renew(self, db: Session, job: ScheduledJob, now: datetime) -> bool:
+        """Extend a lease we hold. Commits; False when another replica has taken it."""
+        lease = models.SchedulerLease
+        result = db.execute(
+            update(lease)
+            .where(lease.job_name == job.name, lease.holder == self.holder)
+            .values(expires_at=now + timedelta(seconds=job.interval * self.lease_factor))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def _heartbeat(self, job: ScheduledJob, done: threading.Event):
+        """Renew the lease every third of its length until `done` is set"""
+        while not done.wait(job.interval * self.lease_factor / 3):
+            db = self.session_factory()
+            try:
+                if not self.renew(db, job, datetime.now(timezone.utc)):
+                    logger.warning("Lost the lease of %s while it was running", job.name)
+                    return
+            except Exception:
+                db.rollback()
+                logger.exception("Renewing the lease of %s failed", job.name)
+            finally:
+                db.close()
+
+    def run_once(self, job: ScheduledJob, now: Optional[datetime] = None) -> Optional[str]:
+        """Run `job` if this replica may; returns SUCCESS / FAILED, or None when skipped"""
+        now = now or datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            if job.leader_only and not self.acquire(db, job, now):
+                self.skipped[job.name] += 1
+                return None
+
+            status, error = SUCCESS, None
+            done = threading.Event()
+            if job.leader_only:
+                threading.Thread(target=self._heartbeat, args=(job, done), daemon=True).start()
+            try:
+                job.run(db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                status, error = FAILED, str(e)[:1000]
+                logger.exception("Scheduled job %s failed", job.name)
+            finally:
+                done.set()
+            self.runs[job.name] += 1
+
+            if job.leader_only:
+                lease = models.SchedulerLease
+                db.execute(
+                    update(lease)
+                    .where(lease.job_name == job.name, lease.holder == self.holder)
+                    .values(
+                        last_finished_at=datetime.now(timezone.utc),
+                        last_status=status,
+                        last_error=error,
+                        run_count=lease.run_count + 1
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+            return status
+        finally:
+            db.close()
+
+    def release(self):
+        """Expire our leases so another replica can take over without waiting"""
+        db = self.session_factory()
+        try:
+            lease = models.SchedulerLease
+            db.execute(
+                update(lease)
+                .where(lease.holder == self.holder)
+                .values(expires_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _loop(self, job: ScheduledJob):
+        # Spread the first runs so replicas started together do not race
+        await asyncio.sleep(random.uniform(0, job.interval * self.jitter))
+        while True:
+            await asyncio.to_thread(self.run_once, job)
+            await asyncio.sleep(self.next_delay(job))
+
+    async def start(self):
+        if self.running:
+            return
+        self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs]
+        logger.info("Scheduler %s started: %s", self.holder, ", ".join(job.name for job in self.jobs))
+
+    async def stop(self):
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.release)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "holder": self.holder,
+            "running": self.running,
+            "jobs": [
+                {
+                    "name": job.name,
+                    "interval": job.interval,
+                    "leader_only": job.leader_only,
+                    "runs": self.runs[job.name],
+                    "skipped": self.skipped[job.name]
+                }
+                for job in self.jobs
+            ]
+        }
+
+
+def _check_alerts(db: Session):
+    return alert_engine.check_stores(db)
+
+
+def _persist_deviation_rollups(db: Session):
+    return deviation_aggregator.maybe_persist(db, force=True)
+
+
+def default_jobs() -> List[ScheduledJob]:
+    """Intervals (seconds) can be overridden with FLAVOROS_SCHEDULE_<JOB>"""
+    return [
+        ScheduledJob("deployment_apply", float_env("FLAVOROS_SCHEDULE_DEPLOYMENT_APPLY", 60.0), apply_due_deployments),
+        ScheduledJob("deployment_rollout", float_env("FLAVOROS_SCHEDULE_DEPLOYMENT_ROLLOUT", 300.0), rollout_engine.run),
+        ScheduledJob("deployment_health", float_env("FLAVOROS_SCHEDULE_DEPLOYMENT_HEALTH", 60.0), rollback_engine.run),
+        ScheduledJob("alert_check", float_env("FLAVOROS_SCHEDULE_ALERT_CHECK", 60.0), _check_alerts),
+        ScheduledJob("incident_analysis", float_env("FLAVOROS_SCHEDULE_INCIDENT_ANALYSIS", 60.0), incident_grouper.analyze_pending),
+        ScheduledJob("experiment_runs", float_env("FLAVOROS_SCHEDULE_EXPERIMENT_RUNS", 30.0), process_queued_runs),
+        ScheduledJob("llm_cache_cleanup", float_env("FLAVOROS_SCHEDULE_LLM_CACHE_CLEANUP", 3600.0), llm_cache.cleanup_expired),
+        ScheduledJob("log_maintenance", float_env("FLAVOROS_SCHEDULE_LOG_MAINTENANCE", 3600.0), run_log_maintenance),
+        # Rollups come from each replica's in-memory aggregator, so every replica flushes its own
+        ScheduledJob(
+            "deviation_rollups",
+            float_env("FLAVOROS_SCHEDULE_DEVIATION_ROLLUPS", 300.0),
+            _persist_deviation_rollups,
+            leader_only=False
+        ),
+    ]
+
+
+scheduler = Scheduler(default_jobs(), jitter=float_env("FLAVOROS_SCHEDULER_JITTER", 0.1))
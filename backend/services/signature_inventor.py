@@ -1,6 +1,7 @@
 import random
 from sqlalchemy.orm import Session
 from backend import models, schemas
+from backend.services.reference_repository import reference_repository
 
 AXES = ["매운맛", "단맛", "감칠맛", "상큼함", "풍미"]
 
@@ -35,10 +36,9 @@ def invent_signature(
     """
     # 1. Get base vectors
     base_vectors = []
-    for ref_id in base_reference_ids:
-        ref = db.query(models.Reference).filter(models.Reference.id == ref_id).first()
-        if ref and ref.fingerprints:
-            base_vectors.append(ref.fingerprints[0].vector[:5])
+    for ref in reference_repository.load_with_vectors(db, base_reference_ids):
+        if ref.current_vector:
+            base_vectors.append(ref.current_vector[:5])
     
     if not base_vectors:
         raise ValueError("No valid base references found")
@@ -143,18 +143,19 @@ def calculate_conflict_map(
     Calculate conflict/overlap between brand and competitors.
     """
     # Get brand vector
-    brand = db.query(models.Reference).filter(models.Reference.id == brand_id).first()
-    if not brand or not brand.fingerprints:
+    refs = {r.id: r for r in reference_repository.load_with_vectors(db, [brand_id] + list(competitor_ids))}
+    brand = refs.get(brand_id)
+    if not brand or not brand.current_vector:
         raise ValueError("Brand not found or has no fingerprint")
     
-    brand_vector = brand.fingerprints[0].vector[:5]
+    brand_vector = brand.current_vector[:5]
     
     # Get average competitor vector
     comp_vectors = []
     for cid in competitor_ids:
-        comp = db.query(models.Reference).filter(models.Reference.id == cid).first()
-        if comp and comp.fingerprints:
-            comp_vectors.append(comp.fingerprints[0].vector[:5])
+        comp = refs.get(cid)
+        if comp and comp.current_vector:
+            comp_vectors.append(comp.current_vector[:5])
     
     if not comp_vectors:
         raise ValueError("No valid competitors found")
@@ -0,0 +1,162 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend import models
+
+DEFAULT_TOLERANCE_PCT = 10.0
+
+# (target, tolerance_pct)
+Target = Tuple[float, float]
+
+
+class CompiledSpec:
+    """Flat (step, param) -> (target, tolerance) table for one recipe version"""
+
+    def __init__(self, targets: Dict[Tuple[str, str], Target], params_by_step: Dict[str, List[str]]):
+        self.targets = targets
+        self.params_by_step = params_by_step
+
+    def lookup(self, step: str, param: Optional[str] = None) -> Optional[Tuple[str, float, float]]:
+        """
+        (param, target, tolerance) for a step name or action (case-insensitive).
+        `param` may be omitted when the step has exactly one numeric parameter.
+        """
+        step = step.strip().lower()
+        if param is None:
+            params = self.params_by_step.get(step)
+            if not params or len(params) != 1:
+                return None
+            param = params[0]
+        hit = self.targets.get((step, param))
+        if hit is None:
+            return None
+        return param, hit[0], hit[1]
+
+
+EMPTY_SPEC = CompiledSpec({}, {})
+
+
+def to_number(value) -> Optional[float]:
+    """float(value), or None for anything that is not numeric"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compile_spec(spec) -> CompiledSpec:
+    """
+    Flatten a recipe spec (see recipe_generator.generate_recipe_spec).
+
+    A param is either a number or {"target": x, "tolerance_pct": y}.
+    `tolerance_pct` may also be set per step or in `meta`. Steps are indexed
+    under both their `step` and `action` names.
+    """
+    if not isinstance(spec, dict):
+        return EMPTY_SPEC
+
+    meta = spec.get("meta") if isinstance(spec.get("meta"), dict) else {}
+    default_tol = to_number(meta.get("tolerance_pct")) or DEFAULT_TOLERANCE_PCT
+
+    targets = {}
+    params_by_step = {}
+    for step in spec.get("steps") or []:
+        if not isinstance(step, dict) or not isinstance(step.get("params"), dict):
+            continue
+        step_tol = to_number(step.get("tolerance_pct")) or default_tol
+        names = {str(step[k]).strip().lower() for k in ("step", "action") if step.get(k)}
+
+        compiled = {}
+        for param, value in step["params"].items():
+            tol = step_tol
+            if isinstance(value, dict):
+                tol = to_number(value.get("tolerance_pct")) or step_tol
+                value = value.get("target")
+            value = to_number(value)
+            if value is not None:
+                compiled[param] = (value, tol)
+
+        for name in names:
+            for param, hit in compiled.items():
+                targets[(name, param)] = hit
+            params_by_step.setdefault(name, []).extend(compiled)
+
+    return CompiledSpec(targets, params_by_step)
+
+
+def _parse_version(spec_json, spec_yaml) -> CompiledSpec:
+    if spec_json:
+        return compile_spec(spec_json)
+    if spec_yaml:
+        try:
+            return compile_spec(yaml.safe_load(spec_yaml))
+        except yaml.YAMLError:
+            return EMPTY_SPEC
+    return EMPTY_SPEC
+
+
+class SpecIndex:
+    """
+    In-memory compiled targets per recipe version.
+
+    Each version's spec_json / spec_yaml is parsed once, on first use (or by
+    `warm()` for versions active on a store), so the deviation hot path only
+    does dict lookups. Versions without a usable spec are cached as empty.
+    Entries are dropped whenever a RecipeVersion row is written.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, CompiledSpec] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, recipe_version_id: str) -> CompiledSpec:
+        return self.prime(db, [recipe_version_id]).get(recipe_version_id, EMPTY_SPEC)
+
+    def prime(self, db: Session, recipe_version_ids: Iterable[str]) -> Dict[str, CompiledSpec]:
+        """Compiled specs for the given ids, loading every missing one in a single query"""
+        ids = {rid for rid in recipe_version_ids if rid}
+        missing = ids - self._specs.keys()
+        if missing:
+            rows = db.query(
+                models.RecipeVersion.id,
+                models.RecipeVersion.spec_json,
+                models.RecipeVersion.spec_yaml
+            ).filter(models.RecipeVersion.id.in_(missing)).all()
+            compiled = {rid: EMPTY_SPEC for rid in missing}
+            compiled.update({r.id: _parse_version(r.spec_json, r.spec_yaml) for r in rows})
+            with self._lock:
+                self._specs.update(compiled)
+        return {rid: self._specs.get(rid, EMPTY_SPEC) for rid in ids}
+
+    def warm(self, db: Session) -> int:
+        """Compile every recipe version that is currently active on a store"""
+        active = [
+            rid for (rid,) in db.query(models.Store.active_recipe_version_id).filter(
+                models.Store.active_recipe_version_id.isnot(None)
+            ).distinct()
+        ]
+        self.prime(db, active)
+        return len(active)
+
+    def invalidate(self, recipe_version_id: Optional[str] = None):
+        with self._lock:
+            if recipe_version_id is None:
+                self._specs.clear()
+            else:
+                self._specs.pop(recipe_version_id, None)
+
+
+spec_index = SpecIndex()
+
+
+@event.listens_for(models.RecipeVersion, "after_insert")
+@event.listens_for(models.RecipeVersion, "after_update")
+@event.listens_for(models.RecipeVersion, "after_delete")
+def _invalidate_spec(mapper, connection, target):
+    spec_index.invalidate(target.id)
@@ -0,0 +1,44 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from backend import models
+
+# criteria key -> Store column; values may be a single value or a list
+CRITERIA_COLUMNS = {
+    "region": models.Store.region,
+    "sales_tier": models.Store.sales_tier,
+    "status": models.Store.status,
+    "store_ids": models.Store.id,
+}
+
+
+def _values(value) -> List[Any]:
+    if isinstance(value, (list, tuple, set)):
+        return [v for v in value if v is not None]
+    return [value]
+
+
+def compile_criteria(org_id: str, criteria: Optional[Dict[str, Any]], default_status: Optional[str] = None) -> list:
+    """
+    WHERE clauses on Store for an org and a criteria dict, e.g.
+      {"region": ["Seoul", "Busan"], "sales_tier": "HIGH", "status": "ACTIVE",
+       "store_ids": [..], "exclude_store_ids": [..]}
+    Unknown keys are ignored; an empty value does not filter.
+    `default_status` applies when the criteria do not name a status.
+    """
+    criteria = criteria or {}
+    clauses = [models.Store.org_id == org_id]
+    for key, column in CRITERIA_COLUMNS.items():
+        value = criteria.get(key, default_status if key == "status" else None)
+        if value in (None, "", [], ()):
+            continue
+        values = _values(value)
+        clauses.append(column == values[0] if len(values) == 1 else column.in_(values))
+    if criteria.get("exclude_store_ids"):
+        clauses.append(models.Store.id.notin_(_values(criteria["exclude_store_ids"])))
+    return clauses
+
+
+def stable_rank(*parts: str) -> str:
+    """Deterministic sort key for hashing stores into groups or stages"""
+    return hashlib.sha1(":".join(parts).encode("utf-8")).hexdigest()
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from backend import models, schemas
+from backend.services.reference_repository import reference_repository
 import statistics
 import logging
 
@@ -19,8 +20,9 @@ def analyze_strategy(
     Analyze competitors and recommend optimal strategy.
     Returns strategy with KPI predictions, risks, and reasoning.
     """
-    # 1. Get anchor reference
-    anchor = db.query(models.Reference).filter(models.Reference.id == anchor_id).first()
+    # 1. Get anchor and competitor references (single query)
+    refs = {r.id: r for r in reference_repository.load_with_vectors(db, [anchor_id] + list(competitor_ids))}
+    anchor = refs.get(anchor_id)
     if not anchor:
         raise ValueError(f"Anchor {anchor_id} not found")
     
@@ -29,7 +31,7 @@ def analyze_strategy(
     # 2. Get competitor vectors
     competitors = []
     for cid in competitor_ids:
-        comp = db.query(models.Reference).filter(models.Reference.id == cid).first()
+        comp = refs.get(cid)
         if comp:
             competitors.append({
                 "id": cid,
@@ -77,8 +79,8 @@ def analyze_strategy(
 
 def _get_vector(ref: models.Reference) -> list:
     default_vector = [0.5] * 5
-    if ref.fingerprints and ref.fingerprints[0].vector:
-        vec = ref.fingerprints[0].vector
+    if ref.current_vector:
+        vec = ref.current_vector
         if len(vec) < 5:
             return vec + [0.5] * (5 - len(vec))
         return vec[:5]
@@ -290,7 +292,8 @@ def analyze_strategy_generator(
         yield f"data: {json.dumps({'type': 'progress', 'message': '데이터 로딩 중...'})}\n\n"
         time.sleep(0.5)
 
-        anchor = db.query(models.Reference).filter(models.Reference.id == anchor_id).first()
+        refs = {r.id: r for r in reference_repository.load_with_vectors(db, [anchor_id] + list(competitor_ids))}
+        anchor = refs.get(anchor_id)
         if not anchor:
             raise ValueError(f"Anchor {anchor_id} not found")
         
@@ -298,7 +301,7 @@ def analyze_strategy_generator(
         
         competitors = []
         for cid in competitor_ids:
-            comp = db.query(models.Reference).filter(models.Reference.id == cid).first()
+            comp = refs.get(cid)
             if comp:
                 competitors.append({
                     "id": cid,
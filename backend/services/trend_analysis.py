@@ -2,6 +2,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime
 from .. import models
+from .experiment_stats import experiment_stats, Observation, DAILY_DEVIATION, DAILY_SALES
 from typing import List, Dict, Any
 
 class TrendAnalysisService:
@@ -14,6 +15,10 @@ class TrendAnalysisService:
             total_sales=sales
         )
         db.add(metric)
+        experiment_stats.observe(db, [
+            Observation(store_id, DAILY_DEVIATION, deviation, day=date.date()),
+            Observation(store_id, DAILY_SALES, sales, day=date.date())
+        ])
         db.commit()
 
     def analyze_trend(self, db: Session, store_id: str) -> Dict[str, Any]:
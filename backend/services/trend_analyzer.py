@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from backend import models
+from backend.services.reference_repository import reference_repository
 
 AXES = ["매운맛", "단맛", "감칠맛", "상큼함", "풍미"]
 
@@ -17,10 +18,9 @@ def predict_trends(
     # 1. Get references in category created in lookback period
     cutoff = datetime.utcnow() - timedelta(days=lookback_months * 30)
     
-    refs = db.query(models.Reference).filter(
-        models.Reference.menu_category == category,
-        models.Reference.created_at >= cutoff
-    ).all()
+    refs = reference_repository.load_with_vectors(
+        db, category=category, created_since=cutoff
+    )
     
     if len(refs) < 3:
         # Not enough data - create mock prediction
@@ -101,8 +101,8 @@ def _calc_avg_vector(refs: list) -> list:
     
     vectors = []
     for ref in refs:
-        if ref.fingerprints and ref.fingerprints[0].vector:
-            vectors.append(ref.fingerprints[0].vector[:5])
+        if ref.current_vector:
+            vectors.append(ref.current_vector[:5])
     
     if not vectors:
         return [0.5] * 5
@@ -149,20 +149,25 @@ def auto_search_strategy(
     from backend.services.strategy_analyzer import analyze_strategy
     
     # Get base reference
-    base_ref = db.query(models.Reference).filter(models.Reference.id == base_reference_id).first()
+    base_ref = reference_repository.get_with_vector(db, base_reference_id)
     if not base_ref:
         raise ValueError("Base reference not found")
     
     # Get all competitors in same category
-    competitors = db.query(models.Reference).filter(
-        models.Reference.menu_category == base_ref.menu_category,
-        models.Reference.reference_type == "BRAND",
-        models.Reference.id != base_reference_id
-    ).limit(5).all()
+    competitors = reference_repository.load_with_vectors(
+        db,
+        category=base_ref.menu_category,
+        reference_type="BRAND",
+        exclude_ids=[base_reference_id],
+        limit=5
+    )
     
     if not competitors:
         raise ValueError("No competitors found for analysis")
     
+    # Capture ids up front: each analyze_strategy() commit expires loaded objects
+    competitor_ids = [c.id for c in competitors[:3]]
+    
     # Try different strategies
     best_result = None
     best_score = -1
@@ -176,7 +181,7 @@ def auto_search_strategy(
             
             report = analyze_strategy(
                 anchor_id=base_reference_id,
-                competitor_ids=[c.id for c in competitors[:3]],
+                competitor_ids=competitor_ids,
                 goal=goal_enum,
                 org_id=org_id,
                 db=db
@@ -253,8 +258,8 @@ def record_dna_evolution(
         raise ValueError("Brand not found")
     
     vector = [0.5] * 5
-    if ref.fingerprints:
-        vector = ref.fingerprints[0].vector[:5]
+    if ref.current_vector:
+        vector = ref.current_vector[:5]
     
     evolution = models.DNAEvolution(
         id=models.generate_uuid(),
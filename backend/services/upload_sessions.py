@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from .reference_pipeline import build_reference, build_fingerprint
+from ..config import float_env
+
+UPLOAD_DIR = os.getenv("FLAVOROS_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "flavoros_uploads"))
+ROW_BATCH_SIZE = 500
+ALLOWED_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+STREAM_TIMEOUT = float_env("FLAVOROS_UPLOAD_STREAM_TIMEOUT", 1800.0)  # SSE progress deadline
+KEEPALIVE_INTERVAL = float_env("FLAVOROS_SSE_KEEPALIVE_SECONDS", 15.0)
+
+
+def create_upload_session(db: Session, org_id: str, filename: str) -> models.ReferenceUpload:
+    """Open a new upload session with an empty spool file on disk"""
+    if not filename.endswith(ALLOWED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Invalid file format")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_id = models.generate_uuid()
+    spool_path = os.path.join(UPLOAD_DIR, f"{upload_id}{os.path.splitext(filename)[1]}")
+    open(spool_path, "wb").close()
+
+    upload = models.ReferenceUpload(
+        id=upload_id,
+        org_id=org_id,
+        filename=filename,
+        spool_path=spool_path,
+        status=schemas.ReferenceUploadStatus.RECEIVING
+    )
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def get_upload(db: Session, upload_id: str) -> models.ReferenceUpload:
+    upload = db.query(models.ReferenceUpload).filter(models.ReferenceUpload.id == upload_id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload
+
+
+def append_chunk(db: Session, upload_id: str, index: int, data: BinaryIO) -> models.ReferenceUpload:
+    """
+    Append chunk `index` to the spool file.
+    Re-sent chunks that were already acknowledged are ignored, so clients can
+    resume from `received_chunks` after a network failure.
+    """
+    upload = get_upload(db, upload_id)
+    if upload.status != schemas.ReferenceUploadStatus.RECEIVING:
+        raise HTTPException(status_code=409, detail=f"Upload is {upload.status}, not accepting chunks")
+    if index < upload.received_chunks:
+        return upload
+    if index > upload.received_chunks:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Expected chunk {upload.received_chunks}, got {index}"
+        )
+
+    with open(upload.spool_path, "r+b") as spool:
+        # Drop bytes of a chunk that was written but never acknowledged
+        spool.truncate(upload.received_bytes)
+        spool.seek(upload.received_bytes)
+        shutil.copyfileobj(data, spool)
+        size = spool.tell()
+
+    upload.received_chunks = index + 1
+    upload.received_bytes = size
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def complete_upload(db: Session, upload_id: str) -> models.ReferenceUpload:
+    """Close the session for writing; rows are processed in the background"""
+    upload = get_upload(db, upload_id)
+    if upload.status != schemas.ReferenceUploadStatus.RECEIVING:
+        raise HTTPException(status_code=409, detail=f"Upload is already {upload.status}")
+    if not upload.received_bytes:
+        raise HTTPException(status_code=400, detail="No data received")
+
+    upload.status = schemas.ReferenceUploadStatus.PROCESSING
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def _iter_row_batches(path: str) -> Iterator[pd.DataFrame]:
+    if path.endswith('.csv'):
+        # Streams from disk; never holds the whole catalog in memory
+        yield from pd.read_csv(path, chunksize=ROW_BATCH_SIZE)
+    else:
+        df = pd.read_excel(path)
+        for start in range(0, len(df), ROW_BATCH_SIZE):
+            yield df.iloc[start:start + ROW_BATCH_SIZE]
+
+
+def process_upload(upload_id: str, db_session_factory):
+    """Background worker: parse, dedupe, insert and vectorize spooled rows batch by batch"""
+    db = db_session_factory()
+    try:
+        upload = db.query(models.ReferenceUpload).filter(models.ReferenceUpload.id == upload_id).first()
+        if not upload or upload.status != schemas.ReferenceUploadStatus.PROCESSING:
+            return
+
+        seen_names = set()
+        try:
+            for batch in _iter_row_batches(upload.spool_path):
+                upload.rows_parsed += len(batch)
+
+                # 1. Validation: Mandatory fields
+                if 'name' not in batch.columns or 'menu_category' not in batch.columns:
+                    raise ValueError("Missing required columns: name, menu_category")
+                batch = batch[batch['name'].notna() & batch['menu_category'].notna()]
+
+                # 2. Duplicate Check (within the file and against the DB, one query per batch)
+                names = [n for n in batch['name'].tolist() if n not in seen_names]
+                existing = {
+                    name for (name,) in db.query(models.Reference.name).filter(
+                        models.Reference.org_id == upload.org_id,
+                        models.Reference.name.in_(names)
+                    )
+                } if names else set()
+
+                new_refs = []
+                for _, row in batch.iterrows():
+                    name = row['name']
+                    if name in seen_names or name in existing:
+                        upload.rows_deduped += 1
+                        continue
+                    seen_names.add(name)
+                    new_refs.append(build_reference(row, upload.org_id))
+                db.add_all(new_refs)
+                db.flush()
+
+                # 3. Vectorize the batch
+                for ref in new_refs:
+                    db.add(build_fingerprint(ref))
+                    ref.process_status = schemas.ReferenceProcessStatus.COMPLETED
+
+                upload.rows_inserted += len(new_refs)
+                upload.rows_vectorized += len(new_refs)
+                db.commit()
+
+            upload.status = schemas.ReferenceUploadStatus.COMPLETED
+            db.commit()
+            os.remove(upload.spool_path)
+        except Exception as e:
+            db.rollback()
+            upload.status = schemas.ReferenceUploadStatus.FAILED
+            upload.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+def _progress_payload(upload: models.ReferenceUpload) -> dict:
+    return {
+        "upload_id": upload.id,
+        "status": upload.status,
+        "received_chunks": upload.received_chunks,
+        "received_bytes": upload.received_bytes,
+        "rows_parsed": upload.rows_parsed,
+        "rows_inserted": upload.rows_inserted,
+        "rows_deduped": upload.rows_deduped,
+        "rows_vectorized": upload.rows_vectorized,
+        "error": upload.error
+    }
+
+
+def upload_progress_events(
+    upload_id: str,
+    db_session_factory,
+    poll_interval: float = 0.5,
+    timeout: float = STREAM_TIMEOUT,
+    keepalive: float = KEEPALIVE_INTERVAL
+):
+    """
+    Generator for SSE progress. Yields a progress event whenever counters change.
+    Events: progress, complete, error. While nothing changes a keep-alive
+    comment goes out every `keepalive` seconds, so a disconnected client is
+    noticed on the next write; after `timeout` seconds (e.g. an upload
+    abandoned in RECEIVING) the stream ends with an error event.
+    """
+    last_payload = None
+    deadline = time.monotonic() + timeout
+    last_write = time.monotonic()
+    while True:
+        db = db_session_factory()
+        try:
+            upload = db.query(models.ReferenceUpload).filter(models.ReferenceUpload.id == upload_id).first()
+            if not upload:
+                yield f"data: {json.dumps({'type': 'error', 'message': 'Upload session not found'})}\n\n"
+                return
+            payload = _progress_payload(upload)
+        finally:
+            db.close()
+
+        if payload["status"] == schemas.ReferenceUploadStatus.COMPLETED:
+            yield f"data: {json.dumps({'type': 'complete', **payload})}\n\n"
+            return
+        if payload["status"] == schemas.ReferenceUploadStatus.FAILED:
+            yield f"data: {json.dumps({'type': 'error', **payload})}\n\n"
+            return
+        if payload != last_payload:
+            yield f"data: {json.dumps({'type': 'progress', **payload})}\n\n"
+            last_payload = payload
+            last_write = time.monotonic()
+        elif time.monotonic() - last_write >= keepalive:
+            yield ": keep-alive\n\n"
+            last_write = time.monotonic()
+        if time.monotonic() >= deadline:
+            yield f"data: {json.dumps({'type': 'error', 'message': 'Progress stream timed out', **payload})}\n\n"
+            return
+        time.sleep(poll_interval)
@@ -0,0 +1,152 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.main import app
+from backend.database import Base, get_db
+from backend.services.alert_engine import (
+    AlertEngine, AlertRule, DeviationReading, RATE_OF_CHANGE, SUSTAINED, alert_engine
+)
+from backend.services.deviation_aggregator import deviation_aggregator
+from backend.services.log_processor import process_execution_log_batch
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+def reading(store_id: str, deviation: float) -> DeviationReading:
+    return DeviationReading(store_id, "org_rules", store_id.upper(), deviation)
+
+def test_rules_fire_once_per_open_alert_until_resolved():
+    rules_engine = AlertEngine([
+        AlertRule(name="spike", kind=RATE_OF_CHANGE, threshold=10.0, window_seconds=300, severity="HIGH",
+                  message="{store} +{change:.1f}%p"),
+        AlertRule(name="sustained", kind=SUSTAINED, threshold=8.0, window_seconds=600,
+                  message="{store} {minutes:.0f}분"),
+    ])
+    db = TestingSessionLocal()
+
+    # 2 -> 9 is not a spike, and 9% has not been sustained for 10 minutes yet
+    assert rules_engine.evaluate(db, [reading("r1", 2.0), reading("r2", 9.0)], now=1000.0) == 0
+    assert rules_engine.evaluate(db, [reading("r1", 9.0)], now=1100.0) == 0
+    # r1: +13 points within 5 minutes
+    assert rules_engine.evaluate(db, [reading("r1", 15.0)], now=1200.0) == 1
+    # r2: still above 8% ten minutes later; r1 is deduped by its open alert
+    assert rules_engine.evaluate(db, [reading("r1", 30.0), reading("r2", 9.5)], now=1600.0) == 1
+    db.commit()
+
+    alerts = {a.store_id: a for a in db.query(models.Alert).filter(models.Alert.org_id == "org_rules")}
+    assert alerts["r1"].severity == "HIGH"
+    assert "+13.0%p" in alerts["r1"].message
+    assert alerts["r2"].severity == "MEDIUM"
+    assert "10분" in alerts["r2"].message
+    r1_alert_id = alerts["r1"].id
+
+    # Rolled back alerts do not count as open
+    assert rules_engine.evaluate(db, [reading("r3", 2.0)], now=1000.0) == 0
+    assert rules_engine.evaluate(db, [reading("r3", 20.0)], now=1010.0) == 1
+    db.rollback()
+    assert not rules_engine.is_open(db, "r3", "DEVIATION_HIGH")
+    db.close()
+
+    # Resolving reopens the store for new alerts
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        response = client.post(f"/v1/alerts/{r1_alert_id}/resolve")
+    finally:
+        app.dependency_overrides[get_db] = previous
+    assert response.status_code == 200
+    db = TestingSessionLocal()
+    assert not alert_engine.is_open(db, "r1", "DEVIATION_HIGH")
+    db.close()
+
+def test_ingestion_raises_store_alert_without_full_scan():
+    alert_engine.reset()
+    deviation_aggregator.reset()
+    db = TestingSessionLocal()
+    db.add(models.Store(id="store_rules", org_id="org_rules", name="Rules Store", status="ACTIVE"))
+    db.commit()
+
+    # Per-step spec tolerance is wider than the store threshold, so only the store rule fires
+    spec = {"steps": [{"step": "COOK", "tolerance_pct": 50, "params": {"temp_c": 200}}]}
+    db.add(models.RecipeVersion(id="ver_rules", recipe_id="rec_rules", version_label="v1", spec_json=spec))
+    db.commit()
+
+    item = {
+        "store_id": "store_rules",
+        "recipe_version_id": "ver_rules",
+        "event_type": "STEP",
+        "payload_json": {"step_name": "COOK", "measured": 150}
+    }
+    result = process_execution_log_batch([item], "org_rules", db)
+    assert result["alerts"] == 1
+    alert = db.query(models.Alert).filter(models.Alert.store_id == "store_rules").one()
+    assert alert.severity == "HIGH"
+    assert alert.message == "Rules Store 편차 25.0% - 즉시 점검 필요"
+
+    # Same store, still open: deduped in memory
+    assert process_execution_log_batch([item], "org_rules", db)["alerts"] == 0
+    db.close()
+
+def test_savepoint_release_does_not_open_alerts_before_commit():
+    alert_engine.reset()
+    deviation_aggregator.reset()
+    db = TestingSessionLocal()
+    db.add(models.Store(id="store_sp", org_id="org_rules", name="Savepoint Store", status="ACTIVE"))
+    db.commit()
+
+    # Incident grouping and rollup persistence release savepoints mid-transaction
+    assert alert_engine.evaluate(db, [DeviationReading("store_sp", "org_rules", "SP", 30.0)]) == 1
+    with db.begin_nested():
+        pass
+    db.rollback()
+    assert db.query(models.Alert).filter(models.Alert.store_id == "store_sp").count() == 0
+    assert not alert_engine.is_open(db, "store_sp", "DEVIATION_HIGH")
+
+    assert alert_engine.evaluate(db, [DeviationReading("store_sp", "org_rules", "SP", 30.0)]) == 1
+    with db.begin_nested():
+        pass
+    db.commit()
+    assert alert_engine.is_open(db, "store_sp", "DEVIATION_HIGH")
+    db.close()
+
+def test_each_engine_indexes_its_commits_and_reloads_after_ttl():
+    db = TestingSessionLocal()
+    local = AlertEngine(index_ttl=3600)
+    assert local.evaluate(db, [reading("ttl_1", 30.0)], now=5000.0) == 1
+    db.commit()
+    # Applied to the engine that raised it, not only the module singleton
+    assert local.is_open(db, "ttl_1", "DEVIATION_HIGH")
+    assert local.evaluate(db, [reading("ttl_1", 30.0)], now=5010.0) == 0
+    db.commit()
+
+    # Another replica resolves it: only seen once the index expires
+    db.query(models.Alert).filter(models.Alert.store_id == "ttl_1").update({"is_resolved": 1})
+    db.commit()
+    assert local.is_open(db, "ttl_1", "DEVIATION_HIGH")
+    local.index_ttl = 0
+    assert not local.is_open(db, "ttl_1", "DEVIATION_HIGH")
+    assert local.evaluate(db, [reading("ttl_1", 30.0)], now=5020.0) == 1
+    # Within the transaction the reload is skipped, so the new row is not counted twice
+    assert local.evaluate(db, [reading("ttl_1", 30.0)], now=5030.0) == 0
+    db.commit()
+    assert local._index(db)[("ttl_1", "DEVIATION_HIGH")] == 1
+    db.close()
@@ -0,0 +1,120 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.main import app
+from backend.database import Base, get_db
+from backend.services.alert_engine import AlertEngine, DeviationReading, alert_engine
+from backend.services.alert_grouping import incident_grouper
+from backend.services.llm_reliability import llm_service
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+def test_storm_becomes_one_incident_with_one_analysis(monkeypatch):
+    prompts = []
+    generate = llm_service.safe_generate
+    monkeypatch.setattr(llm_service, "safe_generate", lambda prompt, **kw: prompts.append(prompt) or generate(prompt, **kw))
+
+    storm = AlertEngine()
+    db = TestingSessionLocal()
+    readings = [DeviationReading(f"storm_{i}", "org_storm", f"Store {i}", 30.0, "ver_bad") for i in range(50)]
+    readings.append(DeviationReading("calm_1", "org_storm", "Calm", 18.0, "ver_ok"))
+
+    written = storm.evaluate(db, readings, now=1_700_000_000.0)
+    db.commit()
+
+    # 20 rows for the bad version (rate limit), one for the other version
+    assert written == incident_grouper.max_alerts_per_incident + 1
+    incidents = {i.recipe_version_id: i for i in db.query(models.Incident).all()}
+    bad = incidents["ver_bad"]
+    assert bad.severity == "CRITICAL"
+    assert bad.alert_count == incident_grouper.max_alerts_per_incident
+    assert bad.suppressed_count == 50 - incident_grouper.max_alerts_per_incident
+    assert incidents["ver_ok"].severity == "MEDIUM"
+    assert incidents["ver_ok"].root_cause_analysis is None
+
+    # No LLM call inside the ingest transaction
+    assert prompts == [] and bad.root_cause_analysis is None
+
+    # One LLM call for the whole storm, on its own pass, shared by its critical alerts
+    analyses = incident_grouper.analyze_pending(db)
+    assert list(analyses) == [bad.id]
+    assert len(prompts) == 1 and prompts[0].startswith("50 stores report DEVIATION_HIGH")
+    db.refresh(bad)
+    assert bad.root_cause_analysis == analyses[bad.id]
+    stored = {a.root_cause_analysis for a in db.query(models.Alert).filter(models.Alert.incident_id == bad.id)}
+    assert stored == {bad.root_cause_analysis}
+    assert incident_grouper.analyze_pending(db) == {}
+
+    # Later alerts in the same bucket join the incident without another analysis
+    storm.evaluate(db, [DeviationReading("storm_late", "org_storm", "Late", 40.0, "ver_bad")], now=1_700_000_060.0)
+    db.commit()
+    db.refresh(bad)
+    assert bad.suppressed_count == 31
+    assert incident_grouper.analyze_pending(db) == {}
+    assert len(prompts) == 1
+    db.close()
+
+def test_resolve_incident_resolves_its_alerts():
+    alert_engine.reset()
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        incident = client.get("/v1/alerts/incidents", params={"recipe_version_id": "ver_bad"}).json()[0]
+        assert incident["status"] == "OPEN"
+
+        response = client.post(f"/v1/alerts/incidents/{incident['id']}/resolve")
+        assert response.status_code == 200
+        assert response.json()["alerts_resolved"] == incident["alert_count"]
+
+        resolved = client.get("/v1/alerts/incidents", params={"status": "RESOLVED"}).json()
+        assert [i["id"] for i in resolved] == [incident["id"]]
+    finally:
+        app.dependency_overrides[get_db] = previous
+
+    db = TestingSessionLocal()
+    assert db.query(models.Alert).filter(
+        models.Alert.incident_id == incident["id"], models.Alert.is_resolved == 0
+    ).count() == 0
+    assert not alert_engine.is_open(db, "storm_0", "DEVIATION_HIGH")
+    db.close()
+
+def test_repeated_evaluations_past_the_cap_count_each_store_once(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(llm_service, "safe_generate", lambda prompt, **kw: prompts.append(prompt) or {"content": "ok"})
+
+    engine_ = AlertEngine()
+    db = TestingSessionLocal()
+    cap = incident_grouper.max_alerts_per_incident
+    readings = [DeviationReading(f"cap_{i}", "org_cap", f"Store {i}", 30.0, "ver_cap") for i in range(cap + 5)]
+    for minute in range(10):
+        engine_.evaluate(db, readings, now=1_800_000_000.0 + minute * 60)
+        db.commit()
+
+    incident = db.query(models.Incident).filter(models.Incident.recipe_version_id == "ver_cap").one()
+    assert incident.alert_count == cap
+    assert incident.suppressed_count == 5
+    assert sorted(incident.suppressed_store_ids) == sorted(f"cap_{i}" for i in range(cap, cap + 5))
+
+    incident_grouper.analyze_pending(db)
+    assert len(prompts) == 1 and prompts[0].startswith(f"{cap + 5} stores report")
+    db.close()
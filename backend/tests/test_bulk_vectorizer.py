@@ -0,0 +1,110 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models
+from backend.services.bulk_vectorizer import revectorize_references
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def setup_data(db):
+    for i in range(6):
+        db.add(models.Reference(
+            id=f"ref_{i}",
+            org_id="org1",
+            name=f"Menu {i}",
+            reference_type="BRAND",
+            menu_category="Chicken" if i < 5 else "Burger",
+            source_kind="MARKET",
+            metadata_json={"keywords": ["spicy", "crispy"]} if i % 2 == 0 else None
+        ))
+        db.add(models.ReferenceFingerprint(
+            id=f"fp_{i}",
+            reference_id=f"ref_{i}",
+            version=1,
+            vector=[0.5] * 5
+        ))
+    db.commit()
+
+def test_revectorize_bumps_version_and_resumes():
+    db = TestingSessionLocal()
+    setup_data(db)
+
+    # Sharded across a process pool
+    result = revectorize_references(db, org_id="org1", category="Chicken", max_workers=2, shard_size=2)
+    assert result["version"] == 2
+    assert result["total"] == 5
+    assert result["processed"] == 5
+    assert result["shards"] == 3
+
+    ref = db.query(models.Reference).filter(models.Reference.id == "ref_0").first()
+    assert [fp.version for fp in ref.fingerprints] == [2, 1]
+    assert ref.fingerprints[0].vector == [0.8, 0.5, 0.5, 0.5, 0.8]
+    assert ref.current_fingerprint_id == ref.fingerprints[0].id
+    assert ref.current_vector == [0.8, 0.5, 0.5, 0.5, 0.8]
+    assert ref.process_status == "COMPLETED"
+
+    # Burger reference untouched
+    burger = db.query(models.Reference).filter(models.Reference.id == "ref_5").first()
+    assert len(burger.fingerprints) == 1
+
+    # Re-running the same version skips everything already written
+    resumed = revectorize_references(db, org_id="org1", category="Chicken", version=2, max_workers=1)
+    assert resumed["skipped"] == 5
+    assert resumed["processed"] == 0
+
+    db.close()
+
+def test_interrupted_run_keeps_old_version_current_until_resumed(monkeypatch):
+    from backend.services import bulk_vectorizer
+
+    db = TestingSessionLocal()
+    for i in range(4):
+        db.add(models.Reference(
+            id=f"ref_resume_{i}", org_id="org_resume", name=f"Menu {i}", reference_type="BRAND",
+            menu_category="Chicken", source_kind="MARKET", metadata_json={"keywords": ["spicy"]}
+        ))
+        db.add(models.ReferenceFingerprint(
+            id=f"fp_resume_{i}", reference_id=f"ref_resume_{i}", version=1, vector=[0.5] * 5
+        ))
+    db.commit()
+
+    write_shard = bulk_vectorizer._write_shard
+    calls = []
+
+    def crash_after_first_shard(*args):
+        if calls:
+            raise RuntimeError("worker killed")
+        calls.append(1)
+        return write_shard(*args)
+
+    monkeypatch.setattr(bulk_vectorizer, "_write_shard", crash_after_first_shard)
+    try:
+        revectorize_references(db, org_id="org_resume", max_workers=1, shard_size=2)
+    except RuntimeError:
+        db.rollback()
+    monkeypatch.undo()
+
+    # First shard is checkpointed, but every reference still serves version 1
+    refs = db.query(models.Reference).filter(models.Reference.org_id == "org_resume").all()
+    assert sum(len(ref.fingerprints) == 2 for ref in refs) == 2
+    assert {ref.current_fingerprint_id for ref in refs} == {f"fp_resume_{i}" for i in range(4)}
+    assert {tuple(ref.current_vector) for ref in refs} == {(0.5,) * 5}
+    assert {ref.process_status for ref in refs} == {"QUEUED"}
+
+    resumed = revectorize_references(db, org_id="org_resume", version=2, max_workers=1, shard_size=2)
+    assert resumed["skipped"] == 2 and resumed["processed"] == 2
+    db.expire_all()
+    for ref in db.query(models.Reference).filter(models.Reference.org_id == "org_resume"):
+        assert ref.current_fingerprint_id == ref.fingerprints[0].id and ref.fingerprints[0].version == 2
+        assert ref.process_status == "COMPLETED"
+    db.close()
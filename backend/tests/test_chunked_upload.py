@@ -0,0 +1,118 @@
+import io
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.main import app
+from backend.database import Base, get_db
+from backend.models import Reference
+from backend.services import upload_sessions
+
+# Setup in-memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+from backend.routers import references
+
+@pytest.fixture(autouse=True)
+def in_memory_db(monkeypatch):
+    # Per test, so other modules' overrides neither clobber nor inherit ours
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    # SessionLocal used in background tasks / SSE
+    monkeypatch.setattr(references, "SessionLocal", TestingSessionLocal)
+
+client = TestClient(app)
+
+CSV = (
+    "name,menu_category,keywords\n"
+    "Spicy Wings,Chicken,\"spicy, crispy\"\n"
+    "Honey Wings,Chicken,sweet\n"
+    "Spicy Wings,Chicken,spicy\n"
+    ",Chicken,\n"
+    "Garlic Burger,Burger,savory\n"
+).encode()
+
+def _send(upload_id, index, data):
+    return client.put(
+        f"/v1/references/uploads/{upload_id}/chunks/{index}",
+        files={"chunk": ("blob", io.BytesIO(data), "application/octet-stream")}
+    )
+
+def test_resumable_chunked_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_DIR", str(tmp_path))
+
+    resp = client.post("/v1/references/uploads?filename=catalog.csv&org_id=chunk_org")
+    assert resp.status_code == 200
+    upload_id = resp.json()["id"]
+
+    chunks = [CSV[:40], CSV[40:90], CSV[90:]]
+    assert _send(upload_id, 0, chunks[0]).json()["received_chunks"] == 1
+
+    # Out-of-order chunk is rejected with the expected index
+    resp = _send(upload_id, 2, chunks[2])
+    assert resp.status_code == 409
+    assert "Expected chunk 1" in resp.json()["detail"]
+
+    assert _send(upload_id, 1, chunks[1]).json()["received_chunks"] == 2
+    # Client lost the ack and re-sends chunk 1: ignored, nothing duplicated
+    resp = _send(upload_id, 1, chunks[1])
+    assert resp.json()["received_bytes"] == 90
+
+    # Resume from the server's acknowledged position
+    next_chunk = client.get(f"/v1/references/uploads/{upload_id}").json()["received_chunks"]
+    assert next_chunk == 2
+    assert _send(upload_id, 2, chunks[2]).json()["received_bytes"] == len(CSV)
+
+    resp = client.post(f"/v1/references/uploads/{upload_id}/complete")
+    assert resp.status_code == 200
+
+    # Background task has run; progress stream ends with a complete event
+    with client.stream("GET", f"/v1/references/uploads/{upload_id}/events") as stream:
+        events = [json.loads(line[len("data: "):]) for line in stream.iter_lines() if line.startswith("data: ")]
+    final = events[-1]
+    assert final["type"] == "complete"
+    assert final["rows_parsed"] == 5
+    assert final["rows_inserted"] == 3
+    assert final["rows_deduped"] == 1
+    assert final["rows_vectorized"] == 3
+
+    db = TestingSessionLocal()
+    refs = db.query(Reference).filter(Reference.org_id == "chunk_org").all()
+    assert sorted(r.name for r in refs) == ["Garlic Burger", "Honey Wings", "Spicy Wings"]
+    wings = next(r for r in refs if r.name == "Spicy Wings")
+    assert wings.process_status == "COMPLETED"
+    assert wings.current_vector == [0.8, 0.5, 0.5, 0.5, 0.8]
+    db.close()
+
+    # Spool file cleaned up after processing
+    assert list(tmp_path.iterdir()) == []
+
+def test_progress_stream_of_abandoned_upload_keeps_alive_then_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_sessions, "UPLOAD_DIR", str(tmp_path))
+    upload_id = client.post("/v1/references/uploads?filename=stale.csv&org_id=chunk_org").json()["id"]
+
+    events = list(upload_sessions.upload_progress_events(
+        upload_id, TestingSessionLocal, poll_interval=0.01, timeout=0.1, keepalive=0.02
+    ))
+    assert events[0].startswith("data: ") and json.loads(events[0][len("data: "):])["type"] == "progress"
+    assert ": keep-alive\n\n" in events
+    final = json.loads(events[-1][len("data: "):])
+    assert final["type"] == "error" and final["status"] == "RECEIVING"
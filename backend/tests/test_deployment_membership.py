@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models, schemas
+from backend.database import Base
+from backend.services import deployment_service
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def count_statements(fn):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(statements)
+
+def make_fleet(db, org_id: str, n: int):
+    for label in ("old_a", "old_b", "new"):
+        db.add(models.RecipeVersion(
+            id=f"{org_id}_{label}", recipe_id="rec_fleet", version_label=label,
+            approval_status=schemas.VersionApprovalStatus.APPROVED.value
+        ))
+    for i in range(n):
+        db.add(models.Store(
+            id=f"{org_id}_s{i}", org_id=org_id, name=f"S{i}", status="ACTIVE",
+            region="SEOUL" if i % 2 == 0 else "BUSAN",
+            active_recipe_version_id=[f"{org_id}_old_a", f"{org_id}_old_b", None][i % 3]
+        ))
+    db.commit()
+
+def deploy(db, org_id: str, **kwargs):
+    return deployment_service.create_deployment(
+        db, schemas.DeploymentCreate(recipe_version_id=f"{org_id}_new", **kwargs), org_id
+    )
+
+def test_rollback_restores_exact_previous_versions():
+    db = TestingSessionLocal()
+    make_fleet(db, "org_m", 6)
+    before = {s.id: s.active_recipe_version_id for s in db.query(models.Store).filter(models.Store.org_id == "org_m")}
+
+    deployment = deploy(db, "org_m", scope="SELECTED_STORES", target_group_json={"region": "SEOUL"})
+    assert deployment.status == "DEPLOYED"
+    members = db.query(models.DeploymentMembership).filter(models.DeploymentMembership.deployment_id == deployment.id).all()
+    assert {m.store_id: m.previous_version_id for m in members} == {
+        sid: v for sid, v in before.items() if int(sid.rsplit("s", 1)[1]) % 2 == 0
+    }
+
+    # A store that moved on since the deployment is left alone
+    db.query(models.Store).filter(models.Store.id == "org_m_s4").update({"active_recipe_version_id": "org_m_old_b"})
+    db.commit()
+
+    assert deployment_service.revert_stores(db, [deployment.id]) == 2
+    db.commit()
+    after = {s.id: s.active_recipe_version_id for s in db.query(models.Store).filter(models.Store.org_id == "org_m")}
+    assert after == {**before, "org_m_s4": "org_m_old_b"}
+    assert all(m.reverted_at is not None for m in db.query(models.DeploymentMembership))
+    db.close()
+
+def test_scheduled_deployment_applies_when_due():
+    db = TestingSessionLocal()
+    make_fleet(db, "org_due", 3)
+    later = datetime.now(timezone.utc) + timedelta(hours=1)
+    deployment = deploy(db, "org_due", scope="ALL_STORES", scheduled_at=later)
+    assert deployment.status == "SCHEDULED"
+
+    assert deployment_service.apply_due_deployments(db) == []
+    assert deployment_service.apply_due_deployments(db, now=later + timedelta(seconds=1)) == [deployment.id]
+    assert db.query(models.Store).filter(
+        models.Store.org_id == "org_due", models.Store.active_recipe_version_id == "org_due_new"
+    ).count() == 3
+    db.close()
+
+def test_apply_and_rollback_cost_is_independent_of_fleet_size():
+    def cost(org_id, n):
+        db = TestingSessionLocal()
+        make_fleet(db, org_id, n)
+        deployment = models.Deployment(
+            org_id=org_id, recipe_version_id=f"{org_id}_new", scope="ALL_STORES", status="SCHEDULED"
+        )
+        db.add(deployment)
+        db.commit()
+        applied = count_statements(lambda: deployment_service.apply_deployment(db, deployment))
+        db.commit()
+        reverted = count_statements(lambda: deployment_service.revert_stores(db, [deployment.id]))
+        db.commit()
+        db.close()
+        return applied, reverted
+
+    assert cost("org_small", 3) == cost("org_large", 60)
@@ -0,0 +1,90 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models
+from backend.services.deviation_aggregator import DeviationAggregator, STORE, RECIPE_VERSION
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def test_rolling_windows_and_ewma():
+    agg = DeviationAggregator(windows={"1m": 60, "1h": 3600}, alpha=0.5, primary_window="1m")
+    now = 1_000_000.0
+    for i in range(100):
+        agg.observe("store_a", "ver_1", float(i + 1), now=now + i * 0.1)
+
+    snap = agg.snapshot(STORE, "store_a", now=now + 10)
+    assert snap["windows"]["1m"]["count"] == 100
+    assert snap["windows"]["1m"]["mean"] == 50.5
+    assert 94.0 <= snap["windows"]["1m"]["p95"] <= 96.0
+    assert snap["ewma"] > 90.0
+    assert agg.snapshot(RECIPE_VERSION, "ver_1", now=now + 10)["windows"]["1h"]["count"] == 100
+
+    # Two minutes later the 1m window has aged out, the 1h window has not
+    agg.observe("store_a", "ver_1", 10.0, now=now + 130)
+    snap = agg.snapshot(STORE, "store_a", now=now + 130)
+    assert snap["windows"]["1m"]["count"] == 1
+    assert snap["windows"]["1m"]["mean"] == 10.0
+    assert snap["windows"]["1h"]["count"] == 101
+    assert agg.rolling_mean(STORE, "store_a", now=now + 130) == 10.0
+    assert agg.snapshot(STORE, "unknown") is None
+
+def test_persist_is_periodic_and_upserts():
+    agg = DeviationAggregator(windows={"1h": 3600}, persist_interval=30)
+    db = TestingSessionLocal()
+    now = 2_000_000.0
+
+    agg.observe("store_b", "ver_2", 20.0, now=now)
+    assert agg.maybe_persist(db, now=now) == 2
+    db.commit()
+
+    # Within the interval nothing is written
+    agg.observe("store_b", "ver_2", 40.0, now=now + 1)
+    assert agg.maybe_persist(db, now=now + 1) == 0
+
+    assert agg.maybe_persist(db, now=now + 31) == 2
+    db.commit()
+
+    rollups = db.query(models.DeviationRollup).filter(models.DeviationRollup.scope == "STORE").all()
+    assert len(rollups) == 1
+    assert rollups[0].scope_id == "store_b"
+    assert rollups[0].sample_count == 2
+    assert float(rollups[0].mean_deviation) == 30.0
+    db.close()
+
+def test_rehydrate_restores_persisted_series():
+    db = TestingSessionLocal()
+    now = 3_000_000.0
+    before = DeviationAggregator(windows={"1m": 60, "1h": 3600}, primary_window="1m")
+    for i in range(100):
+        before.observe("store_c", None, float(i + 1), now=now + i * 0.1)
+    before.maybe_persist(db, force=True, now=now + 10)
+    db.commit()
+    expected = before.snapshot(STORE, "store_c", now=now + 10)
+
+    # A fresh process two minutes later: the 1m window has aged out, the 1h window has not
+    after = DeviationAggregator(windows={"1m": 60, "1h": 3600}, primary_window="1m")
+    after.observe("store_live", None, 5.0, now=now + 130)
+    assert after.rehydrate(db, now=now + 130) >= 1
+    snap = after.snapshot(STORE, "store_c", now=now + 130)
+    assert snap["ewma"] == round(expected["ewma"], 2)
+    assert snap["windows"]["1m"]["count"] == 0
+    assert snap["windows"]["1h"]["count"] == 100
+    assert snap["windows"]["1h"]["mean"] == 50.5
+    assert abs(snap["windows"]["1h"]["p95"] - expected["windows"]["1h"]["p95"]) <= 0.5
+    # Series already observed in this process are left alone
+    assert after.snapshot(STORE, "store_live", now=now + 130)["windows"]["1h"]["count"] == 1
+
+    # New events add to the restored window
+    after.observe("store_c", None, 151.5, now=now + 131)
+    assert after.snapshot(STORE, "store_c", now=now + 131)["windows"]["1h"]["mean"] == 51.5
+    db.close()
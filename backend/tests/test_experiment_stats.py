@@ -0,0 +1,177 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.main import app
+from backend.database import Base, get_db
+from backend.services.experiment_service import experiment_service
+from backend.services.experiment_stats import (
+    STEP_DEVIATION, Observation, RunningStats, cuped_test, experiment_stats, msprt, t_two_sided_p, welch_test
+)
+from backend.services.log_processor import process_execution_log_batch
+from backend.services.trend_analysis import trend_service
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
+def running(ys, xs=None) -> RunningStats:
+    xs = xs if xs is not None else [0.0] * len(ys)
+    return RunningStats(
+        len(ys), sum(ys), sum(y * y for y in ys), sum(xs), sum(x * x for x in xs), sum(x * y for x, y in zip(xs, ys))
+    )
+
+def test_welch_matches_reference_values():
+    # t = 2 with 10 degrees of freedom: two-sided p = 0.0734
+    assert abs(t_two_sided_p(2.0, 10) - 0.07339) < 1e-4
+    assert abs(t_two_sided_p(1.96, 1e6) - 0.05) < 1e-3
+
+    a = [4.1, 5.0, 3.8, 4.6, 5.2, 4.4]
+    b = [5.9, 6.3, 5.1, 6.8, 6.0, 5.7, 6.4]
+    result = welch_test(running(a), running(b))
+    se = np.sqrt(np.var(a, ddof=1) / len(a) + np.var(b, ddof=1) / len(b))
+    assert abs(result["diff"] - (np.mean(b) - np.mean(a))) < 1e-9
+    assert abs(result["se"] - se) < 1e-9
+    assert result["p_value"] < 0.001
+
+def test_cuped_reduces_variance_with_predictive_baseline():
+    rng = random.Random(7)
+    xs_a = [rng.gauss(10, 3) for _ in range(200)]
+    xs_b = [rng.gauss(10, 3) for _ in range(200)]
+    ys_a = [x + rng.gauss(0, 0.5) for x in xs_a]
+    ys_b = [x + 0.3 + rng.gauss(0, 0.5) for x in xs_b]
+
+    welch = welch_test(running(ys_a, xs_a), running(ys_b, xs_b))
+    cuped = cuped_test(running(ys_a, xs_a), running(ys_b, xs_b))
+    assert cuped["variance_reduction"] > 0.9
+    assert cuped["se"] < welch["se"] / 3
+    assert abs(cuped["diff"] - 0.3) < 0.15
+    assert cuped["p_value"] < welch["p_value"]
+
+    # Sequential boundary: a large effect stops, a null one continues
+    assert msprt(cuped["diff"], cuped["se"], tau=1.0, alpha=0.05)["decision"] == "STOP"
+    assert msprt(0.0, cuped["se"], tau=1.0, alpha=0.05)["decision"] == "CONTINUE"
+
+def test_ingested_observations_update_running_results():
+    db = TestingSessionLocal()
+    db.add(models.Organization(id="org_ab", name="AB Org"))
+    spec = {"steps": [{"step": "COOK", "tolerance_pct": 50, "params": {"temp_c": 200}}]}
+    db.add(models.RecipeVersion(id="ab_control", recipe_id="rec_ab", version_label="A", spec_json=spec))
+    db.add(models.RecipeVersion(id="ab_test", recipe_id="rec_ab", version_label="B", spec_json=spec))
+    for i in range(8):
+        db.add(models.Store(id=f"ab_s{i}", org_id="org_ab", name=f"AB {i}", status="ACTIVE", region="Seoul"))
+    db.add(models.Experiment(
+        id="exp_ab", org_id="org_ab", name="AB", control_version_id="ab_control", test_version_id="ab_test"
+    ))
+    db.commit()
+    # Pre-experiment baseline for one store
+    db.add(models.StoreDailyMetric(
+        store_id="ab_s0", date=datetime.now(timezone.utc) - timedelta(days=3), avg_deviation=7.5, total_sales=900
+    ))
+    db.commit()
+
+    assert experiment_service.assign_stores(db, "exp_ab")["assigned_stores"] == 8
+    units = {u.store_id: u for u in db.query(models.ExperimentUnit).filter(models.ExperimentUnit.experiment_id == "exp_ab")}
+    assert units["ab_s0"].baseline_deviation == 7.5
+    assert units["ab_s0"].baseline_sales == 900
+
+    stores = db.query(models.Store).filter(models.Store.org_id == "org_ab").all()
+    items = []
+    for store in stores:
+        measured = 210 if store.experiment_group == "TEST" else 202
+        for _ in range(5):
+            items.append({
+                "store_id": store.id,
+                "recipe_version_id": store.active_recipe_version_id,
+                "event_type": "STEP",
+                "payload_json": {"step_name": "COOK", "measured": measured + random.uniform(-1, 1)}
+            })
+    # Logs on a version outside the store's group are ignored
+    items.append({
+        "store_id": stores[0].id, "recipe_version_id": "ab_test" if stores[0].experiment_group == "CONTROL" else "ab_control",
+        "event_type": "STEP", "payload_json": {"step_name": "COOK", "measured": 300}
+    })
+    process_execution_log_batch(items, "org_ab", db)
+    trend_service.record_daily_metric(db, "ab_s1", 3.0, 1200.0, datetime.now(timezone.utc))
+
+    previous = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        response = client.get("/v1/experiments/exp_ab/results")
+        missing = client.get("/v1/experiments/nope/results")
+    finally:
+        app.dependency_overrides[get_db] = previous
+    assert response.status_code == 200
+    assert missing.status_code == 404
+
+    metrics = response.json()["metrics"]
+    step = metrics["step_deviation"]
+    # One unit per store: 5 readings each are averaged, not counted as 5 samples
+    assert step["control"]["n"] == 4 and step["test"]["n"] == 4
+    assert abs(step["control"]["mean"] - 1.0) < 0.6
+    assert abs(step["test"]["mean"] - 5.0) < 0.6
+    assert step["welch"]["diff"] > 3 and step["welch"]["p_value"] < 0.001
+    assert step["sequential"]["decision"] == "STOP"
+
+    daily = metrics["daily_sales"]
+    assert daily["control"]["n"] + daily["test"]["n"] == 1
+    assert daily["welch"] is None
+    db.close()
+
+def test_repeated_readings_from_one_store_do_not_inflate_the_sample():
+    db = TestingSessionLocal()
+    db.add(models.Organization(id="org_unit", name="Unit Org"))
+    db.add(models.RecipeVersion(id="unit_control", recipe_id="rec_unit", version_label="A"))
+    db.add(models.RecipeVersion(id="unit_test", recipe_id="rec_unit", version_label="B"))
+    for i in range(6):
+        db.add(models.Store(id=f"unit_s{i}", org_id="org_unit", name=f"Unit {i}", status="ACTIVE", region="Seoul"))
+    db.add(models.Experiment(
+        id="exp_unit", org_id="org_unit", name="Units", control_version_id="unit_control", test_version_id="unit_test"
+    ))
+    db.commit()
+    experiment_service.assign_stores(db, "exp_unit")
+    groups = {s.id: s.experiment_group for s in db.query(models.Store).filter(models.Store.org_id == "org_unit")}
+    busy = next(store_id for store_id, group in groups.items() if group == "TEST")
+
+    # Same per-store means, but one test store reports 200 times in two batches
+    observations = []
+    for store_id, group in groups.items():
+        value = 6.0 if group == "TEST" else 5.0
+        value += 0.5 if store_id.endswith(("0", "1")) else -0.5
+        repeats = 100 if store_id == busy else 1
+        observations += [Observation(store_id, STEP_DEVIATION, value)] * repeats
+    assert experiment_stats.observe(db, observations) == len(observations)
+    experiment_stats.observe(db, [o for o in observations if o.store_id == busy])
+    db.commit()
+
+    step = experiment_stats.results(db, "exp_unit")[STEP_DEVIATION]
+    assert step["control"]["n"] + step["test"]["n"] == 6
+    unit = db.query(models.ExperimentUnit).filter(models.ExperimentUnit.store_id == busy).one()
+    assert unit.step_deviation_n == 200
+    # The busy store's mean counts once, so the test stays unconvinced at n=3 per group
+    assert abs(step["test"]["mean"] - np.mean([
+        6.0 + (0.5 if s.endswith(("0", "1")) else -0.5) for s, g in groups.items() if g == "TEST"
+    ])) < 1e-9
+    assert step["welch"]["p_value"] > 0.01
+    db.close()
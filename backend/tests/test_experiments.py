@@ -1,5 +1,5 @@
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 import pytest
@@ -7,6 +7,7 @@ import pytest
 from backend.main import app
 from backend.database import Base, get_db
 from backend.models import Organization, Store, RecipeVersion, Experiment
+from backend.services.experiment_service import experiment_service
 
 # Setup in-memory DB
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -84,3 +85,52 @@ def test_create_and_assign_experiment():
             assert s.active_recipe_version_id == "v2"
         elif s.experiment_group == "CONTROL":
             assert s.active_recipe_version_id == "v1"
+
+def test_assignment_filters_by_criteria_and_is_stratified():
+    db = TestingSessionLocal()
+    db.add(Organization(id="org_strat", name="Strat Org"))
+    for i in range(60):
+        db.add(Store(
+            id=f"strat_{i}", org_id="org_strat", name=f"Strat {i}",
+            region=["Seoul", "Busan", "Jeju"][i % 3],
+            sales_tier=["HIGH", "LOW"][i % 2],
+            status="INACTIVE" if i % 10 == 9 else "ACTIVE"
+        ))
+    experiment = Experiment(
+        id="exp_strat", org_id="org_strat", name="Strat", control_version_id="v1", test_version_id="v2",
+        target_criteria_json={"region": ["Seoul", "Busan"], "stratify_by": ["region", "sales_tier"]}
+    )
+    db.add(experiment)
+    db.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = experiment_service.assign_stores(db, "exp_strat")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert sum(1 for s in statements if s.lstrip().upper().startswith("UPDATE STORES")) == 1
+
+    # Seoul/Busan ACTIVE stores only: 40 in region, 4 of them inactive
+    assert result["assigned_stores"] == 36
+    assert result["strata"] == 4
+    assert result["test_stores"] == 18
+
+    stores = db.query(Store).filter(Store.org_id == "org_strat").all()
+    assert all(s.experiment_group is None for s in stores if s.region == "Jeju" or s.status == "INACTIVE")
+    per_stratum = {}
+    for s in stores:
+        if s.experiment_group:
+            per_stratum.setdefault((s.region, s.sales_tier), []).append(s.experiment_group)
+    for groups in per_stratum.values():
+        assert abs(groups.count("TEST") - groups.count("CONTROL")) <= 1
+
+    # Reassigning gives the same split
+    first = {s.id: s.experiment_group for s in stores}
+    db.execute(Store.__table__.update().values(experiment_group=None))
+    db.commit()
+    experiment_service.assign_stores(db, "exp_strat")
+    db.expire_all()
+    assert {s.id: s.experiment_group for s in db.query(Store).filter(Store.org_id == "org_strat")} == first
+    db.close()
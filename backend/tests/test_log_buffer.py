@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models, schemas
+from backend.services.log_buffer import ExecutionLogBuffer
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def make_log(measured: float) -> schemas.ExecutionLogCreate:
+    return schemas.ExecutionLogCreate(
+        store_id="store_buffer",
+        recipe_version_id="ver_1",
+        event_type=schemas.ExecutionLogType.STEP,
+        payload_json={"step_name": "Frying", "measured": measured, "target": 100.0}
+    )
+
+def test_buffer_flushes_and_drains_on_stop():
+    async def scenario():
+        buffer = ExecutionLogBuffer(TestingSessionLocal, max_size=1000, flush_size=10, flush_interval=0.05)
+        await buffer.start()
+        ids = [buffer.submit(make_log(100.0 + i), "demo_org") for i in range(25)]
+        await buffer.stop()
+        return buffer, ids
+
+    buffer, ids = asyncio.run(scenario())
+
+    db = TestingSessionLocal()
+    stored = {log.id for log in db.query(models.ExecutionLog).all()}
+    assert stored == set(ids)
+    # 11..24 measured against 100 are over the 10% threshold
+    assert db.query(models.Alert).count() == 14
+    db.close()
+
+    metrics = buffer.metrics()
+    assert metrics["flushed"] == 25
+    assert metrics["flushes"] == 3
+    assert metrics["queue_depth"] == 0
+    assert not metrics["running"]
+
+def test_buffer_backpressure():
+    async def scenario():
+        buffer = ExecutionLogBuffer(TestingSessionLocal, max_size=2, flush_size=10, flush_interval=0.05)
+        await buffer.start()
+        buffer.submit(make_log(100.0), "demo_org")
+        buffer.submit(make_log(100.0), "demo_org")
+        with pytest.raises(HTTPException) as exc:
+            buffer.submit(make_log(100.0), "demo_org")
+        await buffer.stop()
+        return buffer, exc.value
+
+    buffer, error = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert buffer.metrics()["rejected"] == 1
+    assert buffer.metrics()["flushed"] == 2
+
+def test_failed_flush_is_retried_then_spilled_and_replayed(tmp_path, monkeypatch):
+    from backend.services import log_buffer as log_buffer_module
+
+    attempts = []
+    write = log_buffer_module.write_execution_logs
+    def flaky(batch, db):
+        attempts.append(len(batch))
+        if len(attempts) <= 2:
+            raise RuntimeError("database is locked")
+        return write(batch, db)
+    monkeypatch.setattr(log_buffer_module, "write_execution_logs", flaky)
+
+    async def retried():
+        buffer = ExecutionLogBuffer(TestingSessionLocal, flush_size=10, flush_interval=0.05,
+                                    retries=2, retry_backoff=0.001, spill_dir=str(tmp_path))
+        await buffer.start()
+        ids = [buffer.submit(make_log(100.0), "org_retry") for _ in range(3)]
+        await buffer.stop()
+        return buffer, ids
+
+    buffer, ids = asyncio.run(retried())
+    assert buffer.metrics()["retried"] == 2 and buffer.metrics()["flushed"] == 3
+    db = TestingSessionLocal()
+    assert {log.id for log in db.query(models.ExecutionLog).filter(models.ExecutionLog.org_id == "org_retry")} == set(ids)
+    db.close()
+
+    # Database down for every attempt: the acknowledged logs go to disk, not away
+    monkeypatch.setattr(log_buffer_module, "write_execution_logs", lambda batch, db: 1 / 0)
+    async def down():
+        buffer = ExecutionLogBuffer(TestingSessionLocal, flush_size=10, flush_interval=0.05,
+                                    retries=1, retry_backoff=0.001, spill_dir=str(tmp_path))
+        await buffer.start()
+        ids = [buffer.submit(make_log(150.0), "org_spill") for _ in range(4)]
+        await buffer.stop()
+        return buffer, ids
+
+    buffer, spilled_ids = asyncio.run(down())
+    assert buffer.metrics()["spilled"] == 4 and buffer.metrics()["failed"] == 0
+    assert len(list(tmp_path.glob("*.ndjson"))) == 1
+
+    # Next start writes them back with their original ids
+    monkeypatch.setattr(log_buffer_module, "write_execution_logs", write)
+    async def recovered():
+        buffer = ExecutionLogBuffer(TestingSessionLocal, flush_size=10, flush_interval=0.05, spill_dir=str(tmp_path))
+        await buffer.start()
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(recovered())
+    assert buffer.metrics()["replayed"] == 4
+    assert list(tmp_path.glob("*.ndjson")) == []
+    db = TestingSessionLocal()
+    assert {log.id for log in db.query(models.ExecutionLog).filter(models.ExecutionLog.org_id == "org_spill")} == set(spilled_ids)
+    db.close()
+
+def test_unreplayable_spill_files_are_moved_aside(tmp_path, monkeypatch):
+    from backend.services import log_buffer as log_buffer_module
+
+    buffer = ExecutionLogBuffer(TestingSessionLocal, spill_dir=str(tmp_path), replay_attempts=3)
+    (tmp_path / "1-corrupt.ndjson").write_text('{"id": "x", "org_id": "o", "log": {trunc')
+    buffer._spill([(models.generate_uuid(), "org_poison", make_log(120.0))])
+    poison = next(p for p in tmp_path.glob("*.ndjson") if "corrupt" not in p.name)
+
+    # A row the database keeps rejecting
+    monkeypatch.setattr(log_buffer_module, "write_execution_logs", lambda batch, db: 1 / 0)
+    assert buffer.replay_spilled() == 0
+    # Unparseable: moved aside at once; the poison file stays for another try
+    assert (tmp_path / "1-corrupt.ndjson.bad").exists()
+    assert poison.exists() and buffer._spill_pending
+
+    buffer.replay_spilled()
+    buffer.replay_spilled()
+    assert list(tmp_path.glob("*.ndjson")) == []
+    assert len(list(tmp_path.glob("*.bad"))) == 2
+    assert buffer.metrics()["quarantined"] == 2 and not buffer._spill_pending
@@ -0,0 +1,84 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend.services.log_bus import log_bus
+from backend.services.log_processor import process_execution_log_batch
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def step(store_id: str, measured: float) -> dict:
+    return {
+        "store_id": store_id,
+        "recipe_version_id": "ver_1",
+        "event_type": "STEP",
+        "payload_json": {"step_name": "Frying", "measured": measured, "target": 100.0}
+    }
+
+def ingest(items):
+    db = TestingSessionLocal()
+    try:
+        return process_execution_log_batch(items, "demo_org", db)
+    finally:
+        db.close()
+
+def test_filtered_subscribers_receive_committed_logs():
+    async def scenario():
+        everything = log_bus.subscribe(org_id="demo_org")
+        deviating = log_bus.subscribe(store_id="store_tail", min_deviation=20.0)
+        try:
+            # Published from a worker thread, like a sync endpoint
+            await asyncio.to_thread(ingest, [step("store_tail", 105.0), step("store_tail", 130.0), step("store_other", 150.0)])
+            await asyncio.sleep(0)
+            return [everything.queue.get_nowait() for _ in range(everything.queue.qsize())], \
+                [deviating.queue.get_nowait() for _ in range(deviating.queue.qsize())]
+        finally:
+            log_bus.unsubscribe(everything)
+            log_bus.unsubscribe(deviating)
+
+    everything, deviating = asyncio.run(scenario())
+    assert len(everything) == 3
+    assert [round(e["deviation_pct"], 1) for e in deviating] == [30.0]
+    assert deviating[0]["store_id"] == "store_tail"
+    assert not log_bus.has_subscribers
+
+def test_slow_subscriber_drops_oldest_and_rollback_publishes_nothing():
+    async def scenario():
+        sub = log_bus.subscribe(store_id="store_slow")
+        sub.queue = asyncio.Queue(maxsize=2)
+        try:
+            await asyncio.to_thread(ingest, [step("store_slow", 100.0 + i) for i in range(5)])
+
+            # Rolled back work never reaches subscribers
+            db = TestingSessionLocal()
+            db.execute(text("SELECT 1"))
+            log_bus.stage(db, [{"store_id": "store_slow", "event_type": "STEP"}])
+            db.rollback()
+            db.commit()
+            # ... including when a savepoint was released before the rollback
+            db.execute(text("SELECT 1"))
+            log_bus.stage(db, [{"store_id": "store_slow", "event_type": "STEP"}])
+            with db.begin_nested():
+                pass
+            db.rollback()
+            db.close()
+
+            await asyncio.sleep(0)
+            return sub.dropped, [sub.queue.get_nowait()["payload_json"]["measured"] for _ in range(sub.queue.qsize())]
+        finally:
+            log_bus.unsubscribe(sub)
+
+    dropped, measured = asyncio.run(scenario())
+    assert dropped == 3
+    assert measured == [103.0, 104.0]
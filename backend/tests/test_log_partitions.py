@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models
+from backend.services import log_archive
+from backend.services.log_partitions import run_log_maintenance
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def add_step(db, day: int, measured: float, store_id: str = "store_part"):
+    db.add(models.ExecutionLog(
+        org_id="demo_org",
+        store_id=store_id,
+        recipe_version_id="ver_1",
+        ts=datetime(2026, 3, day, 12, 0, tzinfo=timezone.utc),
+        event_type="STEP",
+        payload_json={"step_name": "Frying", "measured": measured, "target": 100.0}
+    ))
+
+def test_partition_key_follows_timestamp():
+    db = TestingSessionLocal()
+    add_step(db, 1, 100.0, store_id="store_key")
+    db.commit()
+    log = db.query(models.ExecutionLog).filter(models.ExecutionLog.store_id == "store_key").first()
+    assert log.partition_day == "2026-03-01"
+    db.delete(log)
+    db.commit()
+    db.close()
+
+def test_compaction_and_retention(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, "ARCHIVE_DIR", str(tmp_path))
+    db = TestingSessionLocal()
+    add_step(db, 1, 110.0)
+    add_step(db, 1, 130.0)
+    add_step(db, 20, 105.0)
+    add_step(db, 25, 150.0)  # Still open ("today")
+    db.commit()
+
+    result = run_log_maintenance(db, retention_days=10, today="2026-03-25")
+    assert sorted(result["registered"]) == ["2026-03-01", "2026-03-20"]
+    assert [c["day"] for c in result["compacted"]] == ["2026-03-01", "2026-03-20"]
+    assert [a["day"] for a in result["archived"]] == ["2026-03-01", "2026-03-20"]
+    assert result["dropped"] == ["2026-03-01"]
+
+    metric = db.query(models.StoreDailyMetric).filter(
+        models.StoreDailyMetric.date == datetime(2026, 3, 1)
+    ).first()
+    assert float(metric.avg_deviation) == 20.0
+    assert metric.step_count == 2
+
+    days = {log.partition_day for log in db.query(models.ExecutionLog).all()}
+    assert days == {"2026-03-20", "2026-03-25"}
+
+    statuses = {p.day: p.status for p in db.query(models.LogPartition).all()}
+    assert statuses == {"2026-03-01": "DROPPED", "2026-03-20": "COMPACTED"}
+
+    # Re-running is a no-op
+    again = run_log_maintenance(db, retention_days=10, today="2026-03-25")
+    assert again["compacted"] == [] and again["archived"] == [] and again["dropped"] == []
+    db.close()
+
+def test_retention_keeps_unarchived_partitions(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, "ARCHIVE_DIR", str(tmp_path))
+    db = TestingSessionLocal()
+    add_step(db, 2, 120.0, store_id="store_keep")
+    db.commit()
+
+    # Archive write fails: the day is compacted but its raw rows must stay
+    def fail(db, day):
+        raise OSError("disk full")
+    monkeypatch.setattr(log_archive, "archive_partition", fail)
+    result = run_log_maintenance(db, retention_days=5, today="2026-03-25")
+    assert result["archived"] == [] and "2026-03-02" not in result["dropped"]
+    assert db.query(models.ExecutionLog).filter(models.ExecutionLog.store_id == "store_keep").count() == 1
+    monkeypatch.undo()
+
+    # Next pass archives it, then retention drops it
+    monkeypatch.setattr(log_archive, "ARCHIVE_DIR", str(tmp_path))
+    result = run_log_maintenance(db, retention_days=5, today="2026-03-25")
+    assert [a["day"] for a in result["archived"]] == ["2026-03-02"]
+    assert result["dropped"] == ["2026-03-02"]
+    assert db.query(models.ExecutionLog).filter(models.ExecutionLog.store_id == "store_keep").count() == 0
+    db.close()
+
+def test_archive_analytics(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, "ARCHIVE_DIR", str(tmp_path))
+    db = TestingSessionLocal()
+    db.add(models.Store(id="store_seoul", org_id="demo_org", name="Seoul", region="Seoul"))
+    db.add(models.Store(id="store_busan", org_id="demo_org", name="Busan", region="Busan"))
+    for store_id, measured in (("store_seoul", 110.0), ("store_seoul", 130.0), ("store_busan", 102.0)):
+        add_step(db, 10, measured, store_id=store_id)
+    db.add(models.ExecutionLog(
+        org_id="demo_org", store_id="store_busan", recipe_version_id="ver_1", event_type="END",
+        ts=datetime(2026, 3, 10, 13, 0, tzinfo=timezone.utc)
+    ))
+    db.commit()
+
+    run_log_maintenance(db, retention_days=30, today="2026-03-11")
+    db.close()
+
+    result = log_archive.query_archive(["region", "step_name"], since="2026-03-10", until="2026-03-11")
+    assert result["rows_matched"] == 3
+    assert result["groups"][0] == {
+        "region": "Seoul", "step_name": "Frying", "count": 2,
+        "mean": 20.0, "min": 10.0, "max": 30.0, "stddev": 10.0
+    }
+    assert result["groups"][1]["region"] == "Busan"
+
+    # Partition pruning: no archived day in range
+    assert log_archive.query_archive(["region"], since="2026-04-01")["groups"] == []
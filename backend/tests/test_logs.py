@@ -3,9 +3,15 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from datetime import datetime
 
-from backend.database import Base
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.database import Base, get_db
 from backend import models, schemas
-from backend.services.log_processor import process_execution_log
+from backend.services.log_processor import process_execution_log, process_execution_log_batch
 
 # Setup In-Memory DB
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -17,6 +23,15 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+client = TestClient(app)
+
 def test_log_ingestion_and_alert():
     db = TestingSessionLocal()
     
@@ -67,9 +82,67 @@ def test_log_ingestion_and_alert():
     
     # Verify Store Deviation Updated
     db.refresh(store)
-    # The naive logic updates store.deviation to the latest high deviation
+    # Store deviation is the rolling mean of every measured step (5% and 50%)
     assert store.deviation is not None
     float_deviation = float(store.deviation)
-    assert float_deviation >= 50.0
+    assert float_deviation == 27.5
     
     db.close()
+
+def test_batch_ingestion_per_item_status():
+    db = TestingSessionLocal()
+    db.add(models.Store(id="store_batch", org_id="demo_org", name="Batch Branch"))
+    db.commit()
+
+    def step(measured, target=100.0):
+        return {
+            "store_id": "store_batch",
+            "recipe_version_id": "ver_1",
+            "event_type": "STEP",
+            "payload_json": {"step_name": "Frying", "measured": measured, "target": target}
+        }
+
+    items = [
+        step(105.0),                                # 5%: no alert
+        step(130.0),                                # 30%: alert
+        {"store_id": "store_batch"},                # missing fields
+        step(50.0, target=0),                       # zero target is ignored
+        {"store_id": "store_batch", "recipe_version_id": "ver_1", "event_type": "END"},
+        step(120.0),                                # 20%: alert, latest for the store
+    ]
+    result = process_execution_log_batch(items, "demo_org", db)
+
+    assert result["accepted"] == 5
+    assert result["rejected"] == 1
+    assert result["alerts"] == 2
+    assert [item["status"] for item in result["items"]] == [
+        "accepted", "accepted", "rejected", "accepted", "accepted", "accepted"
+    ]
+    assert db.query(models.ExecutionLog).filter(models.ExecutionLog.store_id == "store_batch").count() == 5
+
+    store = db.query(models.Store).filter(models.Store.id == "store_batch").first()
+    assert float(store.deviation) == 18.33
+    db.close()
+
+@pytest.fixture
+def api_db(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+def test_batch_endpoint_accepts_ndjson(api_db):
+    body = "\n".join([
+        json.dumps({"store_id": "store_ndjson", "recipe_version_id": "ver_1", "event_type": "START"}),
+        "not json",
+        json.dumps({"store_id": "store_ndjson", "recipe_version_id": "ver_1", "event_type": "END"}),
+    ])
+    response = client.post(
+        "/v1/logs/execution/batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["items"][1]["status"] == "rejected"
+
+    response = client.post("/v1/logs/execution/batch", json={"not": "a list"})
+    assert response.status_code == 400
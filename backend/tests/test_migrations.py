@@ -0,0 +1,69 @@
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.migrations import upgrade_schema
+
+def old_engine():
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Tables as created before the pointer / partition / tier columns existed
+        conn.execute(text(
+            'CREATE TABLE "references" (id VARCHAR(36) PRIMARY KEY, org_id VARCHAR(36), name VARCHAR(255), '
+            'reference_type VARCHAR(6), menu_category VARCHAR(100), source_kind VARCHAR(8), status VARCHAR(8), '
+            'process_status VARCHAR(10), metadata_json JSON, created_at DATETIME)'
+        ))
+        conn.execute(text(
+            "CREATE TABLE reference_fingerprints (id VARCHAR(36) PRIMARY KEY, reference_id VARCHAR(36), "
+            "version INTEGER, vector JSON, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE stores (id VARCHAR(36) PRIMARY KEY, org_id VARCHAR(36), name VARCHAR(255), region VARCHAR(100), "
+            "status VARCHAR(8), active_recipe_version_id VARCHAR(36), deviation DECIMAL(5, 2), experiment_group VARCHAR(7))"
+        ))
+        conn.execute(text(
+            "CREATE TABLE store_daily_metrics (id VARCHAR(36) PRIMARY KEY, store_id VARCHAR(36), date DATETIME, "
+            "avg_deviation DECIMAL(5, 2), total_sales INTEGER)"
+        ))
+        conn.execute(text("INSERT INTO \"references\" (id, name) VALUES ('ref_old', 'Old'), ('ref_bare', 'No fingerprint')"))
+        conn.execute(text(
+            "INSERT INTO reference_fingerprints (id, reference_id, version, vector) VALUES "
+            "('fp_1', 'ref_old', 1, '[0.1, 0.2]'), ('fp_2', 'ref_old', 2, '[0.3, 0.4]')"
+        ))
+        conn.execute(text("INSERT INTO store_daily_metrics (id, store_id) VALUES ('m1', 's1')"))
+    return engine
+
+def test_upgrade_adds_columns_and_backfills_once():
+    engine = old_engine()
+    result = upgrade_schema(engine)
+    assert set(result["columns"]["references"]) == {"current_fingerprint_id", "current_vector"}
+    assert "sales_tier" in result["columns"]["stores"]
+    assert "ix_stores_org_status_region" in result["indexes"]
+    assert result["backfilled"]["references"] == 1
+
+    columns = {c["name"] for c in inspect(engine).get_columns("stores")}
+    assert "sales_tier" in columns
+
+    db = sessionmaker(bind=engine)()
+    ref = db.query(models.Reference).filter(models.Reference.id == "ref_old").one()
+    assert ref.current_fingerprint_id == "fp_2" and ref.current_vector == [0.3, 0.4]
+    # Scalar defaults are filled for existing rows
+    assert db.query(models.StoreDailyMetric).one().step_count == 0
+    db.close()
+
+    # Nothing left to do: a restart does not write to the database
+    writes = []
+
+    def record(conn, cursor, statement, *args):
+        if not statement.lstrip().upper().startswith(("SELECT", "PRAGMA")):
+            writes.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        again = upgrade_schema(engine)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert again["columns"] == {} and again["indexes"] == []
+    assert again["backfilled"] == {"references": 0, "execution_log_partition_days": 0}
+    assert writes == []
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.main import app
+from backend.database import Base, get_db
+from backend import models
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture(autouse=True)
+def api_db(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+client = TestClient(app)
+
+def collect_pages(url, params):
+    seen, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        response = client.get(url, params=query)
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen, pages
+
+def test_alert_keyset_pages_with_filters():
+    db = TestingSessionLocal()
+    base = datetime(2026, 3, 1, 12, 0)
+    for i in range(25):
+        db.add(models.Alert(
+            id=f"alert_{i:02d}",
+            org_id="demo_org",
+            store_id="store_a" if i % 2 == 0 else "store_b",
+            alert_type="DEVIATION_HIGH",
+            severity="HIGH" if i % 5 == 0 else "MEDIUM",
+            message=f"Alert {i}",
+            is_resolved=1 if i < 5 else 0,
+            # Pairs share a timestamp so the id tie-breaker matters
+            created_at=base + timedelta(minutes=i // 2)
+        ))
+    db.commit()
+    db.close()
+
+    # Unresolved first, then newest first, no duplicates or gaps
+    ids, pages = collect_pages("/v1/alerts/", {"limit": 4})
+    assert pages == 7
+    assert ids[:2] == ["alert_24", "alert_23"]
+    assert ids[20:] == ["alert_04", "alert_03", "alert_02", "alert_01", "alert_00"]
+    assert len(set(ids)) == 25
+
+    ids, _ = collect_pages("/v1/logs/alerts", {"limit": 3, "store_id": "store_a"})
+    assert ids == [f"alert_{i:02d}" for i in range(24, 4, -2)]
+
+    ids, _ = collect_pages("/v1/alerts/", {"limit": 2, "severity": "HIGH", "resolved": "false"})
+    assert ids == ["alert_20", "alert_15", "alert_10", "alert_05"]
+
+    since = (base + timedelta(minutes=10)).isoformat()
+    ids, _ = collect_pages("/v1/logs/alerts", {"limit": 10, "since": since})
+    assert ids == ["alert_24", "alert_23", "alert_22", "alert_21", "alert_20"]
+
+    assert client.get("/v1/alerts/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_deep_page_is_index_range_scan():
+    db = TestingSessionLocal()
+    for i in range(30):
+        db.add(models.ExecutionLog(
+            id=f"log_{i:02d}",
+            org_id="page_org",
+            store_id="store_a",
+            recipe_version_id="ver_1",
+            event_type="START",
+            ts=datetime(2026, 3, 1) + timedelta(seconds=i)
+        ))
+    db.commit()
+    db.close()
+
+    ids, pages = collect_pages("/v1/logs/", {"org_id": "page_org", "limit": 7})
+    assert ids == [f"log_{i:02d}" for i in range(29, -1, -1)]
+    assert pages == 5
+
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM execution_logs" in statement:
+            statements.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        first = client.get("/v1/logs/", params={"org_id": "page_org", "limit": 7})
+        client.get("/v1/logs/", params={"org_id": "page_org", "limit": 7, "cursor": first.headers["X-Next-Cursor"]})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    # Both pages fetch limit + 1 rows from offset 0; the second seeks past the cursor row instead
+    assert [params[-2:] for _, params in statements] == [(8, 0), (8, 0)]
+    assert "execution_logs.ts <" in statements[1][0]
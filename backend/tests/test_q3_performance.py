@@ -1,4 +1,10 @@
-from sqlalchemy import create_engine
+import json
+import time
+
+import numpy as np
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from datetime import datetime, timedelta
@@ -6,7 +12,10 @@ from datetime import datetime, timedelta
 from backend.database import Base
 from backend import models
 from backend.services.llm_cache import llm_cache
-from backend.services.batch_experiments import run_batch_experiment, get_experiment_run_status
+from backend.services.batch_experiments import (
+    create_batch_run, execute_batch_run, experiment_run_events, get_experiment_run_status, list_run_results,
+    OBJECTIVES, RunSuperseded, _write_progress, adaptive_search, process_queued_runs, run_batch_experiment, score_grid
+)
 
 # Setup In-Memory DB
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -106,10 +115,12 @@ def test_batch_experiment():
     assert run.total_combinations == 4  # 1 target * 2 modes * 2 alphas
     assert run.completed_count == 4
     assert run.duration_ms is not None
-    assert len(run.results_json) == 4
-    
+    assert run.results_json == {"errors": 0}
+
     # Check results structure
-    for result in run.results_json:
+    results = list_run_results(db, run.id)
+    assert len(results) == 4
+    for result in results:
         assert "config" in result
         assert "result" in result or "error" in result
     
@@ -118,3 +129,213 @@ def test_batch_experiment():
     assert status["progress_pct"] == 100.0
     
     db.close()
+
+def test_batch_run_fans_out_and_coalesces_progress():
+    db = TestingSessionLocal()
+    for i in range(4):
+        db.add(models.Reference(
+            id=f"ref_sweep_{i}", org_id="org1", name=f"Sweep {i}",
+            reference_type="BRAND", menu_category="Chicken", source_kind="MARKET"
+        ))
+        db.add(models.ReferenceFingerprint(
+            id=f"fp_sweep_{i}", reference_id=f"ref_sweep_{i}", vector=[0.1 * i, 0.2, 0.3, 0.4, 0.5]
+        ))
+    db.commit()
+
+    targets = [f"ref_sweep_{i}" for i in range(1, 4)] + ["ref_missing"]
+    alphas = [round(0.01 * a, 2) for a in range(1, 101)]
+    run = create_batch_run(db, "ref_sweep_0", targets, ["COPY", "DISTANCE", "REDIRECT"], alphas, "org1")
+    assert run.status == "QUEUED" and run.total_combinations == 1200
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert execute_batch_run(db, run.id, max_workers=2, chunk_size=100, progress_interval=60)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    # Claimed once; another worker cannot execute it again
+    assert not execute_batch_run(db, run.id)
+    # Claim + final write only: progress inside the interval is coalesced
+    assert sum(1 for s in statements if s.lstrip().upper().startswith("UPDATE EXPERIMENT_RUNS")) == 2
+
+    status = get_experiment_run_status(run.id, db)
+    assert status["status"] == "COMPLETED" and status["completed"] == 1200
+    assert "results" not in status
+    results = list_run_results(db, run.id, include_errors=True, limit=1000)
+    assert [r["config"]["alpha"] for r in results[:100]] == alphas
+    assert results[100]["config"] == {"target_id": "ref_sweep_1", "mode": "DISTANCE", "alpha": 0.01}
+    assert len(list_run_results(db, run.id, limit=1000)) == 900
+    assert len(list_run_results(db, run.id, target_id="ref_missing", include_errors=True, limit=1000)) == 300
+
+    events = [json.loads(e[len("data: "):]) for e in experiment_run_events(run.id, TestingSessionLocal)]
+    assert [e["type"] for e in events] == ["complete"]
+    assert events[0]["progress_pct"] == 100.0
+    assert [json.loads(e[len("data: "):])["type"] for e in experiment_run_events("nope", TestingSessionLocal)] == ["error"]
+    db.close()
+
+def test_stale_running_run_is_requeued_and_stream_times_out():
+    db = TestingSessionLocal()
+    for i in range(2):
+        db.add(models.Reference(
+            id=f"ref_stale_{i}", org_id="org1", name=f"Stale {i}",
+            reference_type="BRAND", menu_category="Chicken", source_kind="MARKET"
+        ))
+        db.add(models.ReferenceFingerprint(
+            id=f"fp_stale_{i}", reference_id=f"ref_stale_{i}", vector=[0.2 * i, 0.2, 0.3, 0.4, 0.5]
+        ))
+    db.commit()
+    run = create_batch_run(db, "ref_stale_0", ["ref_stale_1"], ["COPY", "DISTANCE"], [0.3, 0.6], "org1")
+
+    # A worker claimed it, wrote some results, then died an hour ago
+    run.status = "RUNNING"
+    run.attempts = 1
+    run.completed_count = 1
+    run.heartbeat_at = datetime.utcnow() - timedelta(hours=1)
+    db.add(models.ExperimentRunResult(run_id=run.id, idx=0, target_id="ref_stale_1", mode="COPY", alpha=0.3))
+    db.commit()
+
+    # Still inside its heartbeat window: not picked up
+    fresh = create_batch_run(db, "ref_stale_0", ["ref_stale_1"], ["COPY"], [0.5], "org1")
+    fresh.status = "RUNNING"
+    fresh.attempts = 1
+    fresh.heartbeat_at = datetime.utcnow()
+    db.commit()
+    events = [json.loads(e[len("data: "):]) for e in experiment_run_events(fresh.id, TestingSessionLocal, poll_interval=0, timeout=0)]
+    assert [e["type"] for e in events] == ["progress", "error"]
+    stream = list(experiment_run_events(fresh.id, TestingSessionLocal, poll_interval=0.01, timeout=0.1, keepalive=0.02))
+    assert ": keep-alive\n\n" in stream and json.loads(stream[-1][len("data: "):])["type"] == "error"
+
+    assert process_queued_runs(db) == [run.id]
+    status = get_experiment_run_status(run.id, db)
+    assert status["status"] == "COMPLETED" and status["completed"] == 4
+    assert len(list_run_results(db, run.id, include_errors=True)) == 4
+    assert get_experiment_run_status(fresh.id, db)["status"] == "RUNNING"
+
+    # The superseded worker's late writes are fenced off
+    with pytest.raises(RunSuperseded):
+        _write_progress(db, run.id, 1, completed_count=1)
+    assert get_experiment_run_status(run.id, db)["completed"] == 4
+    db.close()
+
+def test_grid_kernel_matches_scalar_formula_and_is_fast():
+    rng = np.random.default_rng(3)
+    base = [0.5, 0.2, 0.9, 0.4, 0.6]
+    targets = rng.random((1000, 5))
+    modes = ["COPY", "DISTANCE", "REDIRECT"]
+    alphas = [round(0.05 * a, 2) for a in range(1, 21)]
+
+    start = time.perf_counter()
+    grid = score_grid(base, targets, modes, alphas)
+    elapsed = time.perf_counter() - start
+    assert grid["result_vector"].shape == (1000, 3, 20, 5)
+    assert grid["distance_from_target"].shape == (1000, 3, 20)
+    assert elapsed < 0.5
+
+    # Spot-check against the per-combination formula
+    t, alpha = targets[7], alphas[5]
+    distance = [min(1, max(0, base[i] + alpha * (t[i] - base[i]))) for i in range(5)]
+    redirect = [min(1, max(0, base[i] - alpha * (t[i] - base[i]))) for i in range(5)]
+    assert np.allclose(grid["result_vector"][7, 0, 5], base)
+    assert np.allclose(grid["result_vector"][7, 1, 5], distance)
+    assert np.allclose(grid["result_vector"][7, 2, 5], redirect)
+    expected = round(sum((distance[i] - t[i]) ** 2 for i in range(5)) ** 0.5, 3)
+    assert abs(grid["distance_from_target"][7, 1, 5] - expected) < 1e-9
+    assert grid["predicted_sales_lift"][5] == round(0.05 + alpha * 0.1, 3)
+    assert grid["execution_risk"][5] == round(alpha * 0.5, 2)
+
+def test_run_results_are_paged_by_lift():
+    db = TestingSessionLocal()
+    db.add(models.Reference(
+        id="ref_top_base", org_id="org1", name="Top Base", reference_type="ANCHOR", menu_category="Chicken", source_kind="INTERNAL"
+    ))
+    db.add(models.ReferenceFingerprint(id="fp_top_base", reference_id="ref_top_base", vector=[0.5] * 5))
+    db.add(models.Reference(
+        id="ref_top_target", org_id="org1", name="Top Target", reference_type="BRAND", menu_category="Chicken", source_kind="MARKET"
+    ))
+    db.add(models.ReferenceFingerprint(id="fp_top_target", reference_id="ref_top_target", vector=[0.9, 0.1, 0.9, 0.1, 0.9]))
+    db.commit()
+    alphas = [0.1, 0.9, 0.5, 0.3, 0.7]
+    run = run_batch_experiment("ref_top_base", ["ref_top_target"], ["DISTANCE", "REDIRECT"], alphas, "org1", db)
+
+    response = Response()
+    top = list_run_results(db, run.id, sort="predicted_sales_lift", descending=True, limit=4, response=response)
+    assert [r["config"]["alpha"] for r in top] == [0.9, 0.9, 0.7, 0.7]
+    # Ties keep grid order: DISTANCE before REDIRECT
+    assert [r["config"]["mode"] for r in top[:2]] == ["DISTANCE", "REDIRECT"]
+
+    rest = list_run_results(
+        db, run.id, sort="predicted_sales_lift", descending=True, limit=100, cursor=response.headers["X-Next-Cursor"]
+    )
+    assert [r["config"]["alpha"] for r in rest] == [0.5, 0.5, 0.3, 0.3, 0.1, 0.1]
+    assert [r["config"]["alpha"] for r in list_run_results(db, run.id, mode="REDIRECT", sort="alpha")] == sorted(alphas)
+    db.close()
+
+def test_adaptive_search_finds_grid_optimum_with_a_tenth_of_the_evaluations():
+    rng = np.random.default_rng(11)
+    base = [0.5, 0.2, 0.9, 0.4, 0.6]
+    targets = [(f"t{i}", rng.random(5).tolist()) for i in range(200)] + [("t_missing", None)]
+    modes = ["COPY", "DISTANCE", "REDIRECT"]
+    alphas = [round(0.05 * a, 2) for a in range(1, 21)]
+
+    grid = score_grid(base, [vec for _, vec in targets[:-1]], modes, alphas)
+    metrics = {
+        "predicted_sales_lift": grid["predicted_sales_lift"][None, None, :],
+        "execution_risk": grid["execution_risk"][None, None, :],
+        "distance_from_target": grid["distance_from_target"]
+    }
+    grid_best = float(OBJECTIVES["score"](metrics).max())
+    grid_size = 200 * len(modes) * len(alphas)
+
+    rows = []
+    summary = adaptive_search(base, targets, modes, (0.05, 1.0), budget=grid_size // 10, on_batch=rows.extend)
+    assert summary["skipped_targets"] == 1
+    assert summary["evaluations"] == len(rows) <= grid_size // 10
+    assert [r["idx"] for r in rows] == list(range(len(rows)))
+    assert all(0.05 <= r["alpha"] <= 1.0 for r in rows)
+    assert summary["best"]["objective"] >= grid_best - 1e-3
+
+    # Same seed, same search
+    again = adaptive_search(base, targets, modes, (0.05, 1.0), budget=grid_size // 10)
+    assert again["best"] == summary["best"] and again["evaluations"] == summary["evaluations"]
+
+def test_adaptive_run_records_budget_and_best_strategy():
+    db = TestingSessionLocal()
+    db.add(models.Reference(
+        id="ref_ad_base", org_id="org1", name="Adaptive Base", reference_type="ANCHOR", menu_category="Chicken", source_kind="INTERNAL"
+    ))
+    db.add(models.ReferenceFingerprint(id="fp_ad_base", reference_id="ref_ad_base", vector=[0.5] * 5))
+    target_ids = []
+    for i in range(30):
+        target_ids.append(f"ref_ad_t{i}")
+        db.add(models.Reference(
+            id=f"ref_ad_t{i}", org_id="org1", name=f"Adaptive {i}", reference_type="BRAND", menu_category="Chicken", source_kind="MARKET"
+        ))
+        db.add(models.ReferenceFingerprint(id=f"fp_ad_t{i}", reference_id=f"ref_ad_t{i}", vector=[0.5 + 0.01 * (i + 1)] * 5))
+    db.commit()
+
+    try:
+        create_batch_run(db, "ref_ad_base", target_ids, ["COPY"], [0.5], "org1", search_mode="random")
+        assert False, "unknown search modes are rejected"
+    except ValueError as e:
+        assert "search_mode" in str(e)
+
+    alphas = [round(0.1 * a, 1) for a in range(1, 11)]
+    run = run_batch_experiment(
+        "ref_ad_base", target_ids, ["COPY", "DISTANCE", "REDIRECT"], alphas, "org1", db,
+        search_mode="adaptive"
+    )
+    assert run.status == "COMPLETED"
+    assert run.config_json["budget"] == 90  # 10% of 900
+    assert 0 < run.completed_count == run.total_combinations <= 90
+    assert db.query(models.ExperimentRunResult).filter(models.ExperimentRunResult.run_id == run.id).count() == run.completed_count
+
+    status = get_experiment_run_status(run.id, db)
+    assert status["progress_pct"] == 100.0
+    best = status["summary"]["best"]
+    # Grid optimum of the default objective: step all the way onto a target
+    assert best["config"]["mode"] == "DISTANCE" and best["config"]["alpha"] == 1.0
+    assert abs(best["objective"] - 0.1) < 1e-9
+    top = list_run_results(db, run.id, sort="distance_from_target", limit=1)
+    assert top[0]["result"]["distance_from_target"] == 0.0
+    db.close()
@@ -0,0 +1,105 @@
+import io
+
+import pyarrow as pa
+import pytest
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.main import app
+from backend.database import Base, get_db
+from backend import models
+from backend.routers import references
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture(autouse=True)
+def in_memory_db(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setattr(references, "SessionLocal", TestingSessionLocal)
+
+client = TestClient(app)
+
+def setup_data(db):
+    for i in range(4):
+        db.add(models.Reference(
+            id=f"arrow_ref_{i}",
+            org_id="src_org",
+            name=f"Arrow Menu {i}",
+            reference_type="BRAND",
+            menu_category="Chicken",
+            source_kind="MARKET",
+            metadata_json={"keywords": ["spicy"]}
+        ))
+        if i < 3:
+            db.add(models.ReferenceFingerprint(
+                id=f"arrow_fp_{i}",
+                reference_id=f"arrow_ref_{i}",
+                version=1,
+                vector=[0.1 * i, 0.2, 0.3, 0.4, 0.5]
+            ))
+    db.commit()
+
+def test_export_import_round_trip():
+    db = TestingSessionLocal()
+    setup_data(db)
+
+    response = client.get("/v1/references/export?org_id=src_org&format=parquet")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 4
+    assert table.schema.field("vector").type == pa.list_(pa.float64(), 5)
+    by_id = dict(zip(table.column("id").to_pylist(), table.column("vector").to_pylist()))
+    assert by_id["arrow_ref_2"] == [0.2, 0.2, 0.3, 0.4, 0.5]
+    assert by_id["arrow_ref_3"] is None
+
+    # Move into a fresh environment
+    db.query(models.ReferenceFingerprint).delete()
+    db.query(models.Reference).delete()
+    db.commit()
+
+    response = client.post(
+        "/v1/references/import?org_id=dst_org",
+        files={"file": ("references.parquet", response.content, "application/octet-stream")}
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 4
+    assert response.json()["fingerprints"] == 3
+
+    ref = db.query(models.Reference).filter(models.Reference.id == "arrow_ref_2").first()
+    assert ref.org_id == "dst_org"
+    assert ref.metadata_json == {"keywords": ["spicy"]}
+    assert ref.current_fingerprint_id == "arrow_fp_2"
+    assert ref.current_vector == [0.2, 0.2, 0.3, 0.4, 0.5]
+    unvectorized = db.query(models.Reference).filter(models.Reference.id == "arrow_ref_3").first()
+    assert unvectorized.current_fingerprint_id is None
+    assert unvectorized.process_status == "QUEUED"
+
+    # Arrow stream format; everything already exists now
+    stream = client.get("/v1/references/export?format=arrow")
+    assert stream.status_code == 200
+    response = client.post(
+        "/v1/references/import?format=arrow",
+        files={"file": ("references.arrow", stream.content, "application/octet-stream")}
+    )
+    assert response.json()["imported"] == 0
+    assert response.json()["skipped"] == 4
+
+    db.close()
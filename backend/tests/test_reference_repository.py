@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models
+from backend.services.reference_repository import reference_repository
+from backend.services.advanced_features import calculate_synergy_map
+from backend.services.trend_analyzer import predict_trends, auto_search_strategy
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def _add_reference(db, ref_id):
+    db.add(models.Reference(
+        id=ref_id,
+        org_id="org1",
+        name=f"Menu {ref_id}",
+        reference_type="BRAND",
+        menu_category="Chicken",
+        source_kind="MARKET"
+    ))
+
+def test_current_fingerprint_pointer_tracks_newest_version():
+    db = TestingSessionLocal()
+    _add_reference(db, "ref_ptr")
+    db.add(models.ReferenceFingerprint(id="fp_v2", reference_id="ref_ptr", version=2, vector=[0.9] * 5))
+    db.commit()
+
+    ref = db.query(models.Reference).filter(models.Reference.id == "ref_ptr").first()
+    assert ref.current_fingerprint_id == "fp_v2"
+    assert ref.current_vector == [0.9] * 5
+
+    # Older version inserted later must not steal the pointer
+    db.add(models.ReferenceFingerprint(id="fp_v1", reference_id="ref_ptr", version=1, vector=[0.1] * 5))
+    db.flush()
+    assert ref.current_fingerprint_id == "fp_v2"
+
+    # Newer version takes over, visible in the same session before commit
+    db.add(models.ReferenceFingerprint(id="fp_v3", reference_id="ref_ptr", version=3, vector=[0.3] * 5))
+    db.flush()
+    assert ref.current_fingerprint_id == "fp_v3"
+    assert ref.current_vector == [0.3] * 5
+
+    # In-place update of the current fingerprint is mirrored
+    fp = db.query(models.ReferenceFingerprint).filter(models.ReferenceFingerprint.id == "fp_v3").first()
+    fp.vector = [0.4] * 5
+    db.commit()
+    db.refresh(ref)
+    assert ref.current_vector == [0.4] * 5
+
+    db.close()
+
+def test_load_with_vectors_and_refresh():
+    db = TestingSessionLocal()
+    _add_reference(db, "ref_a")
+    _add_reference(db, "ref_b")
+    db.add(models.ReferenceFingerprint(id="fp_a", reference_id="ref_a", version=1, vector=[0.2] * 5))
+    db.commit()
+
+    refs = reference_repository.load_with_vectors(db, ["ref_b", "ref_a", "missing"], with_fingerprint=True)
+    assert [r.id for r in refs] == ["ref_b", "ref_a"]
+    assert refs[0].current_fingerprint is None
+    assert refs[1].current_fingerprint.version == 1
+
+    # Simulate a stale pointer (e.g. rows created before the column existed) and backfill it
+    db.query(models.Reference).filter(models.Reference.id == "ref_a").update(
+        {"current_fingerprint_id": None, "current_vector": None}
+    )
+    db.commit()
+    reference_repository.refresh_current_fingerprints(db, models.Reference.org_id == "org1")
+    db.commit()
+
+    ref_a = reference_repository.get_with_vector(db, "ref_a")
+    assert ref_a.current_fingerprint_id == "fp_a"
+    assert ref_a.current_vector == [0.2] * 5
+    assert reference_repository.get_with_vector(db, "ref_b").current_vector is None
+
+    db.close()
+
+@contextmanager
+def count_reference_selects():
+    """Collect SELECTs that touch references or fingerprints"""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and (
+            '"references"' in statement or "reference_fingerprints" in statement
+        ):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+
+def _seed_category(db, category, count):
+    ids = []
+    for i in range(count):
+        ref_id = f"{category}_{i}"
+        db.add(models.Reference(
+            id=ref_id,
+            org_id="org_q",
+            name=f"{category} {i}",
+            reference_type="ANCHOR" if i == 0 else "BRAND",
+            menu_category=category,
+            source_kind="MARKET"
+        ))
+        db.add(models.ReferenceFingerprint(
+            id=f"fp_{ref_id}",
+            reference_id=ref_id,
+            vector=[0.1 * (i % 10), 0.5, 0.9, 0.5, 0.2 + 0.1 * (i % 5)]
+        ))
+        ids.append(ref_id)
+    db.commit()
+    return ids
+
+def test_vector_loads_do_not_scale_with_reference_count():
+    db = TestingSessionLocal()
+    ids = _seed_category(db, "Pizza", 12)
+    db.expunge_all()
+
+    with count_reference_selects() as statements:
+        result = calculate_synergy_map(ids, db)
+    assert result is not None
+    assert len(statements) == 1
+
+    db.expunge_all()
+    with count_reference_selects() as statements:
+        report = predict_trends("Pizza", 6, "org_q", db)
+    assert report.data_points_count == 12
+    assert len(statements) == 1
+
+    db.expunge_all()
+    with count_reference_selects() as statements:
+        auto_search_strategy(ids[0], {"sales_lift": 0.1}, {"risk_tolerance": "medium"}, "org_q", db)
+    # base + competitors, then one load per tried goal (3), one statement each
+    assert len(statements) <= 5
+
+    db.close()
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.database import Base
+from backend.services.rollback_engine import RollbackEngine, parse_policy, ANY_STORE, MEAN
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def add_deployment(db, dep_id: str, deviations, policy: dict):
+    version = f"ver_{dep_id}"
+    db.add(models.RecipeVersion(id=version, recipe_id="rec_rb", version_label=dep_id))
+    db.add(models.Deployment(
+        id=dep_id, org_id="org_rb", recipe_version_id=version,
+        scope="ALL_STORES", status="DEPLOYED", rollback_policy_json=policy
+    ))
+    for i, deviation in enumerate(deviations):
+        db.add(models.Store(
+            id=f"{dep_id}_s{i}", org_id="org_rb", name=f"{dep_id} S{i}", status="ACTIVE",
+            deviation=deviation, active_recipe_version_id=version
+        ))
+
+def test_parse_policy_defaults():
+    assert parse_policy({"deviation_threshold": 10}, None).kind == ANY_STORE
+    assert parse_policy(None, {"deviation_threshold": 10}).kind == MEAN
+    assert parse_policy(None, {}) is None
+    assert parse_policy({"policy": "unknown"}, None) is None
+
+def test_policies_and_sustained_window():
+    db = TestingSessionLocal()
+    # 1 of 10 stores over 20%: tolerated by fraction 0.2, not by any_store
+    add_deployment(db, "frac_ok", [25.0] + [5.0] * 9, {"policy": "fraction", "deviation_threshold": 20, "max_bad_fraction": 0.2})
+    add_deployment(db, "any_bad", [25.0] + [5.0] * 9, {"policy": "any_store", "deviation_threshold": 20})
+    add_deployment(db, "slow", [18.0, 16.0], {"policy": "sustained", "condition": "mean", "deviation_threshold": 15, "window_minutes": 30})
+    db.commit()
+
+    rollbacks = RollbackEngine()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert rollbacks.run(db, now=start) == ["any_bad"]
+    assert rollbacks.run(db, now=start + timedelta(minutes=10)) == []
+    assert rollbacks.run(db, now=start + timedelta(minutes=31)) == ["slow"]
+
+    statuses = {d.id: d.status for d in db.query(models.Deployment)}
+    assert statuses == {"frac_ok": "DEPLOYED", "any_bad": "ROLLED_BACK", "slow": "ROLLED_BACK"}
+    assert db.query(models.Store).filter(models.Store.active_recipe_version_id == "ver_any_bad").count() == 0
+    alerts = db.query(models.Alert).filter(models.Alert.message.contains("Deployment slow")).all()
+    assert len(alerts) == 2
+    assert "for 30 min" in alerts[0].message
+    db.close()
+
+def test_health_check_is_constant_query():
+    def count_queries(n_deployments):
+        db = TestingSessionLocal()
+        for i in range(n_deployments):
+            add_deployment(db, f"cq{n_deployments}_{i}", [5.0, 6.0, 7.0], {"deviation_threshold": 50})
+        db.commit()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert RollbackEngine().evaluate(db) == []
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        db.rollback()
+        db.query(models.Store).filter(models.Store.id.like(f"cq{n_deployments}_%")).delete(synchronize_session=False)
+        db.query(models.Deployment).filter(models.Deployment.id.like(f"cq{n_deployments}_%")).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+        return len(statements)
+
+    assert count_queries(3) == count_queries(40)
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models, schemas
+from backend.database import Base
+from backend.services import deployment_service
+from backend.services.rollout_engine import PAUSE, PROMOTE, ROLL_BACK, rollout_engine
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def make_fleet(db, org_id: str, n: int):
+    for label in ("old", "new"):
+        db.add(models.RecipeVersion(
+            id=f"{org_id}_{label}", recipe_id="rec_rollout", version_label=label,
+            approval_status=schemas.VersionApprovalStatus.APPROVED.value
+        ))
+    for i in range(n):
+        db.add(models.Store(
+            id=f"{org_id}_s{i}", org_id=org_id, name=f"S{i}", status="ACTIVE",
+            active_recipe_version_id=f"{org_id}_old", deviation=4.0
+        ))
+    db.commit()
+
+def start_rollout(db, org_id: str, **rollout):
+    return deployment_service.create_deployment(db, schemas.DeploymentCreate(
+        recipe_version_id=f"{org_id}_new",
+        target_group_json={"rollout": rollout or True}
+    ), org_id)
+
+def stage_store_ids(db, deployment_id: str):
+    return {
+        m.store_id for m in db.query(models.DeploymentMembership).filter(
+            models.DeploymentMembership.deployment_id == deployment_id,
+            models.DeploymentMembership.reverted_at.is_(None)
+        )
+    }
+
+def set_deviation(db, store_ids, deviation: float):
+    db.execute(update(models.Store).where(models.Store.id.in_(store_ids)).values(deviation=deviation))
+    db.commit()
+
+def test_rollout_plan_parsing():
+    plan = deployment_service.rollout_plan(models.Deployment(target_group_json={"rollout": True}))
+    assert plan.stages == (1.0, 10.0, 50.0, 100.0)
+    plan = deployment_service.rollout_plan(models.Deployment(target_group_json={
+        "rollout": {"stages": [50, 5, "x", 0], "max_deviation_delta": 2, "on_breach": "rollback"}
+    }))
+    assert plan.stages == (5.0, 50.0, 100.0)
+    assert plan.max_deviation_delta == 2.0 and plan.on_breach == "rollback"
+    assert deployment_service.rollout_plan(models.Deployment(target_group_json={"region": "SEOUL"})) is None
+
+def test_healthy_rollout_promotes_through_nested_stages():
+    db = TestingSessionLocal()
+    make_fleet(db, "org_ro", 40)
+    deployment = start_rollout(db, "org_ro", stages=[10, 50, 100], min_stage_minutes=30)
+    assert deployment.status == "ROLLING_OUT" and deployment.rollout_stage == 0
+
+    canary = stage_store_ids(db, deployment.id)
+    assert len(canary) == 4
+    on_new = {s.id for s in db.query(models.Store).filter(models.Store.active_recipe_version_id == "org_ro_new")}
+    assert on_new == canary
+
+    # Not observed long enough yet
+    started = deployment.stage_started_at.replace(tzinfo=timezone.utc)
+    assert rollout_engine.evaluate(db, started + timedelta(minutes=10)) == []
+
+    steps = rollout_engine.evaluate(db, started + timedelta(minutes=31))
+    assert [(s.action, s.stage) for s in steps] == [(PROMOTE, 1)]
+    rollout_engine.apply(db, steps, started + timedelta(minutes=31))
+    db.commit()
+    half = stage_store_ids(db, deployment.id)
+    assert len(half) == 20 and canary < half
+
+    later = datetime.now(timezone.utc) + timedelta(hours=2)
+    assert rollout_engine.run(db, later)["promoted"] == [deployment.id]
+    db.refresh(deployment)
+    assert deployment.status == "DEPLOYED" and deployment.rollout_stage == 2
+    assert db.query(models.Store).filter(models.Store.active_recipe_version_id == "org_ro_old").count() == 0
+    stages = {m.stage for m in db.query(models.DeploymentMembership).filter(
+        models.DeploymentMembership.deployment_id == deployment.id
+    )}
+    assert stages == {0, 1, 2}
+    db.close()
+
+def test_stage_breach_against_control_pauses_rollout():
+    db = TestingSessionLocal()
+    make_fleet(db, "org_rp", 20)
+    deployment = start_rollout(db, "org_rp", stages=[10, 100], max_deviation_delta=5)
+    set_deviation(db, stage_store_ids(db, deployment.id), 12.0)
+
+    status = rollout_engine.status(db, deployment.id)
+    assert status["stage_stores"] == 2 and status["control_stores"] == 18
+    assert status["stage_mean_deviation"] == 12.0 and status["control_mean_deviation"] == 4.0
+
+    steps = rollout_engine.evaluate(db, datetime.now(timezone.utc) + timedelta(hours=1))
+    assert [s.action for s in steps] == [PAUSE]
+    assert "8.0%p above control" in steps[0].reason
+
+    result = rollout_engine.run(db, datetime.now(timezone.utc) + timedelta(hours=1))
+    assert result["paused"] == [deployment.id]
+    db.refresh(deployment)
+    assert deployment.status == "PAUSED"
+    alert = db.query(models.Alert).filter(models.Alert.org_id == "org_rp").one()
+    assert alert.message.startswith(f"Rollout paused: Deployment {deployment.id}")
+    # Paused rollouts are not promoted and keep their stage stores
+    assert rollout_engine.evaluate(db, datetime.now(timezone.utc) + timedelta(hours=2)) == []
+    assert len(stage_store_ids(db, deployment.id)) == 2
+
+    # Resuming after a fix restarts the stage clock
+    set_deviation(db, stage_store_ids(db, deployment.id), 5.0)
+    assert rollout_engine.set_paused(db, deployment.id, False)["status"] == "ROLLING_OUT"
+    assert rollout_engine.promote(db, deployment.id)["status"] == "DEPLOYED"
+    db.close()
+
+def test_stage_breach_rolls_back_when_configured():
+    db = TestingSessionLocal()
+    make_fleet(db, "org_rb", 20)
+    deployment = start_rollout(db, "org_rb", stages=[10, 50, 100], on_breach="rollback")
+    set_deviation(db, stage_store_ids(db, deployment.id), 30.0)
+
+    steps = rollout_engine.evaluate(db)
+    assert [s.action for s in steps] == [ROLL_BACK]
+    assert rollout_engine.run(db)["rolled_back"] == [deployment.id]
+    db.refresh(deployment)
+    assert deployment.status == "ROLLED_BACK"
+    assert db.query(models.Store).filter(models.Store.active_recipe_version_id == "org_rb_new").count() == 0
+    assert db.query(models.Alert).filter(models.Alert.org_id == "org_rb").count() == 2
+    db.close()
+
+def test_rollout_pass_is_batched_across_deployments():
+    db = TestingSessionLocal()
+    orgs = [f"org_rbatch{i}" for i in range(3)]
+    for org_id in orgs:
+        make_fleet(db, org_id, 10)
+        start_rollout(db, org_id, stages=[10, 100], min_stage_minutes=0)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = rollout_engine.run(db, datetime.now(timezone.utc) + timedelta(minutes=1))
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert len(result["promoted"]) == 3
+    updates = [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+    inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT")]
+    # One executemany each for stores and deployments, one for the new memberships
+    assert len(updates) == 2 and len(inserts) == 1
+    assert db.query(models.Store).filter(models.Store.active_recipe_version_id.like("org_rbatch%_old")).count() == 0
+    db.close()
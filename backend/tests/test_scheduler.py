@@ -0,0 +1,117 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from backend.database import Base
+from backend.services.scheduler import Scheduler, ScheduledJob, SUCCESS, FAILED, default_jobs
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def test_one_replica_runs_each_job_until_its_lease_expires():
+    calls = []
+    job = ScheduledJob("health", 60.0, lambda db: calls.append("health"))
+    local = ScheduledJob("flush", 60.0, lambda db: calls.append("flush"), leader_only=False)
+    a = Scheduler([job, local], TestingSessionLocal, holder="replica-a")
+    b = Scheduler([job, local], TestingSessionLocal, holder="replica-b")
+
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert a.run_once(job, t0) == SUCCESS
+    assert b.run_once(job, t0 + timedelta(seconds=1)) is None
+    # The holder renews on its next tick
+    assert a.run_once(job, t0 + timedelta(seconds=60)) == SUCCESS
+    assert b.run_once(job, t0 + timedelta(seconds=61)) is None
+    # replica-a stops ticking: replica-b takes over once the lease (1.5 x interval) expires
+    assert b.run_once(job, t0 + timedelta(seconds=60 + 91)) == SUCCESS
+    assert a.run_once(job, t0 + timedelta(seconds=60 + 92)) is None
+
+    # Per-replica jobs never take a lease
+    assert a.run_once(local, t0) == SUCCESS
+    assert b.run_once(local, t0) == SUCCESS
+
+    assert calls.count("health") == 3
+    assert calls.count("flush") == 2
+    assert b.skipped["health"] == 2
+
+    db = TestingSessionLocal()
+    lease = db.get(models.SchedulerLease, "health")
+    assert lease.holder == "replica-b"
+    assert lease.run_count == 3
+    assert lease.last_status == SUCCESS
+    assert db.get(models.SchedulerLease, "flush") is None
+    db.close()
+
+def test_failed_job_is_recorded_and_released_on_stop():
+    def broken(db):
+        raise RuntimeError("boom")
+
+    job = ScheduledJob("broken", 0.01, broken)
+    worker = Scheduler([job], TestingSessionLocal, jitter=0.5, holder="replica-c")
+    assert all(0.005 <= worker.next_delay(job) <= 0.015 for _ in range(50))
+
+    async def scenario():
+        await worker.start()
+        await asyncio.sleep(0.1)
+        await worker.stop()
+
+    asyncio.run(scenario())
+    assert worker.runs["broken"] >= 2
+    assert not worker.running
+
+    db = TestingSessionLocal()
+    lease = db.get(models.SchedulerLease, "broken")
+    assert lease.last_status == FAILED
+    assert lease.last_error == "boom"
+    # Released: another replica can take the job right away
+    assert Scheduler([job], TestingSessionLocal, holder="replica-d").acquire(db, job, datetime.now(timezone.utc))
+    db.close()
+
+def test_lease_is_renewed_while_a_long_job_runs():
+    outcome = {}
+    job = ScheduledJob("long", 0.2, lambda db: None)
+    rival = Scheduler([job], TestingSessionLocal, holder="replica-f")
+
+    def long_run(db):
+        # Three lease lengths (0.3s) in: still held by the running replica
+        time.sleep(0.9)
+        other = TestingSessionLocal()
+        try:
+            outcome["rival"] = rival.acquire(other, job, datetime.now(timezone.utc))
+        finally:
+            other.close()
+
+    holder = Scheduler([job._replace(run=long_run)], TestingSessionLocal, jitter=0.0, holder="replica-e")
+    assert holder.run_once(holder.jobs[0]) == SUCCESS
+    assert outcome["rival"] is False
+
+    # The heartbeat stops with the run: the lease expires as usual afterwards
+    time.sleep(0.4)
+    db = TestingSessionLocal()
+    assert rival.acquire(db, job, datetime.now(timezone.utc))
+    db.close()
+
+def test_default_jobs_run_against_an_empty_database():
+    worker = Scheduler(default_jobs(), TestingSessionLocal, holder="replica-e")
+    assert {job.name: worker.run_once(job) for job in worker.jobs} == {
+        "deployment_apply": SUCCESS,
+        "deployment_rollout": SUCCESS,
+        "deployment_health": SUCCESS,
+        "alert_check": SUCCESS,
+        "incident_analysis": SUCCESS,
+        "experiment_runs": SUCCESS,
+        "llm_cache_cleanup": SUCCESS,
+        "log_maintenance": SUCCESS,
+        "deviation_rollups": SUCCESS,
+    }
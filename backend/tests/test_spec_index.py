@@ -0,0 +1,63 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend import models, schemas
+from backend.services.log_processor import process_execution_log
+from backend.services.recipe_generator import generate_recipe_spec
+from backend.services.spec_index import spec_index, compile_spec
+
+# Setup In-Memory DB
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def test_compile_spec_flattens_steps_and_tolerances():
+    spec = compile_spec({
+        "meta": {"tolerance_pct": 5},
+        "steps": [
+            {"step": "COOK", "action": "Grill", "params": {"temp_c": 180, "time_s": {"target": 150, "tolerance_pct": 20}}},
+            {"step": "PREP", "action": "Seasoning", "params": {"salt_mix_g": 2.5, "note": "by hand"}}
+        ]
+    })
+    assert spec.lookup("cook", "temp_c") == ("temp_c", 180.0, 5.0)
+    assert spec.lookup("Grill", "time_s") == ("time_s", 150.0, 20.0)
+    # Single numeric param can be implied
+    assert spec.lookup("Seasoning") == ("salt_mix_g", 2.5, 5.0)
+    assert spec.lookup("COOK") is None
+    assert spec.lookup("FINISH", "oil_g") is None
+
+def test_measurement_only_logs_checked_against_spec():
+    db = TestingSessionLocal()
+    db.add(models.Store(id="store_spec", org_id="demo_org", name="Spec Branch"))
+    db.add(models.RecipeVersion(
+        id="ver_spec",
+        version_label="v1",
+        spec_yaml=generate_recipe_spec([80.0, 50.0, 60.0, 40.0])  # COOK: temp_c 180, time_s 140
+    ))
+    db.commit()
+
+    process_execution_log(schemas.ExecutionLogCreate(
+        store_id="store_spec",
+        recipe_version_id="ver_spec",
+        event_type=schemas.ExecutionLogType.STEP,
+        payload_json={"step_name": "COOK", "measurements": {"temp_c": 182, "time_s": 170}}
+    ), "demo_org", db)
+
+    alerts = db.query(models.Alert).filter(models.Alert.store_id == "store_spec").all()
+    assert len(alerts) == 1
+    assert "COOK/time_s" in alerts[0].message
+    assert "21.4%" in alerts[0].message
+
+    # Spec edits are picked up
+    version = db.query(models.RecipeVersion).filter(models.RecipeVersion.id == "ver_spec").first()
+    version.spec_json = {"steps": [{"step": "COOK", "params": {"temp_c": 150}}]}
+    db.commit()
+    assert spec_index.get(db, "ver_spec").lookup("COOK") == ("temp_c", 150.0, 10.0)
+    db.close()
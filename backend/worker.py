@@ -0,0 +1,37 @@
+"""
+Background worker: runs the scheduled maintenance jobs without serving the API.
+
+    python -m backend.worker
+
+Any number of workers (and API replicas with FLAVOROS_SCHEDULER_ENABLED=1)
+can run side by side; leases in the database make each job run on one of them.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+import logging
+import signal
+
+from .database import engine
+from .migrations import upgrade_schema
+from .services.scheduler import scheduler
+
+
+async def main():
+    upgrade_schema(engine)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await scheduler.start()
+    try:
+        await stop.wait()
+    finally:
+        await scheduler.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())